@@ -0,0 +1,14 @@
+import sys
+from db.db_client import DatabaseClient
+from db.job_store import backfill_description_fields
+from log.logger_config import configured_logger
+from loguru import logger
+
+# Computes the clean 'description_text' and 'description_sections' of stored jobs from their html.
+# Only jobs without them are converted, pass --force to convert every job again.
+db_client = DatabaseClient()
+database = db_client.db
+updated = backfill_description_fields(database, force="--force" in sys.argv)
+if updated:
+    db_client.bump_collection_version("Jobs")
+logger.info(f"{updated} no. of job descriptions converted.")
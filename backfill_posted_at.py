@@ -0,0 +1,15 @@
+from db.db_client import DatabaseClient
+from db.indexes import bootstrap_jobs_collection
+from db.job_store import backfill_posted_at
+from log.logger_config import configured_logger
+from loguru import logger
+
+# Computes the absolute 'posted_at' of stored jobs from their relative post_date, and creates its index.
+# Only jobs without one are converted.
+db_client = DatabaseClient()
+database = db_client.db
+updated = backfill_posted_at(database)
+bootstrap_jobs_collection(database)
+if updated:
+    db_client.bump_collection_version("Jobs")
+logger.info(f"{updated} no. of job post dates converted.")
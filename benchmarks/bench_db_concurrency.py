@@ -0,0 +1,109 @@
+# bench_db_concurrency.py
+# Compares request latency when PyMongo queries run on the event loop (before)
+# and on the AsyncDatabaseClient thread pool (after).
+#
+# Usage:
+#   python -m benchmarks.bench_db_concurrency                       # against the local MongoDB
+#   python -m benchmarks.bench_db_concurrency --simulated-query-ms 50  # without a database
+import argparse
+import asyncio
+import statistics
+import time
+import httpx
+from fastapi import FastAPI
+from db.async_db_client import AsyncDatabaseClient
+
+
+class SimulatedDatabaseClient:
+    """Stands in for DatabaseClient when no MongoDB is running, every query blocks for a fixed time."""
+
+    def __init__(self, query_ms):
+        self.query_ms = query_ms
+
+    def run_query(self, collection_name, query={}, **kwargs):
+        time.sleep(self.query_ms / 1000)
+        return []
+
+
+def build_app(db_client, offload):
+    app = FastAPI()
+    async_db_client = AsyncDatabaseClient(db_client)
+
+    @app.get("/health")
+    async def health():
+        return "OK"
+
+    @app.get("/jobs")
+    async def jobs():
+        # A case-insensitive regex on the description forces a collection scan
+        query = {"job_description": {"$regex": "kubernetes", "$options": "i"}}
+        if offload:
+            results = await async_db_client.run_query("Jobs", query)
+        else:
+            results = db_client.run_query("Jobs", query)
+        return {"count": len(results)}
+
+    return app
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def run_load(app, concurrency, requests_per_worker):
+    latencies = {"/jobs": [], "/health": []}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            for _ in range(requests_per_worker):
+                start = time.perf_counter()
+                response = await client.get("/jobs")
+                response.raise_for_status()
+                latencies["/jobs"].append((time.perf_counter() - start) * 1000)
+
+        async def health_probe(done, interval=0.005):
+            while not done.is_set():
+                # Probes are timed from when they were due, so time spent waiting for a
+                # blocked event loop shows up in their latency.
+                due = time.perf_counter() + interval
+                await asyncio.sleep(interval)
+                response = await client.get("/health")
+                response.raise_for_status()
+                latencies["/health"].append((time.perf_counter() - due) * 1000)
+
+        done = asyncio.Event()
+        probe = asyncio.create_task(health_probe(done))
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        done.set()
+        await probe
+        elapsed = time.perf_counter() - start
+    return latencies, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=10, help="Requests per concurrent worker")
+    parser.add_argument("--simulated-query-ms", type=float, default=None,
+                        help="Skip MongoDB and make every query block for this many milliseconds")
+    args = parser.parse_args()
+
+    if args.simulated_query_ms is not None:
+        db_client = SimulatedDatabaseClient(args.simulated_query_ms)
+    else:
+        from db.db_client import DatabaseClient
+        db_client = DatabaseClient()
+
+    print(f"{'mode':<10} {'endpoint':<8} {'p50 ms':>9} {'p99 ms':>9} {'req/s':>8}")
+    for mode, offload in (("before", False), ("after", True)):
+        latencies, elapsed = asyncio.run(run_load(build_app(db_client, offload), args.concurrency, args.requests))
+        total = len(latencies["/jobs"])
+        for path, values in latencies.items():
+            print(f"{mode:<10} {path:<8} {statistics.median(values):>9.1f} {percentile(values, 99):>9.1f} "
+                  f"{total / elapsed:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# bench_llm_coalescing.py
+# Compares concurrent resume key info extractions sent straight to the structured output model
+# (before) and through GeminiClient, where identical concurrent inputs share one call (after),
+# against a local fake model.
+#
+# Usage:
+#   python -m benchmarks.bench_llm_coalescing
+#   python -m benchmarks.bench_llm_coalescing --requests 200 --latency-ms 300 --duplicates 0.3
+import argparse
+import asyncio
+import random
+import time
+from typing import Any, List, Optional
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import Runnable
+from llm.gemini import GeminiClient, ResumeDetails, ModelResponseJobs
+
+FAKE_RESPONSES = {
+    ResumeDetails: ResumeDetails(job_title="Software Engineer", location="Pune", key_skills=["python"], exp_years=3),
+    ModelResponseJobs: ModelResponseJobs(output=[]),
+}
+
+
+class FakeStructuredOutput(Runnable):
+    """
+    Answers every input with a canned response after a fixed latency. Like langchain's default
+    Runnable.abatch, a batch is one round trip per input.
+    """
+
+    def __init__(self, model, schema):
+        self.model = model
+        self.schema = schema
+
+    def invoke(self, input, config=None, **kwargs):
+        self.model.round_trips += 1
+        time.sleep(self.model.latency_ms / 1000)
+        return FAKE_RESPONSES[self.schema]
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        self.model.round_trips += 1
+        await asyncio.sleep(self.model.latency_ms / 1000)
+        return FAKE_RESPONSES[self.schema]
+
+    async def abatch(self, inputs, config=None, *, return_exceptions=False, **kwargs):
+        return await asyncio.gather(*(self.ainvoke(value, config) for value in inputs))
+
+
+class FakeStructuredChatModel(BaseChatModel):
+    """A local chat model standing in for Gemini, it counts the round trips it is sent."""
+
+    latency_ms: float = 200
+    round_trips: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-structured"
+
+    def _generate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        self.round_trips += 1
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="ok"))])
+
+    def with_structured_output(self, schema, **kwargs):
+        return FakeStructuredOutput(self, schema)
+
+
+async def run(extract, model, resumes):
+    model.round_trips = 0
+    start = time.perf_counter()
+    await asyncio.gather(*(extract(resume) for resume in resumes))
+    return time.perf_counter() - start, model.round_trips
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--duplicates", type=float, default=0.2, help="Share of requests repeating an earlier resume")
+    parser.add_argument("--max-concurrency", type=int, default=100,
+                        help="Calls in flight per GeminiClient method, below --requests it queues the rest")
+    args = parser.parse_args()
+
+    resumes = []
+    for index in range(args.requests):
+        if resumes and random.random() < args.duplicates:
+            resumes.append(random.choice(resumes))
+        else:
+            resumes.append(f"Resume {index}: python developer with {index % 10} years of experience")
+
+    model = FakeStructuredChatModel(latency_ms=args.latency_ms)
+    structured_output = model.with_structured_output(ResumeDetails)
+    elapsed, round_trips = await run(structured_output.ainvoke, model, resumes)
+    print(f"{'before (one call per request)':32} {args.requests} requests  {round_trips:4} round trips  "
+          f"{elapsed * 1000:8.1f} ms")
+
+    model = FakeStructuredChatModel(latency_ms=args.latency_ms)
+    client = GeminiClient(llm=model, model=model, max_concurrency=args.max_concurrency)
+    elapsed, round_trips = await run(client.extract_key_info_from_resume, model, resumes)
+    print(f"{'after (coalesced)':32} {args.requests} requests  {round_trips:4} round trips  "
+          f"{elapsed * 1000:8.1f} ms  {len(set(resumes))} distinct resumes")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+# bench_startup.py
+# Compares the time a fresh interpreter takes to import the API when every heavy module is
+# loaded up front (before) and when they are loaded on first use (after), the bulk of the
+# cold start and of every uvicorn worker spawn. No database is needed, nothing connects.
+#
+# Usage:
+#   python -m benchmarks.bench_startup
+#   python -m benchmarks.bench_startup --runs 10
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# The modules main.py used to import, directly or through its singletons, before startup went lazy.
+EAGER_MODULES = ["llm.gemini", "db.jobs_schema", "db.snapshot", "recommender.vector_index",
+                 "recommender.similarity_table", "recommender.search_engine", "recommender.query_planner",
+                 "recommender.resume_matcher", "recommender.skill_index", "db.query_sandbox",
+                 "utils.text_extraction", "pypdf", "docx", "scrapers.naukri_scraper"]
+
+# Reported when any of them ends up in sys.modules.
+HEAVY_MODULES = ["langchain", "langchain_google_genai", "mongoengine", "numpy", "pypdf", "docx",
+                 "patchright", "pymongo"]
+
+IMPORT_SCRIPT = """
+import importlib, json, sys, time
+start = time.perf_counter()
+import main
+for name in {modules!r}:
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        pass
+elapsed = time.perf_counter() - start
+print(json.dumps({{"ms": elapsed * 1000, "loaded": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def time_import(modules, runs):
+    script = IMPORT_SCRIPT.format(modules=modules, heavy=HEAVY_MODULES)
+    # The LLM client is not built at import, but the env var keeps the eager run from failing on it
+    env = {**os.environ, "GOOGLE_API_KEY": os.environ.get("GOOGLE_API_KEY", "benchmark")}
+    timings, loaded = [], []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True, env=env,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        result = json.loads(output.stdout.strip().splitlines()[-1])
+        timings.append(result["ms"])
+        loaded = result["loaded"]
+    return timings, loaded
+
+
+def report(label, timings, loaded):
+    print(f"{label:<7} median {statistics.median(timings):7.1f} ms   min {min(timings):7.1f} ms   "
+          f"heavy modules loaded: {', '.join(loaded) or 'none'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters started per mode")
+    args = parser.parse_args()
+
+    # One throwaway run of each so both modes read .pyc files from a warm page cache
+    time_import(EAGER_MODULES, 1)
+    time_import([], 1)
+    before, before_loaded = time_import(EAGER_MODULES, args.runs)
+    after, after_loaded = time_import([], args.runs)
+    print(f"import main, {args.runs} fresh interpreters per mode")
+    report("before", before, before_loaded)
+    report("after", after, after_loaded)
+    print(f"cold start {statistics.median(before) / statistics.median(after):.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
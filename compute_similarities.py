@@ -0,0 +1,12 @@
+import sys
+from db.db_client import DatabaseClient
+from recommender.similarity_table import SimilarityTable
+from log.logger_config import configured_logger
+from loguru import logger
+
+# Precomputes the similar jobs served by /jobs/recommend-similar into the 'JobSimilarities' collection.
+# Only the neighbourhoods of jobs changed since the last run are recomputed, pass --full to recompute every job.
+db_client = DatabaseClient()
+similarity_table = SimilarityTable(db_client)
+written = similarity_table.rebuild() if "--full" in sys.argv else similarity_table.refresh()
+logger.info(f"{written} no. of similar job lists written.")
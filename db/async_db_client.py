@@ -0,0 +1,75 @@
+# async_db_client.py
+import asyncio
+import functools
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from log.logger_config import configured_logger
+from loguru import logger
+
+
+class AsyncDatabaseClient:
+    """
+    An asyncio friendly wrapper around DatabaseClient.
+
+    PyMongo is synchronous, so every call is run on a bounded thread pool instead of the
+    event loop. Slow queries then only hold a worker thread, while health checks and other
+    requests keep being served.
+    """
+
+    def __init__(self, db_client, max_workers: int = 8):
+        """
+        Args:
+            db_client (DatabaseClient): The synchronous client to wrap.
+            max_workers (int): The maximum number of queries running at the same time.
+        """
+        self.db_client = db_client
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mongo")
+        logger.info(f"✅ Async database client ready with {max_workers} workers")
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Runs any blocking callable on the database thread pool.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def run_query(self, collection_name, query={}, **kwargs):
+        return await self.run(self.db_client.run_query, collection_name, query, **kwargs)
+
+    async def run_paged_query(self, collection_name, query={}, **kwargs):
+        return await self.run(self.db_client.run_paged_query, collection_name, query, **kwargs)
+
+    async def stream_query(self, collection_name, query={}, batch_size=100, **kwargs):
+        """
+        Asynchronously iterates over the documents matching a query.
+
+        Documents are pulled from the cursor `batch_size` at a time on the thread pool, so the
+        caller can start sending results before the query has finished.
+        """
+        documents = self.db_client.iter_query(collection_name, query, batch_size=batch_size, **kwargs)
+        try:
+            while True:
+                batch = await self.run(lambda: list(itertools.islice(documents, batch_size)))
+                for document in batch:
+                    yield document
+                if len(batch) < batch_size:
+                    break
+        finally:
+            # Closes the cursor, also when the client went away mid stream
+            await self.run(documents.close)
+
+    async def insert_from_json(self, collection_name, file_path):
+        return await self.run(self.db_client.insert_from_json, collection_name, file_path)
+
+    async def get_collection_version(self, collection_name):
+        return await self.run(self.db_client.get_collection_version, collection_name)
+
+    async def bump_collection_version(self, collection_name):
+        return await self.run(self.db_client.bump_collection_version, collection_name)
+
+    def close(self):
+        """
+        Waits for running queries to finish and stops the thread pool.
+        """
+        self._executor.shutdown(wait=True)
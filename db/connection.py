@@ -0,0 +1,220 @@
+# connection.py
+# The one place MongoClients are created. Every DatabaseClient of a process (API, agent tool,
+# seed and backfill scripts, scraper) shares one pooled client per connection settings, so a
+# uvicorn worker opens at most `max_pool_size` connections however many components it runs.
+import os
+import threading
+from typing import Any, Dict, Literal, Optional
+from dotenv import load_dotenv
+from pydantic import BaseModel
+from pymongo import MongoClient
+from pymongo.monitoring import ConnectionPoolListener
+from log.logger_config import configured_logger
+from loguru import logger
+
+load_dotenv()
+
+
+class MongoSettings(BaseModel):
+    """
+    Connection and pool settings, every field can be set with a MONGO_<FIELD> environment
+    variable, e.g. MONGO_MAX_POOL_SIZE=50. "none" lifts an optional limit.
+    """
+    uri: str = "mongodb://localhost:27017/"
+    database: str = "JobReco"
+    # Per process, so the database sees up to workers * max_pool_size connections
+    max_pool_size: int = 20
+    min_pool_size: int = 0
+    max_idle_time_ms: Optional[int] = 5 * 60 * 1000
+    # How long a query waits for a free connection before it fails, instead of queueing forever
+    wait_queue_timeout_ms: Optional[int] = 10_000
+    server_selection_timeout_ms: int = 5_000
+    connect_timeout_ms: int = 5_000
+    socket_timeout_ms: Optional[int] = 60_000
+    read_preference: Literal["primary", "primaryPreferred", "secondary", "secondaryPreferred", "nearest"] = "primary"
+    # e.g. "zstd,zlib", negotiated with the server. Off by default, it only pays off over a network.
+    compressors: str = ""
+    app_name: str = "mini-job-recommendation"
+
+    @classmethod
+    def from_env(cls) -> "MongoSettings":
+        values = {}
+        for field in cls.model_fields:
+            value = os.getenv(f"MONGO_{field.upper()}")
+            if value is not None and value != "":
+                values[field] = None if value.lower() == "none" else value
+        return cls(**values)
+
+
+class PoolMetrics(ConnectionPoolListener):
+    """
+    Counts the connection pool events of every client created by this module.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.pools = 0
+            self.pool_clears = 0
+            self.opened = 0
+            self.closed = 0
+            self.in_use = 0
+            self.peak_in_use = 0
+            self.waiting = 0
+            self.peak_waiting = 0
+            self.checkouts = 0
+            self.checkout_failures: Dict[str, int] = {}
+            self.wait_ms_total = 0.0
+            self.wait_ms_max = 0.0
+
+    def pool_created(self, event):
+        with self._lock:
+            self.pools += 1
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event):
+        with self._lock:
+            self.pools -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.opened += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.closed += 1
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self.waiting += 1
+            self.peak_waiting = max(self.peak_waiting, self.waiting)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.waiting -= 1
+            reason = str(event.reason)
+            self.checkout_failures[reason] = self.checkout_failures.get(reason, 0) + 1
+
+    def connection_checked_out(self, event):
+        wait_ms = (getattr(event, "duration", None) or 0.0) * 1000
+        with self._lock:
+            self.waiting -= 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            self.checkouts += 1
+            self.wait_ms_total += wait_ms
+            self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pools": self.pools,
+                "open_connections": self.opened - self.closed,
+                "connections_created": self.opened,
+                "connections_closed": self.closed,
+                "in_use": self.in_use,
+                "peak_in_use": self.peak_in_use,
+                "waiting": self.waiting,
+                "peak_waiting": self.peak_waiting,
+                "checkouts": self.checkouts,
+                "checkout_failures": dict(self.checkout_failures),
+                "avg_checkout_wait_ms": round(self.wait_ms_total / self.checkouts, 3) if self.checkouts else 0.0,
+                "max_checkout_wait_ms": round(self.wait_ms_max, 3),
+                "pool_clears": self.pool_clears,
+            }
+
+
+pool_metrics = PoolMetrics()
+
+_settings: Optional[MongoSettings] = None
+_clients: Dict[str, MongoClient] = {}
+_clients_pid = os.getpid()
+_clients_lock = threading.Lock()
+
+
+def get_settings() -> MongoSettings:
+    """Returns the settings read from the environment, once per process."""
+    global _settings
+    if _settings is None:
+        _settings = MongoSettings.from_env()
+    return _settings
+
+
+def client_options(settings: Optional[MongoSettings] = None) -> Dict[str, Any]:
+    """
+    Returns the MongoClient keyword arguments of some settings, also accepted by mongoengine's connect().
+    """
+    settings = settings or get_settings()
+    options = {
+        "maxPoolSize": settings.max_pool_size,
+        "minPoolSize": settings.min_pool_size,
+        "maxIdleTimeMS": settings.max_idle_time_ms,
+        "waitQueueTimeoutMS": settings.wait_queue_timeout_ms,
+        "serverSelectionTimeoutMS": settings.server_selection_timeout_ms,
+        "connectTimeoutMS": settings.connect_timeout_ms,
+        "socketTimeoutMS": settings.socket_timeout_ms,
+        "readPreference": settings.read_preference,
+        "appname": settings.app_name,
+        "event_listeners": [pool_metrics],
+    }
+    if settings.compressors:
+        options["compressors"] = settings.compressors
+    return options
+
+
+def get_client(settings: Optional[MongoSettings] = None) -> MongoClient:
+    """
+    Returns the shared MongoClient of some settings, creating it on first use.
+
+    MongoClient is thread-safe but not fork-safe, a forked process gets clients of its own.
+
+    Args:
+        settings (MongoSettings, optional): Defaults to the settings of the environment.
+    """
+    global _clients_pid
+    settings = settings or get_settings()
+    key = settings.model_dump_json()
+    with _clients_lock:
+        if _clients_pid != os.getpid():
+            # The parent's sockets must not be used, nor closed, from here
+            _clients.clear()
+            pool_metrics.reset()
+            _clients_pid = os.getpid()
+        if key not in _clients:
+            _clients[key] = MongoClient(settings.uri, **client_options(settings))
+            logger.info(f"✅ MongoDB client created, pool of {settings.max_pool_size} connections, "
+                        f"read preference '{settings.read_preference}'"
+                        f"{', compressors ' + settings.compressors if settings.compressors else ''}")
+        return _clients[key]
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Returns the pool metrics of this process and the pool limits they run against."""
+    settings = get_settings()
+    return {**pool_metrics.stats(), "clients": len(_clients), "max_pool_size": settings.max_pool_size,
+            "read_preference": settings.read_preference, "compressors": settings.compressors or None}
+
+
+def close_clients():
+    """Closes every shared client of this process."""
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+    logger.info("🔌 MongoDB clients closed.")
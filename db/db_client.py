@@ -1,44 +1,74 @@
 # db_client.py
 import json
-from pymongo import MongoClient
+import datetime
+import base64
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument, ASCENDING
 from pymongo.collection import Collection
-from pymongo.errors import ConnectionFailure
-from db.jobs_schema import JobDocument
+from pymongo.errors import PyMongoError
+from db.connection import get_client, get_settings, close_clients
+from db.indexes import JOBS_COLLECTION, add_shadow_fields, bootstrap_jobs_collection
+from utils.json_stream import iter_json_documents
 from log.logger_config import configured_logger
 from loguru import logger
+
+# Keeps one document per collection with the version of its data.
+META_COLLECTION = "Meta"
+
+def encode_page_token(last_id):
+    return base64.urlsafe_b64encode(str(last_id).encode("utf-8")).decode("ascii")
+
+def decode_page_token(page_token):
+    """
+    Turns a page token back into the ObjectId it was built from.
+
+    Raises:
+        ValueError: If the token is not a valid page token.
+    """
+    try:
+        return ObjectId(base64.urlsafe_b64decode(page_token.encode("ascii")).decode("utf-8"))
+    except (InvalidId, ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid page token: {page_token}") from e
+
 class DatabaseClient:
     """
     A generic client for interacting with a MongoDB database.
     """
 
-    def __init__(self, host='localhost', port=27017, db_name='JobReco'):
+    def __init__(self, host=None, port=None, db_name=None, settings=None):
         """
-        Initializes the connection to the MongoDB server and selects a database.
+        Selects a database on the shared, pooled client of the connection settings.
 
         Args:
-            host (str): The database server host.
-            port (int): The database server port.
-            db_name (str): The name of the database to connect to.
+            host (str, optional): The database server host, overrides the MONGO_URI setting.
+            port (int, optional): The database server port, used with `host`.
+            db_name (str, optional): The name of the database, defaults to the MONGO_DATABASE setting.
+            settings (MongoSettings, optional): Defaults to the settings of the environment.
         """
+        settings = settings or get_settings()
+        if host is not None:
+            settings = settings.model_copy(update={"uri": f'mongodb://{host}:{port or 27017}/'})
+        db_name = db_name or settings.database
         try:
-            connection_string = f'mongodb://{host}:{port}/'
-            self.client = MongoClient(connection_string)
+            self.client = get_client(settings)
             # The ismaster command is cheap and does not require auth.
             self.client.admin.command('ismaster')
             self.db = self.client[db_name]
             logger.info(f"✅ Successfully connected to MongoDB database: '{db_name}'")
-        except ConnectionFailure as e:
+        except PyMongoError as e:
             logger.error(f"❌ Could not connect to MongoDB: {e}")
             self.client = None
             self.db = None
 
-    def insert_from_json(self, collection_name, file_path):
+    def insert_from_json(self, collection_name, file_path, batch_size=500):
         """
         Inserts data from a JSON file into a specified collection.
 
         Args:
             collection_name (str): The name of the collection.
-            file_path (str): The path to the JSON file.
+            file_path (str): The path to the JSON file (a list of documents, a single document or NDJSON).
+            batch_size (int): The number of documents sent per insert_many.
 
         Returns:
             bool: True if insertion was successful, False otherwise.
@@ -50,16 +80,21 @@ class DatabaseClient:
         collection = self.db[collection_name]
         logger.info(f"\n Inserting data from '{file_path}' into collection '{collection_name}'...")
         try:
-            with open(file_path, 'r') as f:
-                data = json.load(f)
-            
-            # If the json file contains a list of documents
-            if isinstance(data, list):
-                collection.insert_many(data)
-            # If the json file contains a single document
-            else:
-                collection.insert_one(data)
+            # The file is streamed and inserted in batches, it is never fully loaded in memory
+            batch = []
+            for document in iter_json_documents(file_path):
+                if collection_name == JOBS_COLLECTION:
+                    add_shadow_fields(document)
+                batch.append(document)
+                if len(batch) >= batch_size:
+                    collection.insert_many(batch, ordered=False)
+                    batch = []
+            if batch:
+                collection.insert_many(batch, ordered=False)
             
+            if collection_name == JOBS_COLLECTION:
+                bootstrap_jobs_collection(self.db)
+            self.bump_collection_version(collection_name)
             logger.info("✅ Data inserted successfully.")
             return True
         except FileNotFoundError:
@@ -69,16 +104,22 @@ class DatabaseClient:
             logger.info(f"❌ An error occurred during insertion: {e}")
             return False
 
-    def run_query(self, collection_name, query={}, DocumentType=JobDocument):
+    def run_query(self, collection_name, query={}, DocumentType=None, projection=None,
+                  sort=None, skip=0, limit=0, ids_only=False):
         """
         Runs a query on a specified collection.
 
         Args:
             collection_name (str): The name of the collection to query.
             query (dict): The MongoDB query filter. An empty dict {} will find all documents.
+            projection (dict, optional): The fields to include or exclude, e.g. {"job_description": 0}.
+            sort (list, optional): A list of (field, direction) pairs.
+            skip (int): The number of matching documents to skip.
+            limit (int): The maximum number of documents to return, 0 means no limit.
+            ids_only (bool): Only fetch the '_id' of the matching documents and return them as strings.
 
         Returns:
-            list: A list of documents matching the query, or an empty list if an error occurs.
+            list: A list of documents (or ids) matching the query, or an empty list if an error occurs.
         """
         if self.db is None:
             logger.info("❌ Cannot run query, no database connection.")
@@ -88,29 +129,146 @@ class DatabaseClient:
         # logger.info("collection name :", collection, type(collection))
         logger.info(f"\n🔍 Running query on '{collection_name}'")
         try:
-            query_results = collection.find(query).to_list()
-            def process_results(result):
-                if "_id" in result:
-                    result["_id"] = str(result["_id"])
-                return result
-            processed_result = list(map(process_results, query_results))
+            if ids_only:
+                projection = {"_id": 1}
+            cursor = self._find(collection, query, projection, sort, skip, limit)
+
+            if ids_only:
+                processed_result = [str(result["_id"]) for result in cursor]
+            else:
+                processed_result = []
+                for result in cursor:
+                    if "_id" in result:
+                        result["_id"] = str(result["_id"])
+                    processed_result.append(result)
             logger.info("✅ Query executed successfully.")
             return processed_result
         except Exception as e:
             logger.info(f"❌ An error occurred while running the query: {e}")
             return []
 
+    def _find(self, collection, query, projection=None, sort=None, skip=0, limit=0, batch_size=0, max_time_ms=0):
+        cursor = collection.find(query, projection)
+        if max_time_ms:
+            cursor = cursor.max_time_ms(max_time_ms)
+        if sort:
+            cursor = cursor.sort(sort)
+        if skip:
+            cursor = cursor.skip(skip)
+        if limit:
+            cursor = cursor.limit(limit)
+        if batch_size:
+            cursor = cursor.batch_size(batch_size)
+        return cursor
+
+    def iter_query(self, collection_name, query={}, projection=None, sort=None, limit=0, batch_size=100):
+        """
+        Lazily iterates over the documents matching a query, one server batch at a time.
+
+        Unlike run_query, only `batch_size` documents are held in memory at once.
+
+        Args:
+            collection_name (str): The name of the collection to query.
+            query (dict): The MongoDB query filter.
+            projection (dict, optional): The fields to include or exclude.
+            sort (list, optional): A list of (field, direction) pairs.
+            limit (int): The maximum number of documents to return, 0 means no limit.
+            batch_size (int): The number of documents fetched from the server per round trip.
+
+        Yields:
+            dict: The matching documents with their '_id' as a string.
+        """
+        if self.db is None:
+            logger.info("❌ Cannot run query, no database connection.")
+            return
+        collection = self.db.get_collection(collection_name)
+        logger.info(f"\n🔍 Streaming query on '{collection_name}'")
+        with self._find(collection, query, projection, sort, 0, limit, batch_size) as cursor:
+            for result in cursor:
+                if "_id" in result:
+                    result["_id"] = str(result["_id"])
+                yield result
+
+    def run_paged_query(self, collection_name, query={}, projection=None, page_size=20, page_token=None):
+        """
+        Runs a query one page at a time, using the '_id' of the last returned document as a cursor.
+
+        Unlike skip/limit, the cost of fetching a page does not grow with the page number.
+
+        Args:
+            collection_name (str): The name of the collection to query.
+            query (dict): The MongoDB query filter.
+            projection (dict, optional): The fields to include or exclude.
+            page_size (int): The number of documents per page.
+            page_token (str, optional): The 'next_page_token' returned with the previous page.
+
+        Returns:
+            dict: The documents under 'data' and the token of the following page under
+            'next_page_token' (None on the last page).
+
+        Raises:
+            ValueError: If page_size is below 1 or the page token is not valid.
+        """
+        if not isinstance(page_size, int) or page_size < 1:
+            raise ValueError(f"page_size must be a positive integer, got {page_size!r}")
+        if page_token:
+            after_id = decode_page_token(page_token)
+            query = {"$and": [query, {"_id": {"$gt": after_id}}]} if query else {"_id": {"$gt": after_id}}
+        # Fetch one extra document to know if there is a next page
+        results = self.run_query(collection_name, query, projection=projection,
+                                 sort=[("_id", ASCENDING)], limit=page_size + 1)
+        next_page_token = None
+        if len(results) > page_size:
+            results = results[:page_size]
+            next_page_token = encode_page_token(results[-1]["_id"])
+        return {"data": results, "next_page_token": next_page_token}
+
+    def get_collection_version(self, collection_name):
+        """
+        Returns the data version of a collection, bumped every time it is reseeded or re-scraped.
+
+        Args:
+            collection_name (str): The name of the collection.
+
+        Returns:
+            int: The current version, 0 if the collection was never versioned.
+        """
+        if self.db is None:
+            return 0
+        meta = self.db[META_COLLECTION].find_one({"_id": collection_name})
+        return meta.get("version", 0) if meta else 0
+
+    def bump_collection_version(self, collection_name):
+        """
+        Marks the data of a collection as changed, so caches built on top of it are invalidated.
+
+        Args:
+            collection_name (str): The name of the collection.
+
+        Returns:
+            int: The new version.
+        """
+        if self.db is None:
+            logger.info("❌ Cannot bump collection version, no database connection.")
+            return 0
+        meta = self.db[META_COLLECTION].find_one_and_update(
+            {"_id": collection_name},
+            {"$inc": {"version": 1}, "$set": {"updated_at": datetime.datetime.now(datetime.timezone.utc)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER)
+        logger.info(f"🔖 '{collection_name}' is now at version {meta['version']}")
+        return meta["version"]
+
     def close_connection(self):
         """
-        Closes the connection to the MongoDB server.
+        Closes the connections to the MongoDB server. The client is shared, so every
+        DatabaseClient of the process is closed with it; call it when the process is done.
         """
         if self.client:
-            self.client.close()
-            logger.info("\n🔌 Connection to MongoDB closed.")
-            
-            
+            close_clients()
+
 if __name__ == "__main__":
-    db_client = DatabaseClient(db_name="JobReco")
+    db_client = DatabaseClient()
     results = db_client.run_query("Jobs", {"title": {"$regex": "Developer"}})
     logger.info(results)
     logger.info(len(results))
@@ -0,0 +1,249 @@
+# indexes.py
+import re
+from typing import NamedTuple, Optional
+from pymongo import ASCENDING, DESCENDING, TEXT, UpdateOne
+from pymongo.errors import OperationFailure
+from utils.string_utils import split_locations, extract_naukri_job_id
+from log.logger_config import configured_logger
+from loguru import logger
+
+JOBS_COLLECTION = "Jobs"
+ARCHIVE_COLLECTION = "JobsArchive"
+
+# Archived jobs are deleted by MongoDB this long after they were archived.
+ARCHIVE_TTL_DAYS = 365
+
+# Lowercase copies of fields the agent and the planner filter on case-insensitively.
+# An exact or anchored match on them can use an index, a case-insensitive $regex can not.
+SHADOW_FIELDS = {
+    "location": "location_lower",
+    "key_skills": "key_skills_lower",
+}
+# Shadow fields holding the parts of their source string (split_locations) rather than all of it.
+SPLIT_SHADOW_FIELDS = {"location"}
+# Every derived field added by shadow_fields().
+DERIVED_FIELDS = list(SHADOW_FIELDS.values()) + ["naukri_id"]
+
+# name -> (keys, options)
+JOBS_INDEXES = {
+    # Over the clean description text, indexing the raw html would index its markup too
+    "jobs_text": ([("title", TEXT), ("key_skills", TEXT), ("description_text", TEXT)],
+                  {"weights": {"title": 10, "key_skills": 5, "description_text": 1},
+                   "default_language": "english"}),
+    "location_lower_1": ([("location_lower", ASCENDING)], {}),
+    "key_skills_lower_1": ([("key_skills_lower", ASCENDING)], {}),
+    "naukri_id_1": ([("naukri_id", ASCENDING)],
+                    {"unique": True, "partialFilterExpression": {"naukri_id": {"$type": "string"}}}),
+    "experience_min_years_1_experience_max_years_1": (
+        [("experience_min_years", ASCENDING), ("experience_max_years", ASCENDING)], {}),
+    # Recent jobs queries and the archival of old ones
+    "posted_at_-1": ([("posted_at", DESCENDING)], {}),
+}
+
+ARCHIVE_INDEXES = {
+    "archived_at_ttl": ([("archived_at", ASCENDING)], {"expireAfterSeconds": ARCHIVE_TTL_DAYS * 24 * 3600}),
+}
+
+# Characters that make a regex more than a plain literal.
+REGEX_METACHARACTERS = re.compile(r"[.^$*+?()\[\]{}|\\]")
+
+
+def shadow_fields(job):
+    """
+    Computes the lowercase shadow fields of a job document.
+
+    Only the fields whose source is in the job are computed, so a listing scraped without its
+    detail page (no 'key_skills') does not overwrite the stored skills with an empty list.
+
+    Args:
+        job (dict): A job document.
+
+    Returns:
+        dict: The shadow fields, e.g. {"location_lower": ["pune", "mumbai"], "key_skills_lower": [...], "naukri_id": "..."}.
+    """
+    fields = {}
+    if "location" in job:
+        fields["location_lower"] = [location.lower() for location in split_locations(job.get("location"))]
+    if "key_skills" in job:
+        skills = [skill.strip().lower() for skill in job.get("key_skills") or []]
+        fields["key_skills_lower"] = [skill for skill in skills if skill]
+    if "link" in job:
+        # The stable id of the job on naukri, incremental scrapes upsert on it
+        fields["naukri_id"] = extract_naukri_job_id(job.get("link"))
+    return fields
+
+
+def add_shadow_fields(job):
+    """
+    Adds the shadow fields to a job document in place, before it is inserted.
+    """
+    job.update(shadow_fields(job))
+    return job
+
+
+def backfill_shadow_fields(db, collection_name=JOBS_COLLECTION, batch_size=500):
+    """
+    Adds the shadow fields to every document of the collection that does not have them yet.
+
+    Returns:
+        int: The number of documents updated.
+    """
+    collection = db[collection_name]
+    missing = {"$or": [{field: {"$exists": False}} for field in DERIVED_FIELDS]}
+    cursor = collection.find(missing, {"location": 1, "key_skills": 1, "link": 1}, batch_size=batch_size)
+    updated = 0
+    operations = []
+    for job in cursor:
+        # A stored job without a source field has none, its shadow field is set empty once
+        fields = {"location_lower": [], "key_skills_lower": [], "naukri_id": None, **shadow_fields(job)}
+        operations.append(UpdateOne({"_id": job["_id"]}, {"$set": fields}))
+        if len(operations) >= batch_size:
+            updated += collection.bulk_write(operations, ordered=False).modified_count
+            operations = []
+    if operations:
+        updated += collection.bulk_write(operations, ordered=False).modified_count
+    if updated:
+        logger.info(f"✅ Backfilled shadow fields of {updated} documents in '{collection_name}'")
+    return updated
+
+
+def ensure_indexes(db, collection_name=JOBS_COLLECTION, indexes=JOBS_INDEXES):
+    """
+    Creates the indexes the queries on the collection rely on.
+
+    An existing index with the same name but different keys (e.g. a text index over other
+    fields, only one text index is allowed per collection) is dropped and rebuilt.
+    """
+    collection = db[collection_name]
+    existing = collection.index_information()
+    for name, (keys, options) in indexes.items():
+        current = existing.get(name)
+        if current is not None:
+            same_keys = current.get("key") == keys
+            # Text indexes are reported with internal keys, compare their weights instead
+            if current.get("weights") is not None:
+                same_keys = set(current["weights"]) == {field for field, _ in keys}
+            if same_keys:
+                continue
+            logger.info(f"🔁 Rebuilding index '{name}' on '{collection_name}'")
+            collection.drop_index(name)
+        elif any(index_type == TEXT for _, index_type in keys):
+            # Drop any other text index, there can only be one
+            for other_name, other in existing.items():
+                if other.get("weights") is not None:
+                    collection.drop_index(other_name)
+        try:
+            collection.create_index(keys, name=name, **options)
+            logger.info(f"✅ Created index '{name}' on '{collection_name}'")
+        except OperationFailure as e:
+            logger.error(f"❌ Could not create index '{name}' on '{collection_name}': {e}")
+
+
+def bootstrap_jobs_collection(db):
+    """
+    Makes sure the 'Jobs' collection has its shadow fields and indexes, and the archive its TTL index.
+    Run at application startup and after every seed or scrape.
+    """
+    if db is None:
+        logger.info("❌ Cannot bootstrap indexes, no database connection.")
+        return
+    backfill_shadow_fields(db)
+    ensure_indexes(db)
+    ensure_indexes(db, ARCHIVE_COLLECTION, ARCHIVE_INDEXES)
+
+
+class RegexLiteral(NamedTuple):
+    """The plain text a literal regex searches for, and where it is anchored."""
+    text: str
+    anchored_start: bool
+    anchored_end: bool
+
+
+def literal_from_regex(pattern) -> Optional[RegexLiteral]:
+    """
+    Reads a regex like "pune", "^pune", ".*spring boot.*" or "\\.net" as the text it searches for,
+    or returns None if the regex uses real regex features. "^pune" is anchored at the start,
+    "pune" and ".*pune" are not.
+    """
+    anchored_start = anchored_end = False
+    if pattern.startswith("^"):
+        pattern, anchored_start = pattern[1:], True
+    if pattern.startswith(".*"):
+        pattern, anchored_start = pattern[2:], False
+    if pattern.endswith("$") and not pattern.endswith("\\$"):
+        pattern, anchored_end = pattern[:-1], True
+    if pattern.endswith(".*") and not pattern.endswith("\\.*"):
+        pattern, anchored_end = pattern[:-2], False
+    if re.search(r"\\[A-Za-z0-9]", pattern) or REGEX_METACHARACTERS.search(re.sub(r"\\.", "", pattern)):
+        return None
+    text = re.sub(r"\\(.)", r"\1", pattern)
+    return RegexLiteral(text, anchored_start, anchored_end) if text else None
+
+
+def _shadow_regex(field, literal: RegexLiteral):
+    # The shadow field holds stripped lowercase items, text with edge spaces can not match them the same way
+    if literal.text != literal.text.strip():
+        return None
+    if field in SPLIT_SHADOW_FIELDS:
+        # An anchor or a separator refers to the whole string, which the shadow field no longer has
+        if literal.anchored_start or literal.anchored_end or re.search(r"[,/-]", literal.text):
+            return None
+    return f"{'^' if literal.anchored_start else ''}{re.escape(literal.text.lower())}{'$' if literal.anchored_end else ''}"
+
+
+def _shadow_values(field, values):
+    # What exact values of the source field look like in its shadow field, None if one can not be found there
+    if not isinstance(values, list) or not all(isinstance(value, str) and value.strip() for value in values):
+        return None
+    if field in SPLIT_SHADOW_FIELDS:
+        places = [split_locations(value) for value in values]
+        if any(len(parts) != 1 for parts in places):
+            return None
+        return [parts[0].lower() for parts in places]
+    return [value.strip().lower() for value in values]
+
+
+def rewrite_regex_filters(query):
+    """
+    Rewrites case-insensitive regex filters on shadowed fields into case-sensitive regexes on
+    their lowercase copy, which MongoDB answers from the index instead of the documents.
+
+    {"key_skills": {"$regex": "^spring", "$options": "i"}} becomes
+    {"key_skills_lower": {"$regex": "^spring"}}, an index range scan, and
+    {"key_skills": {"$regex": "sql", "$options": "i"}} becomes {"key_skills_lower": {"$regex": "sql"}},
+    still a substring match. An exact {"key_skills": {"$in": [...]}} gets the same $in on the
+    lowercase copy next to it, so the index narrows the jobs down and the exact match still
+    decides. The rewrite never changes which jobs match: regexes that use real regex features,
+    and values the lowercase copy can not answer the same way (e.g. "Pune, Mumbai" among the
+    split places of location_lower), are left untouched.
+
+    Args:
+        query (dict): A MongoDB query filter.
+
+    Returns:
+        dict: The rewritten filter. The input is not modified.
+    """
+    if isinstance(query, list):
+        return [rewrite_regex_filters(item) for item in query]
+    if not isinstance(query, dict):
+        return query
+
+    rewritten = {}
+    for field, condition in query.items():
+        if field in SHADOW_FIELDS and isinstance(condition, dict) and isinstance(condition.get("$regex"), str) \
+                and condition.get("$options") == "i" and set(condition) == {"$regex", "$options"}:
+            literal = literal_from_regex(condition["$regex"])
+            regex = _shadow_regex(field, literal) if literal is not None else None
+            if regex is not None:
+                rewritten[SHADOW_FIELDS[field]] = {"$regex": regex}
+                continue
+        if field in SHADOW_FIELDS and isinstance(condition, dict) and set(condition) == {"$in"} \
+                and SHADOW_FIELDS[field] not in query:
+            values = _shadow_values(field, condition["$in"])
+            if values is not None:
+                # The index narrows the jobs down on the lowercase copy, the exact match keeps its meaning
+                rewritten[SHADOW_FIELDS[field]] = {"$in": values}
+                rewritten[field] = condition
+                continue
+        rewritten[field] = rewrite_regex_filters(condition) if field.startswith("$") else condition
+    return rewritten
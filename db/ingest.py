@@ -0,0 +1,98 @@
+# ingest.py
+import asyncio
+import json
+import os
+from db.job_store import upsert_jobs, load_known_jobs
+from log.logger_config import configured_logger
+from loguru import logger
+
+_CLOSE = object()
+
+
+class JobIngestPipeline:
+    """
+    Streams scraped jobs into MongoDB as they are produced.
+
+    Producers `put` jobs on a bounded asyncio queue. A single consumer groups them into
+    batches and upserts every batch with one unordered bulk_write (see upsert_jobs), and can
+    append them to an NDJSON file. Memory use is bounded by the queue and batch sizes
+    instead of the size of the scrape.
+    """
+
+    def __init__(self, db, batch_size=100, queue_size=1000, flush_interval=2.0, ndjson_path=None, known_jobs=None):
+        """
+        Args:
+            db: The pymongo database to upsert into.
+            batch_size (int): The number of jobs written per bulk_write.
+            queue_size (int): The maximum number of jobs waiting, `put` blocks when the queue is full.
+            flush_interval (float): Seconds after which a partial batch is written anyway.
+            ndjson_path (str, optional): An append-only NDJSON file every ingested job is also written to.
+            known_jobs (dict, optional): The result of load_known_jobs, loaded on start when omitted.
+        """
+        self.db = db
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.ndjson_path = ndjson_path
+        self.known_jobs = known_jobs
+        self.stats = {"inserted": 0, "updated": 0, "unchanged": 0, "written": 0}
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._consumer = None
+
+    async def start(self):
+        if self.known_jobs is None:
+            self.known_jobs = await asyncio.to_thread(load_known_jobs, self.db)
+        if self.ndjson_path:
+            os.makedirs(os.path.dirname(self.ndjson_path) or ".", exist_ok=True)
+        self._consumer = asyncio.create_task(self._consume())
+        return self
+
+    async def put(self, job):
+        await self._queue.put(job)
+
+    async def close(self):
+        """
+        Writes the remaining jobs and stops the consumer.
+
+        Returns:
+            dict: Counts of 'inserted', 'updated', 'unchanged' and 'written' (to the NDJSON file) jobs.
+        """
+        await self._queue.put(_CLOSE)
+        await self._consumer
+        logger.info(f"✅ Ingest pipeline closed: {self.stats}")
+        return self.stats
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _consume(self):
+        closing = False
+        while not closing:
+            batch = []
+            try:
+                while len(batch) < self.batch_size:
+                    job = await asyncio.wait_for(self._queue.get(), timeout=self.flush_interval)
+                    if job is _CLOSE:
+                        closing = True
+                        break
+                    batch.append(job)
+            except asyncio.TimeoutError:
+                pass
+            if batch:
+                try:
+                    await asyncio.to_thread(self._write_batch, batch)
+                except Exception as e:
+                    # Keep consuming, one failed batch must not block the producers
+                    logger.error(f"❌ Failed to ingest a batch of {len(batch)} jobs: {e}")
+
+    def _write_batch(self, batch):
+        if self.ndjson_path:
+            with open(self.ndjson_path, "a", encoding="utf-8") as ndjson_file:
+                for job in batch:
+                    ndjson_file.write(json.dumps(job, default=str) + "\n")
+            self.stats["written"] += len(batch)
+        batch_stats = upsert_jobs(self.db, batch, self.known_jobs, batch_size=self.batch_size)
+        for key, value in batch_stats.items():
+            self.stats[key] += value
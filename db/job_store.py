@@ -0,0 +1,261 @@
+# job_store.py
+import datetime
+import hashlib
+import json
+from pymongo import UpdateOne, ReplaceOne, DESCENDING
+from db.indexes import JOBS_COLLECTION, ARCHIVE_COLLECTION, add_shadow_fields
+from utils.html_utils import html_to_markdown
+from utils.string_utils import post_date_to_datetime
+from log.logger_config import configured_logger
+from loguru import logger
+
+SCRAPE_RUNS_COLLECTION = "ScrapeRuns"
+
+# Jobs posted longer ago than this are moved out of 'Jobs' into ARCHIVE_COLLECTION.
+JOB_RETENTION_DAYS = 60
+
+# Listing fields shown on the search result page. post_date is left out on purpose,
+# "1 day ago" becomes "2 days ago" without the job changing.
+LISTING_HASH_FIELDS = ("title", "company", "location", "experience", "link")
+CONTENT_HASH_FIELDS = LISTING_HASH_FIELDS + ("key_skills", "job_description")
+
+def _hash_fields(job, fields):
+    payload = json.dumps([job.get(field) for field in fields], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def listing_hash(job):
+    return _hash_fields(job, LISTING_HASH_FIELDS)
+
+
+def content_hash(job):
+    return _hash_fields(job, CONTENT_HASH_FIELDS)
+
+
+def load_known_jobs(db, collection_name=JOBS_COLLECTION):
+    """
+    Loads the hashes of every stored job, keyed on the naukri job id.
+
+    Returns:
+        dict: naukri_id -> {"listing_hash": str, "content_hash": str}
+    """
+    known = {}
+    cursor = db[collection_name].find({"naukri_id": {"$type": "string"}},
+                                      {"naukri_id": 1, "listing_hash": 1, "content_hash": 1, "_id": 0})
+    for job in cursor:
+        known[job["naukri_id"]] = {"listing_hash": job.get("listing_hash"),
+                                   "content_hash": job.get("content_hash")}
+    return known
+
+
+def add_description_fields(job):
+    """
+    Adds 'description_text' and 'description_sections', the clean text of the html job description,
+    to a job in place. The html is parsed here once, readers use the stored text.
+    """
+    job.update(html_to_markdown(job.get("job_description") or ""))
+    return job
+
+
+def _as_datetime(value):
+    if isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value)
+    if isinstance(value, datetime.datetime) and value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value
+
+
+def prepare_job(job, scraped_at=None):
+    """
+    Adds the hashes, shadow fields (including the naukri id), the clean description text and
+    'posted_at' to a scraped job before it is stored.
+
+    'posted_at' is counted back from the relative post_date and the time the job was scraped:
+    its 'scraped_at' (a datetime or an ISO string, removed from the job), else `scraped_at`, else now.
+    """
+    scraped_at = _as_datetime(job.pop("scraped_at", None)) or scraped_at \
+        or datetime.datetime.now(datetime.timezone.utc)
+    if job.get("posted_at") is None:
+        posted_at = post_date_to_datetime(job.get("post_date"), scraped_at)
+        if posted_at is not None:
+            job["posted_at"] = posted_at
+    job["listing_hash"] = listing_hash(job)
+    if "job_description" in job:
+        job["content_hash"] = content_hash(job)
+        add_description_fields(job)
+    return add_shadow_fields(job)
+
+
+def upsert_jobs(db, jobs, known=None, collection_name=JOBS_COLLECTION, batch_size=500, scraped_at=None):
+    """
+    Upserts scraped jobs on their naukri id, skipping jobs whose content did not change.
+
+    Jobs scraped without a detail page (no 'job_description') only update their listing fields.
+
+    Args:
+        db: The pymongo database.
+        jobs (iterable): Scraped job dicts.
+        known (dict, optional): The result of load_known_jobs, loaded when omitted.
+        batch_size (int): The number of writes sent per bulk_write.
+        scraped_at (datetime, optional): When jobs without their own 'scraped_at' were scraped, now when omitted.
+
+    Returns:
+        dict: Counts of 'inserted', 'updated' and 'unchanged' jobs.
+    """
+    if known is None:
+        known = load_known_jobs(db, collection_name)
+    collection = db[collection_name]
+    stats = {"inserted": 0, "updated": 0, "unchanged": 0}
+    operations = []
+    # The hashes of the queued writes, only known once the write went through. A failed
+    # bulk_write must not leave them behind, or later runs would skip these jobs as unchanged.
+    pending = {}
+    now = datetime.datetime.now(datetime.timezone.utc)
+
+    def flush():
+        if operations:
+            result = collection.bulk_write(operations, ordered=False)
+            stats["inserted"] += result.upserted_count
+            stats["updated"] += result.modified_count
+            operations.clear()
+            known.update(pending)
+            pending.clear()
+
+    for job in jobs:
+        job = prepare_job(dict(job), scraped_at or now)
+        naukri_id = job.get("naukri_id")
+        if naukri_id is None:
+            logger.info(f"Skipping job without a naukri id: {job.get('link')}")
+            continue
+        previous = pending.get(naukri_id) or known.get(naukri_id)
+        if previous and previous["listing_hash"] == job["listing_hash"] \
+                and job.get("content_hash") in (None, previous["content_hash"]):
+            stats["unchanged"] += 1
+            continue
+        job.pop("_id", None)
+        job_id = job.pop("id", None) or naukri_id
+        job["updated_at"] = now
+        update = {"$set": job, "$setOnInsert": {"id": job_id, "created_at": now}}
+        posted_at = job.pop("posted_at", None)
+        if posted_at is not None:
+            # "3+ weeks ago" only bounds the age, keep the earliest time any scrape gave
+            update["$min"] = {"posted_at": posted_at}
+        operations.append(UpdateOne({"naukri_id": naukri_id}, update, upsert=True))
+        pending[naukri_id] = {"listing_hash": job["listing_hash"],
+                              "content_hash": job.get("content_hash", previous and previous["content_hash"])}
+        if len(operations) >= batch_size:
+            flush()
+    flush()
+    logger.info(f"✅ Upserted jobs: {stats}")
+    return stats
+
+
+def backfill_description_fields(db, collection_name=JOBS_COLLECTION, batch_size=200, force=False):
+    """
+    Computes 'description_text' and 'description_sections' for stored jobs that do not have them yet.
+
+    Args:
+        db: The pymongo database.
+        batch_size (int): The number of writes sent per bulk_write.
+        force (bool): Recompute the text of every job, e.g. after the conversion changed.
+
+    Returns:
+        int: The number of documents updated.
+    """
+    collection = db[collection_name]
+    query = {"job_description": {"$type": "string"}}
+    if not force:
+        query["description_text"] = {"$exists": False}
+    cursor = collection.find(query, {"job_description": 1}, batch_size=batch_size)
+    updated = 0
+    operations = []
+    for job in cursor:
+        operations.append(UpdateOne({"_id": job["_id"]}, {"$set": html_to_markdown(job["job_description"])}))
+        if len(operations) >= batch_size:
+            updated += collection.bulk_write(operations, ordered=False).modified_count
+            operations = []
+    if operations:
+        updated += collection.bulk_write(operations, ordered=False).modified_count
+    if updated:
+        logger.info(f"✅ Backfilled description text of {updated} documents in '{collection_name}'")
+    return updated
+
+
+def backfill_posted_at(db, collection_name=JOBS_COLLECTION, batch_size=500):
+    """
+    Computes 'posted_at' for stored jobs that only have the relative post_date.
+
+    The post_date was last written with 'updated_at', which stands in for the scrape time
+    ('created_at', then the ObjectId time for older jobs).
+
+    Returns:
+        int: The number of documents updated.
+    """
+    collection = db[collection_name]
+    cursor = collection.find({"post_date": {"$type": "string"}, "posted_at": {"$exists": False}},
+                             {"post_date": 1, "updated_at": 1, "created_at": 1}, batch_size=batch_size)
+    updated = 0
+    operations = []
+    for job in cursor:
+        scraped_at = _as_datetime(job.get("updated_at") or job.get("created_at")) or job["_id"].generation_time
+        posted_at = post_date_to_datetime(job["post_date"], scraped_at)
+        if posted_at is None:
+            continue
+        operations.append(UpdateOne({"_id": job["_id"]}, {"$set": {"posted_at": posted_at}}))
+        if len(operations) >= batch_size:
+            updated += collection.bulk_write(operations, ordered=False).modified_count
+            operations = []
+    if operations:
+        updated += collection.bulk_write(operations, ordered=False).modified_count
+    if updated:
+        logger.info(f"✅ Backfilled posted_at of {updated} documents in '{collection_name}'")
+    return updated
+
+
+def archive_expired_jobs(db, max_age_days=JOB_RETENTION_DAYS, collection_name=JOBS_COLLECTION, batch_size=500):
+    """
+    Moves jobs posted more than `max_age_days` ago into ARCHIVE_COLLECTION, keeping the
+    collection the indexes and in-process rankers work on small. Archived jobs expire
+    through the TTL index on their 'archived_at'.
+
+    Returns:
+        int: The number of jobs archived.
+    """
+    collection = db[collection_name]
+    archive = db[ARCHIVE_COLLECTION]
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cutoff = now - datetime.timedelta(days=max_age_days)
+    archived = 0
+    while True:
+        jobs = list(collection.find({"posted_at": {"$lt": cutoff}}, limit=batch_size))
+        if not jobs:
+            break
+        # Copy first, a job is only deleted once it is safe in the archive
+        archive.bulk_write([ReplaceOne({"_id": job["_id"]}, {**job, "archived_at": now}, upsert=True)
+                            for job in jobs], ordered=False)
+        archived += collection.delete_many({"_id": {"$in": [job["_id"] for job in jobs]}}).deleted_count
+    if archived:
+        logger.info(f"✅ Archived {archived} jobs posted before {cutoff:%Y-%m-%d} from '{collection_name}'")
+    return archived
+
+
+def get_last_scrape_run(db, search_query):
+    """
+    Returns the last finished scrape run (the watermark) of a search query, or None.
+    """
+    return db[SCRAPE_RUNS_COLLECTION].find_one({"search_query": search_query, "finished_at": {"$ne": None}},
+                                               sort=[("finished_at", DESCENDING)])
+
+
+def record_scrape_run(db, search_query, started_at, start_page, end_page, stats):
+    """
+    Stores the watermark of a finished scrape run.
+    """
+    run = {"search_query": search_query,
+           "started_at": started_at,
+           "finished_at": datetime.datetime.now(datetime.timezone.utc),
+           "start_page": start_page,
+           "end_page": end_page,
+           "stats": stats}
+    db[SCRAPE_RUNS_COLLECTION].insert_one(run)
+    return run
@@ -1,7 +1,21 @@
 from mongoengine import Document, StringField, DateTimeField, ReferenceField, ListField, connect, ObjectIdField
 import datetime
+from pymongo.read_preferences import make_read_preference, read_pref_mode_from_name
+from db.connection import client_options, get_settings
 
-connect(db='JobReco', host='localhost', port=27017)
+def connect_schema(settings=None):
+    """
+    Connects mongoengine, call it before using JobDocument. Importing this module does not connect.
+    It gets the pool size, timeouts and read preference of the shared clients of db.connection.
+
+    Args:
+        settings (MongoSettings, optional): Defaults to the settings of the environment.
+    """
+    settings = settings or get_settings()
+    options = client_options(settings)
+    # mongoengine sets its own read preference unless given as a pymongo ReadPreference
+    read_preference = make_read_preference(read_pref_mode_from_name(options.pop("readPreference")), None)
+    return connect(db=settings.database, host=settings.uri, read_preference=read_preference, **options)
 
 class JobDocument(Document):
     """
@@ -0,0 +1,231 @@
+# query_sandbox.py
+import datetime
+import time
+from typing import Any, Dict, List
+from pymongo.errors import ExecutionTimeout, OperationFailure
+from db.indexes import JOBS_COLLECTION, rewrite_regex_filters
+from log.logger_config import configured_logger
+from loguru import logger
+
+# Collections the agent may query, and the fields it may filter on.
+ALLOWED_FIELDS = {
+    JOBS_COLLECTION: {
+        "_id", "id", "naukri_id", "title", "company", "location", "experience", "experience_min_years",
+        "experience_max_years", "post_date", "link", "key_skills", "job_description",
+        "description_text", "location_lower", "key_skills_lower", "posted_at",
+    },
+}
+
+# Date fields, the agent writes their values as ISO strings ("2025-07-01") which are turned into datetimes.
+DATE_FIELDS = {"posted_at"}
+
+# Query operators the agent may use. Anything running code or scanning by design
+# ($where, $expr, $function, $jsonSchema, ...) is rejected.
+ALLOWED_OPERATORS = {
+    "$and", "$or", "$nor", "$not", "$eq", "$ne", "$gt", "$gte", "$lt", "$lte", "$in", "$nin",
+    "$exists", "$regex", "$options", "$all", "$elemMatch", "$size", "$text", "$search",
+}
+
+# Fields whose regex filters are answered from a smaller field holding the same text.
+REGEX_FIELD_REPLACEMENTS = {"job_description": "description_text"}
+
+# Regexes matching anything, a condition using one is dropped instead of scanning for it.
+MATCH_ALL_REGEXES = {"", ".*", "^.*", ".*$", "^.*$", ".+"}
+
+MAX_QUERY_DEPTH = 8
+MAX_IN_VALUES = 100
+MAX_REGEX_LENGTH = 200
+
+# Share of the time budget above which an explained query is logged as a warning.
+SLOW_QUERY_SHARE = 0.5
+
+
+class QueryRejected(ValueError):
+    """
+    Raised when an agent query is not allowed or did not finish in time.
+
+    Attributes:
+        reason (str): One of 'collection', 'field', 'operator', 'invalid_value', 'too_complex' or 'timeout'.
+    """
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+def _is_match_all(condition) -> bool:
+    return isinstance(condition, dict) and set(condition) <= {"$regex", "$options"} \
+        and condition.get("$regex") in MATCH_ALL_REGEXES
+
+
+def _to_dates(condition):
+    """Turns the ISO date strings of a date field condition like {"$gte": "2025-07-01"} into datetimes."""
+    if isinstance(condition, str):
+        try:
+            date = datetime.datetime.fromisoformat(condition)
+        except ValueError:
+            raise QueryRejected("invalid_value", f"'{condition}' is not an ISO date like 2025-07-01")
+        return date if date.tzinfo else date.replace(tzinfo=datetime.timezone.utc)
+    if isinstance(condition, list):
+        return [_to_dates(item) for item in condition]
+    if isinstance(condition, dict):
+        return {key: _to_dates(value) for key, value in condition.items()}
+    return condition
+
+
+class QuerySandbox:
+    """
+    Runs the MongoDB filters written by the agent within fixed limits.
+
+    A filter is checked against an allowlist of collections, fields and operators, its
+    regexes are rewritten into indexed or cheaper forms, and it runs with a forced id-only
+    projection, a result limit and a server side time budget. The plan MongoDB picks for it
+    (collection scan or index scan) and the keys and documents it examined are logged through
+    explain().
+    """
+
+    def __init__(self, db_client, allowed_fields: Dict[str, set] = None, limit: int = 100,
+                 max_time_ms: int = 2000, explain: bool = True):
+        """
+        Args:
+            db_client (DatabaseClient): The client the queries run on.
+            allowed_fields (dict, optional): collection -> fields that may be filtered on.
+            limit (int): The maximum number of ids a query returns.
+            max_time_ms (int): The server side time budget of a query.
+            explain (bool): Log the query plan and execution stats of every query. The query then runs twice.
+        """
+        self.db_client = db_client
+        self.allowed_fields = allowed_fields or ALLOWED_FIELDS
+        self.limit = limit
+        self.max_time_ms = max_time_ms
+        self.explain = explain
+
+    def validate(self, collection_name: str, query: Dict[str, Any]):
+        """
+        Raises:
+            QueryRejected: The collection, a field or an operator is not allowed, or the query is too large.
+        """
+        if collection_name not in self.allowed_fields:
+            raise QueryRejected("collection", f"Collection '{collection_name}' can not be queried, "
+                                              f"use one of {sorted(self.allowed_fields)}")
+        fields = self.allowed_fields[collection_name]
+
+        def visit(node, depth, in_field):
+            if depth > MAX_QUERY_DEPTH:
+                raise QueryRejected("too_complex", f"Query is nested deeper than {MAX_QUERY_DEPTH} levels")
+            if isinstance(node, list):
+                if len(node) > MAX_IN_VALUES:
+                    raise QueryRejected("too_complex", f"Lists are limited to {MAX_IN_VALUES} values")
+                for item in node:
+                    visit(item, depth + 1, in_field)
+                return
+            if not isinstance(node, dict):
+                return
+            for key, value in node.items():
+                if key.startswith("$"):
+                    if key not in ALLOWED_OPERATORS:
+                        raise QueryRejected("operator", f"Operator '{key}' is not allowed")
+                    if key == "$regex" and isinstance(value, str) and len(value) > MAX_REGEX_LENGTH:
+                        raise QueryRejected("too_complex", f"Regexes are limited to {MAX_REGEX_LENGTH} characters")
+                elif not in_field:
+                    if key.split(".")[0] not in fields:
+                        raise QueryRejected("field", f"Field '{key}' does not exist, use one of {sorted(fields)}")
+                    visit(value, depth + 1, True)
+                    continue
+                visit(value, depth + 1, in_field and key != "$elemMatch")
+
+        visit(query, 0, False)
+
+    def rewrite(self, collection_name: str, query):
+        """
+        Drops match-anything regexes, moves regexes on the html description to its clean text,
+        reads ISO dates on date fields and moves case-insensitive literal regexes to the lowercase
+        shadow fields, keeping their anchoring.
+        """
+        def visit(node):
+            if isinstance(node, list):
+                return [visit(item) for item in node]
+            if not isinstance(node, dict):
+                return node
+            rewritten = {}
+            for key, value in node.items():
+                if _is_match_all(value):
+                    continue
+                if key in REGEX_FIELD_REPLACEMENTS and isinstance(value, dict) and "$regex" in value:
+                    key = REGEX_FIELD_REPLACEMENTS[key]
+                if key in DATE_FIELDS:
+                    value = _to_dates(value)
+                rewritten[key] = visit(value) if key.startswith("$") else value
+            return rewritten
+
+        query = visit(query)
+        if collection_name == JOBS_COLLECTION:
+            query = rewrite_regex_filters(query)
+        return query
+
+    def prepare(self, collection_name: str, query: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Validates and rewrites an agent query.
+
+        Returns:
+            dict: The filter to run.
+        """
+        if not isinstance(query, dict):
+            raise QueryRejected("too_complex", "The query must be an object")
+        self.validate(collection_name, query)
+        return self.rewrite(collection_name, query)
+
+    def _log_plan(self, collection, query):
+        try:
+            # executionStats runs the query, with the same projection, limit and time budget as the real one
+            explained = collection.database.command("explain", {"find": collection.name, "filter": query,
+                                                                "projection": {"_id": 1}, "limit": self.limit,
+                                                                "maxTimeMS": self.max_time_ms},
+                                                    verbosity="executionStats")
+            stages = []
+            stage = explained.get("queryPlanner", {}).get("winningPlan", {})
+            while stage:
+                stages.append(stage.get("stage", "?") + (f"({stage['indexName']})" if "indexName" in stage else ""))
+                stage = stage.get("inputStage") or stage.get("queryPlan")
+            stats = explained.get("executionStats", {})
+            elapsed_ms = stats.get("executionTimeMillis", 0)
+            logger.info(f"🔍 Agent query plan on '{collection.name}': {' <- '.join(stages) or 'unknown'}, "
+                        f"{stats.get('totalKeysExamined', '?')} keys and {stats.get('totalDocsExamined', '?')} "
+                        f"documents examined for {stats.get('nReturned', '?')} returned, "
+                        f"{elapsed_ms} of {self.max_time_ms} ms")
+            if any(stage.startswith("COLLSCAN") for stage in stages):
+                logger.warning(f"Agent query scans the whole '{collection.name}' collection: {query}")
+            if elapsed_ms > self.max_time_ms * SLOW_QUERY_SHARE:
+                logger.warning(f"Agent query used {elapsed_ms} ms of its {self.max_time_ms} ms budget: {query}")
+        except Exception as e:
+            logger.info(f"Could not explain agent query: {e}")
+
+    def run(self, collection_name: str, query: Dict[str, Any]) -> List[str]:
+        """
+        Runs an agent query within the sandbox limits.
+
+        Returns:
+            list: The ids of up to `limit` matching documents, as strings.
+
+        Raises:
+            QueryRejected: The query is not allowed or ran out of its time budget.
+        """
+        query = self.prepare(collection_name, query)
+        if self.db_client.db is None:
+            logger.info("❌ Cannot run query, no database connection.")
+            return []
+        collection = self.db_client.db.get_collection(collection_name)
+        if self.explain:
+            self._log_plan(collection, query)
+        start = time.perf_counter()
+        try:
+            cursor = self.db_client._find(collection, query, {"_id": 1}, limit=self.limit,
+                                          max_time_ms=self.max_time_ms)
+            ids = [str(document["_id"]) for document in cursor]
+        except ExecutionTimeout as e:
+            raise QueryRejected("timeout", f"The query took longer than {self.max_time_ms} ms, "
+                                           f"make it more selective") from e
+        except OperationFailure as e:
+            raise QueryRejected("too_complex", f"The query failed: {e}") from e
+        logger.info(f"✅ Agent query returned {len(ids)} ids in {(time.perf_counter() - start) * 1000:.1f} ms")
+        return ids
@@ -0,0 +1,287 @@
+# snapshot.py
+import datetime
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+import numpy as np
+from db.indexes import JOBS_COLLECTION
+from log.logger_config import configured_logger
+from loguru import logger
+
+SNAPSHOT_DIR = Path(__file__).resolve().parent.parent.joinpath("data", "snapshot")
+
+# Points at the directory of the latest snapshot, replaced atomically once it is complete.
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+
+# Older snapshots kept next to the current one, workers may still be reading them.
+KEEP_SNAPSHOTS = 2
+
+# How every column is stored:
+#   text      every job's own string, offsets into one utf-8 blob
+#   interned  one int32 code per job into a table of the distinct strings (-1 when missing)
+#   list      a CSR of int32 codes into a table of the distinct strings
+#   number    float64, NaN when missing
+#   datetime  float64 UTC epoch seconds, NaN when missing
+SNAPSHOT_COLUMNS = {
+    "title": "text",
+    "company": "interned",
+    "location": "interned",
+    "experience": "interned",
+    "post_date": "interned",
+    "link": "text",
+    "key_skills": "list",
+    "description_text": "text",
+    "experience_min_years": "number",
+    "experience_max_years": "number",
+    "posted_at": "datetime",
+    "updated_at": "datetime",
+}
+
+
+def _pack_strings(strings: List[str]):
+    encoded = [string.encode("utf-8") for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+def _unpack_strings(offsets: np.ndarray, blob: np.ndarray) -> List[str]:
+    data = blob.tobytes()
+    bounds = offsets.tolist()
+    return [data[start:end].decode("utf-8") for start, end in zip(bounds, bounds[1:])]
+
+
+def _epoch(value) -> float:
+    if not isinstance(value, datetime.datetime):
+        return np.nan
+    # pymongo returns naive datetimes, in UTC
+    return (value if value.tzinfo else value.replace(tzinfo=datetime.timezone.utc)).timestamp()
+
+
+def _number(value: float):
+    return int(value) if value.is_integer() else value
+
+
+class CatalogueSnapshot:
+    """
+    A read-only columnar copy of the 'Jobs' collection, written by export_snapshot.
+
+    Every column is a set of .npy files read on first use, so an index only reads the columns
+    it needs, in bulk instead of one BSON document at a time. The indexes decode the columns
+    into Python objects of their own, so every uvicorn worker still holds its own copy.
+    Repeated strings (companies, locations, skills, ...) are interned into small tables.
+    """
+
+    def __init__(self, path: Path):
+        """
+        Args:
+            path (Path): The directory of one snapshot.
+        """
+        self.path = Path(path)
+        manifest = json.loads(self.path.joinpath(MANIFEST_FILE).read_text(encoding="utf-8"))
+        self.collection_name = manifest["collection_name"]
+        self.version = manifest["version"]
+        self.count = manifest["count"]
+        self.columns: Dict[str, str] = manifest["columns"]
+        self.exported_at = manifest["exported_at"]
+        self._arrays: Dict[str, np.ndarray] = {}
+        self._tables: Dict[str, List[str]] = {}
+
+    def array(self, name: str) -> np.ndarray:
+        """Returns an array of the snapshot, e.g. 'experience_min_years' or 'key_skills.codes'."""
+        if name not in self._arrays:
+            self._arrays[name] = np.load(self.path.joinpath(f"{name}.npy"))
+        return self._arrays[name]
+
+    def table(self, column: str) -> List[str]:
+        """Returns the distinct strings of an interned or list column."""
+        if column not in self._tables:
+            self._tables[column] = _unpack_strings(self.array(f"{column}.table_offsets"),
+                                                   self.array(f"{column}.table_blob"))
+        return self._tables[column]
+
+    def job_ids(self) -> List[str]:
+        return [value.decode("ascii") for value in self.array("_id").tolist()]
+
+    def column(self, column: str) -> List[Any]:
+        """Decodes one column into Python values, one per job."""
+        kind = self.columns[column]
+        if kind == "text":
+            return _unpack_strings(self.array(f"{column}.offsets"), self.array(f"{column}.blob"))
+        if kind == "interned":
+            table = self.table(column)
+            return [table[code] if code >= 0 else None for code in self.array(f"{column}.codes").tolist()]
+        if kind == "list":
+            table = self.table(column)
+            indptr = self.array(f"{column}.indptr").tolist()
+            codes = self.array(f"{column}.codes").tolist()
+            return [[table[code] for code in codes[start:end]] for start, end in zip(indptr, indptr[1:])]
+        values = self.array(column).tolist()
+        if kind == "number":
+            return [None if value != value else _number(value) for value in values]
+        # Naive UTC datetimes, the same pymongo returns
+        return [None if value != value else datetime.datetime.fromtimestamp(value, datetime.timezone.utc)
+                .replace(tzinfo=None) for value in values]
+
+    def covers(self, projection: Optional[Dict[str, Any]]) -> bool:
+        return projection is not None and all(field == "_id" or field in self.columns for field in projection)
+
+    def documents(self, projection: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Rebuilds job documents holding the '_id' (as a string) and the projected fields,
+        the same shape DatabaseClient.run_query returns. Missing values are left out.
+
+        Args:
+            projection (dict): An inclusion projection like {"title": 1, "key_skills": 1}.
+        """
+        fields = [field for field, include in projection.items() if include and field != "_id"]
+        columns = [self.column(field) for field in fields]
+        documents = []
+        for job_id, values in zip(self.job_ids(), zip(*columns) if columns else ((),) * self.count):
+            document = {"_id": job_id}
+            for field, value in zip(fields, values):
+                if value is not None:
+                    document[field] = value
+            documents.append(document)
+        return documents
+
+
+def export_snapshot(db_client, directory: Path = SNAPSHOT_DIR, collection_name: str = JOBS_COLLECTION,
+                    batch_size: int = 1000) -> Optional[Path]:
+    """
+    Writes the collection to a new snapshot directory and makes it the current one.
+
+    The data version is read before the jobs, so a snapshot racing with a write is labelled
+    with the older version and readers fall back to the database until the next export.
+
+    Returns:
+        Path: The directory of the new snapshot, None without a database connection.
+    """
+    if db_client.db is None:
+        logger.info("❌ Cannot export a snapshot, no database connection.")
+        return None
+    start = time.perf_counter()
+    directory = Path(directory).joinpath(collection_name)
+    version = db_client.get_collection_version(collection_name)
+    projection = {column: 1 for column in SNAPSHOT_COLUMNS}
+
+    job_ids: List[str] = []
+    values: Dict[str, List[Any]] = {column: [] for column in SNAPSHOT_COLUMNS}
+    for job in db_client.iter_query(collection_name, {}, projection=projection, batch_size=batch_size):
+        job_ids.append(job["_id"])
+        for column in SNAPSHOT_COLUMNS:
+            values[column].append(job.get(column))
+
+    arrays: Dict[str, np.ndarray] = {"_id": np.array(job_ids, dtype="S24")}
+    for column, kind in SNAPSHOT_COLUMNS.items():
+        column_values = values[column]
+        if kind == "text":
+            arrays[f"{column}.offsets"], arrays[f"{column}.blob"] = _pack_strings(
+                [value if isinstance(value, str) else "" for value in column_values])
+        elif kind in ("interned", "list"):
+            table: Dict[str, int] = {}
+            if kind == "interned":
+                arrays[f"{column}.codes"] = np.array(
+                    [table.setdefault(value, len(table)) if isinstance(value, str) else -1 for value in column_values],
+                    dtype=np.int32)
+            else:
+                rows = [[table.setdefault(item, len(table)) for item in value if isinstance(item, str)]
+                        if isinstance(value, list) else [] for value in column_values]
+                indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+                np.cumsum([len(row) for row in rows], out=indptr[1:])
+                arrays[f"{column}.indptr"] = indptr
+                arrays[f"{column}.codes"] = np.fromiter((code for row in rows for code in row), dtype=np.int32,
+                                                        count=int(indptr[-1]))
+            arrays[f"{column}.table_offsets"], arrays[f"{column}.table_blob"] = _pack_strings(list(table))
+        elif kind == "number":
+            arrays[column] = np.array([value if isinstance(value, (int, float)) else np.nan
+                                       for value in column_values], dtype=np.float64)
+        else:
+            arrays[column] = np.array([_epoch(value) for value in column_values], dtype=np.float64)
+
+    exported_at = datetime.datetime.now(datetime.timezone.utc)
+    path = directory.joinpath(f"v{version}-{exported_at:%Y%m%dT%H%M%S%f}")
+    path.mkdir(parents=True)
+    for name, array in arrays.items():
+        np.save(path.joinpath(f"{name}.npy"), array)
+    manifest = {"collection_name": collection_name, "version": version, "count": len(job_ids),
+                "columns": SNAPSHOT_COLUMNS, "exported_at": exported_at.isoformat()}
+    path.joinpath(MANIFEST_FILE).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+    # Readers only ever see complete snapshots
+    pointer = directory.joinpath(f"{CURRENT_FILE}.tmp")
+    pointer.write_text(path.name, encoding="utf-8")
+    os.replace(pointer, directory.joinpath(CURRENT_FILE))
+    _remove_old_snapshots(directory, path)
+    logger.info(f"✅ Exported snapshot of {len(job_ids)} jobs (version {version}) to {path} "
+                f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+    return path
+
+
+def _remove_old_snapshots(directory: Path, current: Path):
+    snapshots = sorted((path for path in directory.iterdir() if path.is_dir() and path != current),
+                       key=lambda path: path.stat().st_mtime, reverse=True)
+    for path in snapshots[KEEP_SNAPSHOTS - 1:]:
+        # A worker still loading from it falls back to the database
+        shutil.rmtree(path, ignore_errors=True)
+
+
+_opened: Dict[Path, CatalogueSnapshot] = {}
+_opened_lock = threading.Lock()
+
+
+def open_snapshot(directory: Path = SNAPSHOT_DIR, collection_name: str = JOBS_COLLECTION) -> Optional[CatalogueSnapshot]:
+    """
+    Returns the current snapshot of a collection, None if none was exported.
+    A snapshot is opened once per process, the pointer file is re-read on every call.
+    """
+    directory = Path(directory).joinpath(collection_name)
+    try:
+        path = directory.joinpath(directory.joinpath(CURRENT_FILE).read_text(encoding="utf-8").strip())
+    except FileNotFoundError:
+        return None
+    with _opened_lock:
+        if path not in _opened:
+            try:
+                _opened.clear()
+                _opened[path] = CatalogueSnapshot(path)
+            except (FileNotFoundError, ValueError, KeyError) as e:
+                logger.info(f"❌ Could not open snapshot {path}: {e}")
+                return None
+        return _opened[path]
+
+
+def load_jobs(db_client, collection_name: str, projection: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Loads every job of a collection for an in-process index.
+
+    Read from the current snapshot when it holds the projected fields and is at the
+    collection's data version, from the database otherwise.
+
+    Args:
+        db_client (DatabaseClient): The client the version is checked with, and the jobs loaded with.
+        collection_name (str): The collection to load.
+        projection (dict): An inclusion projection of the fields needed.
+
+    Returns:
+        list: The job documents, with their '_id' as a string.
+    """
+    snapshot = open_snapshot(collection_name=collection_name)
+    if snapshot is not None and snapshot.covers(projection) \
+            and snapshot.version == db_client.get_collection_version(collection_name):
+        start = time.perf_counter()
+        try:
+            documents = snapshot.documents(projection)
+        except (FileNotFoundError, ValueError) as e:
+            # Removed by a newer export before every column was read
+            logger.info(f"❌ Could not read snapshot {snapshot.path}: {e}")
+        else:
+            logger.info(f"✅ Loaded {len(documents)} jobs from snapshot version {snapshot.version} "
+                        f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+            return documents
+    return db_client.run_query(collection_name, {}, projection=projection)
@@ -0,0 +1,138 @@
+# dependencies.py
+# The singletons shared by the API endpoints and the agent tools. They are built on first use
+# instead of at import, so importing the app neither connects to MongoDB nor loads langchain,
+# numpy, pypdf or patchright. Endpoints get them through FastAPI's Depends, other code calls
+# the getters directly.
+import functools
+import threading
+from utils.cache import ResponseCache
+from log.logger_config import configured_logger
+from loguru import logger
+
+MODEL_NAME = "gemini-1.5-flash-8b-latest"
+
+
+def lazy_singleton(factory):
+    """
+    Turns a factory into a getter building its object once, on the first call.
+    `getter.is_built()` tells if it was built without building it.
+    """
+    lock = threading.Lock()
+    instance = []
+
+    @functools.wraps(factory)
+    def getter():
+        if not instance:
+            with lock:
+                if not instance:
+                    instance.append(factory())
+        return instance[0]
+
+    getter.is_built = lambda: bool(instance)
+    return getter
+
+
+@lazy_singleton
+def get_db_client():
+    from db.db_client import DatabaseClient
+    return DatabaseClient()
+
+
+@lazy_singleton
+def get_async_db_client():
+    from db.async_db_client import AsyncDatabaseClient
+    from db.connection import get_settings
+    # More query threads than pooled connections would only queue for a connection
+    return AsyncDatabaseClient(get_db_client(), max_workers=min(8, get_settings().max_pool_size))
+
+
+@lazy_singleton
+def get_skill_index():
+    # Shared by /jobs/by-skills and the agent tool, which ranks the jobs it finds with it
+    from recommender.skill_index import SkillIndex
+    return SkillIndex(get_db_client())
+
+
+@lazy_singleton
+def get_query_sandbox():
+    # Agent queries run within a field/operator allowlist, a result limit and a time budget
+    from db.query_sandbox import QuerySandbox
+    return QuerySandbox(get_db_client())
+
+
+@lazy_singleton
+def get_gemini():
+    from llm.gemini import GeminiClient
+    return GeminiClient(MODEL_NAME)
+
+
+@lazy_singleton
+def get_similar_jobs_index():
+    from recommender.vector_index import JobVectorIndex
+    return JobVectorIndex(get_db_client())
+
+
+@lazy_singleton
+def get_similarity_table():
+    from recommender.similarity_table import SimilarityTable
+    return SimilarityTable(get_db_client(), get_similar_jobs_index())
+
+
+@lazy_singleton
+def get_query_planner():
+    from recommender.query_planner import QueryPlanner
+    return QueryPlanner(get_db_client())
+
+
+@lazy_singleton
+def get_resume_matcher():
+    from recommender.resume_matcher import ResumeMatcher
+    return ResumeMatcher(get_db_client())
+
+
+@lazy_singleton
+def get_search_engine():
+    from recommender.search_engine import JobSearchEngine
+    return JobSearchEngine(get_db_client())
+
+
+@lazy_singleton
+def get_text_extraction():
+    from utils.text_extraction import TextExtractionService
+    return TextExtractionService()
+
+
+# Agent responses only depend on the input and the 'Jobs' data, so identical inputs are served
+# from here until the collection is reseeded or re-scraped.
+llm_response_cache = ResponseCache("llm_responses", maxsize=512, ttl=60 * 60,
+                                   version_getter=lambda: get_db_client().get_collection_version("Jobs"))
+
+
+def warm_up(build_indexes=False):
+    """
+    Connects to MongoDB and bootstraps the 'Jobs' collection, and with `build_indexes` also
+    builds the in-process indexes and the LLM client. Blocking, run it off the event loop.
+    """
+    from db.indexes import bootstrap_jobs_collection
+    db_client = get_db_client()
+    bootstrap_jobs_collection(db_client.db)
+    if build_indexes:
+        get_search_engine().ensure_fresh()
+        get_skill_index().ensure_fresh()
+        get_resume_matcher().ensure_fresh()
+        get_query_planner().ensure_fresh()
+        get_similar_jobs_index().ensure_built()
+        get_gemini()
+    logger.info(f"✅ Warm up done{' with indexes' if build_indexes else ''}")
+    return db_client.db is not None
+
+
+def close():
+    """Stops the pools of the singletons that were built."""
+    if get_text_extraction.is_built():
+        get_text_extraction().close()
+    if get_async_db_client.is_built():
+        get_async_db_client().close()
+    if get_db_client.is_built():
+        from db.connection import close_clients
+        close_clients()
@@ -0,0 +1,11 @@
+from db.db_client import DatabaseClient
+from db.snapshot import export_snapshot, SNAPSHOT_DIR
+from log.logger_config import configured_logger
+from loguru import logger
+
+# Writes the 'Jobs' collection to a columnar snapshot under data/snapshot.
+# Seeds and scrapes export one too. Workers build their in-process indexes from it while
+# its data version is the current one, instead of reading every job through PyMongo.
+db_client = DatabaseClient()
+path = export_snapshot(db_client, SNAPSHOT_DIR)
+logger.info(f"Snapshot written to {path}")
@@ -0,0 +1,84 @@
+# coalescing.py
+import asyncio
+import json
+from typing import Any, Dict
+from log.logger_config import configured_logger
+from loguru import logger
+
+
+def _input_key(value) -> str:
+    # Messages and plain values serialize to the same key when their content is the same
+    def default(item):
+        if hasattr(item, "model_dump"):
+            return item.model_dump()
+        return str(item)
+    return json.dumps(value, default=default, sort_keys=True)
+
+
+class CoalescingRunnable:
+    """
+    Shares one call of a runnable between concurrent identical inputs, and bounds the number
+    of calls in flight.
+
+    Every distinct input is still one model round trip: langchain chat models answer `abatch`
+    with one `ainvoke` per input, so grouping different inputs would save nothing. What is
+    saved are the duplicate calls, e.g. the same resume uploaded twice at once. Any runnable
+    works, e.g. a `model.with_structured_output(...)` chain or a fake chat model in tests:
+
+        coalescer = CoalescingRunnable(FakeListChatModel(responses=["a"]))
+        await asyncio.gather(coalescer.ainvoke("x"), coalescer.ainvoke("x"))
+    """
+
+    def __init__(self, runnable, name: str = "llm", max_concurrency: int = 4, config: dict = None):
+        """
+        Args:
+            runnable: The langchain runnable to call.
+            name (str): The name used in logs and stats.
+            max_concurrency (int): The maximum number of calls running at the same time.
+            config (dict, optional): The runnable config of every call, e.g. its callbacks and tags.
+        """
+        self.runnable = runnable
+        self.name = name
+        self.config = config
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.requests = 0
+        self.coalesced = 0
+        self.calls = 0
+
+    async def ainvoke(self, value) -> Any:
+        """
+        Calls the runnable with one input, or waits for the identical call already running.
+        """
+        self.requests += 1
+        key = _input_key(value)
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(self._call(value))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._call_done(key, done))
+        # A caller going away does not cancel the call the others wait for
+        return await asyncio.shield(task)
+
+    async def _call(self, value):
+        async with self._semaphore:
+            self.calls += 1
+            try:
+                return await self.runnable.ainvoke(value, config=self.config)
+            except Exception as e:
+                logger.error(f"❌ '{self.name}' call failed: {e}")
+                raise
+
+    def _call_done(self, key: str, task: asyncio.Task):
+        self._in_flight.pop(key, None)
+        if not task.cancelled():
+            # Mark the exception as retrieved, every caller may have gone away
+            task.exception()
+
+    def stats(self):
+        return {"name": self.name,
+                "requests": self.requests,
+                "coalesced": self.coalesced,
+                "calls": self.calls}
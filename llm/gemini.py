@@ -1,6 +1,7 @@
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain.chat_models import init_chat_model
+import asyncio
 import re
 from langchain.tools import tool
 from langchain.agents import AgentExecutor, create_react_agent
@@ -8,11 +9,17 @@ from langchain.prompts import PromptTemplate
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
-from utils.string_utils import get_json_from_string
-from db.db_client import DatabaseClient
+from utils.string_utils import extract_object, LLMOutputError, tokenize_text
+from utils.cache import async_cached
+from llm.coalescing import CoalescingRunnable
+from llm.prompt_compaction import compact_job, compact_jobs, fit_to_budget, TOOL_RESULT_LIMIT
+from llm.token_usage import TokenUsageRecorder
+from db.indexes import JOBS_COLLECTION
+from db.query_sandbox import QueryRejected
+from recommender.skill_index import skills_from_query
+from dependencies import get_async_db_client, get_query_sandbox, get_skill_index, llm_response_cache
 from log.logger_config import configured_logger
 from loguru import logger
-import ast
 
 load_dotenv() # This loads the variables from .env into the environment
 class ResumeDetails(BaseModel):
@@ -28,87 +35,108 @@ class AgentJobResponse(BaseModel):
     input: str
     output: str
     
-db_client = DatabaseClient(db_name="JobReco")
+
+def normalize_query(query: str) -> str:
+    return " ".join(tokenize_text(query))
+
 @tool
-def run_db_query_tool(input_string_literal: str) -> List[Dict[str, Any]]:
+async def run_db_query_tool(input_string_literal: str) -> List[Dict[str, Any]]:
     """
-    Runs a database query on the specified collection with the given query parameters.
-    This tool makes an HTTP POST request to the FastAPI server's /run_db_query endpoint.
+    Runs a MongoDB query and returns the matching document ids.
 
-    Args:
-        collection (str): The name of the database collection (e.g., "Jobs").
-        
-        query (Dict[str, Any]): A dictionary representing the mongoDB client query.
-        It accepts any complex mongoDB query. You should create a db query object based on the
-        document structure of the mongoDB document.
-        
-        Here is an example of a mongoDB Document:
-        {
-            _id: ObjectId('686a718b9ec6ecefa24595d5'),
-            id: 'Ppu2Pt4GhZ8DmKK',
-            title: 'Dot Net Developer - Senior Software Engineer',
-            company: 'Bajaj Financial Securities',
-            location: 'Pune',
-            experience: '4-8 Yrs',
-            experience_min_years: 4,
-            experience_max_years: 8,
-            post_date: '4 days ago',
-            link: 'https://www.naukri.com/job-listings-dot-net-developer-senior-software-engineer-bajaj-financial-securities-pune-4-to-8-years-010725024658',
-            key_skills: [
-            '.Net Core', 'web API',
-            'PYTHON',    'AWS',
-            'redis',     'C#',
-            'Azure',     'Mysql',
-            'linux',     'SQL Server'
-            ],
-            job_description: <The description of the jobs in html format with html tags>
-        }
-    If no specific query is needed, pass an empty dictionary {}.
+    Input: a dict with 'collection' (e.g. "Jobs") and 'query' (any MongoDB filter, {} for none).
+    Job fields: title, company, location, experience (e.g. "4-8 Yrs"), experience_min_years,
+    experience_max_years (numbers), post_date, posted_at (ISO date, e.g. {"$gte": "2025-07-01"}),
+    key_skills (list of str), description_text.
 
     Returns:
-        List[str]: A list of ids, where each id is a document id from the database
-        matching the query. Returns an empty list if no results or an error occurs.
+        List[str]: Up to 30 matching document ids, best skill matches first.
     """
     
     logger.debug("inputDict", input_string_literal)
     logger.info("Received tool call: inputDict", input_string_literal)
     
-    extracted_json = get_json_from_string(input_string_literal)
-    extracted_dict = ast.literal_eval(extracted_json)
-    
-    collection = extracted_dict["collection"]
-    query = extracted_dict["query"]
+    try:
+        extracted_dict = extract_object(input_string_literal)
+        collection = extracted_dict["collection"]
+        query = extracted_dict["query"]
+        if not isinstance(collection, str) or not isinstance(query, dict):
+            raise LLMOutputError("wrong_type", "'collection' must be a string and 'query' an object")
+    except (LLMOutputError, KeyError) as e:
+        # Told to the agent as the observation, so it can fix its input
+        reason = e.reason if isinstance(e, LLMOutputError) else "missing_key"
+        return [{"error": f"Invalid tool input ({reason}): {e}. Pass {{'collection': ..., 'query': {{...}}}}."}]
+    skills = skills_from_query(query) if collection == JOBS_COLLECTION else []
 
-    # logger.info("coll", collection)
-    # logger.info("query", query)
     try:
-        results = db_client.run_query(collection, query)
-        logger.info(f"--- Tool Call: Received {len(results)} results from server. ---")
-        def process_results(result):
-            id = ""
-            if "_id" in result:
-                id = result["_id"]
-                # logger.info("id", id)
-            return id
-        processed_result = list(map(process_results, results))
-        logger.info("No. of jobs found: ", len(processed_result))
+        # The getters connect to MongoDB on first use, which must not happen on the event loop
+        async_db_client = await asyncio.to_thread(get_async_db_client)
+        query_sandbox, skill_index = await async_db_client.run(lambda: (get_query_sandbox(), get_skill_index()))
+        processed_result = await async_db_client.run(query_sandbox.run, collection, query)
+        if skills and processed_result:
+            # Jobs matching more (and rarer) of the requested skills come first
+            await async_db_client.run(skill_index.ensure_fresh)
+            processed_result = skill_index.rank(processed_result, skills)
+        # Only ids go back to the agent, and never more than it is asked to return
+        processed_result = processed_result[:TOOL_RESULT_LIMIT]
+        logger.info(f"--- Tool Call: Received {len(processed_result)} results from server. ---")
         return processed_result
+    except QueryRejected as e:
+        logger.info(f"Rejected agent query ({e.reason}): {e}")
+        return [{"error": f"Query rejected ({e.reason}): {e}"}]
     except Exception as e:
         return [{"error": f"An unexpected error occurred: {e}"}]
 
 class GeminiClient:
-    def __init__(self, model_name: str = "gemini-1.5-flash-latest", temperature: float = 0.0):
-        self.llm = ChatGoogleGenerativeAI(model=model_name, temperature=temperature)
-        self.model = init_chat_model("gemini-1.5-flash-latest", model_provider="google_genai")
+    def __init__(self, model_name: str = "gemini-1.5-flash-latest", temperature: float = 0.0,
+                 llm=None, model=None, max_concurrency: int = 4):
+        """
+        Args:
+            model_name (str): The Gemini model used by the agents.
+            temperature (float): The sampling temperature of the agent model.
+            llm (BaseChatModel, optional): Replaces the agent model, e.g. a fake chat model in tests.
+            model (BaseChatModel, optional): Replaces the structured output model.
+            max_concurrency (int): The maximum number of structured output calls in flight per method.
+        """
+        self.llm = llm or ChatGoogleGenerativeAI(model=model_name, temperature=temperature)
+        self.model = model or init_chat_model("gemini-1.5-flash-latest", model_provider="google_genai")
+        self.token_usage = TokenUsageRecorder()
+        self.resume_details_coalescer = CoalescingRunnable(self.model.with_structured_output(ResumeDetails),
+                                                           name="extract_key_info_from_resume",
+                                                           config=self.__call_config__("extract_key_info_from_resume"),
+                                                           max_concurrency=max_concurrency)
+        self.rerank_coalescer = CoalescingRunnable(self.model.with_structured_output(ModelResponseJobs),
+                                                   name="rerank_similar_jobs",
+                                                   config=self.__call_config__("rerank_similar_jobs"),
+                                                   max_concurrency=max_concurrency)
+        # prompt template -> AgentExecutor, agents are built once and reused
+        self._agent_executors: Dict[str, AgentExecutor] = {}
         logger.info(f"Gemini client created successfully with model {model_name}")
-        
-    async def __run_react_agent__(self, prompt: PromptTemplate, tools, query):
-        agent = create_react_agent(self.llm, tools, prompt=prompt)
-        agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True, handle_parsing_errors=True)
-        response = await agent_executor.ainvoke({"input": query})
+
+    def __call_config__(self, name: str):
+        # Tags every model call with the calling method, so its tokens are counted under that name
+        return {"callbacks": [self.token_usage], "tags": [name]}
+
+    def stats(self):
+        return {"coalescing": [self.resume_details_coalescer.stats(), self.rerank_coalescer.stats()],
+                "token_usage": self.token_usage.stats()}
+
+    def __agent_executor__(self, prompt: PromptTemplate, tools) -> AgentExecutor:
+        key = prompt.template
+        agent_executor = self._agent_executors.get(key)
+        if agent_executor is None:
+            agent = create_react_agent(self.llm, tools, prompt=prompt)
+            agent_executor = AgentExecutor(agent=agent, tools=tools, handle_parsing_errors=True)
+            self._agent_executors[key] = agent_executor
+        return agent_executor
+
+    async def __run_react_agent__(self, prompt: PromptTemplate, tools, query, name: str = "agent"):
+        agent_executor = self.__agent_executor__(prompt, tools)
+        response = await agent_executor.ainvoke({"input": query}, config=self.__call_config__(name))
         logger.info(f"\n--- Agent Response: {response} ---")
         return response
 
+    @async_cached(llm_response_cache, lambda self, query: normalize_query(query))
     async def get_jobs_by_agent(self, query: str) -> AgentJobResponse:
         llm = self.llm
         tools = [run_db_query_tool]
@@ -142,86 +170,46 @@ class GeminiClient:
 
         Question: {input}
         Thought:{agent_scratchpad}""")
-        response = await self.__run_react_agent__(prompt, tools, query)
-        return response
-
-    async def analyse_resume_text_and_fetch_jobs(self, resume_text: str) -> AgentJobResponse:
-        tools = [run_db_query_tool]
-        prompt = PromptTemplate.from_template("""
-        You are an expert at extracting key job-related information from a user's resume text to find relevant job postings and with the key information of the resume.
-        Your task is to analyze the resume text data given by the user, identify the key job-related details, and use the available tools to query a database and then find relevant jobs for the user.
-
-        You have access to the following tools:
-        {tools}
-
-        Use the following format:
-
-        Question: The resume text data given by the user as input about the job they are looking for.
-        Thought: You should always think about what to do. Analyze the text of the resume to extract details like job title, location, skills, company, and experience. Then, decide to use the 'run_db_query_tool' to search the database and Retrieve relevant Jobs.
-        Action: The action to take, should be one of [{tool_names}].
-        Action Input: You are calling an internal tool, so do NOT create any markdown literal text. The input to the action should be a Dictionary object with 'collection' and 'query' keys. The query should NOT be case sensitive.
-        
-        Observation: The result of the action from the database.
-        ... (this Thought/Action/Action Input/Observation can repeat upto 6 times if you need to refine the search)
-        Thought: I now have the final list of jobs.
-
-        Final Answer: The final answer should be the direct output from the tool and nothing extra with schema {output_schema}
-        
-        - If you do not find any job relevant to the resume politely respond to the user.
-
-        Begin!
-
-        Question: {input}
-        Thought:{agent_scratchpad}""")
-        response = await self.__run_react_agent__(prompt, tools, resume_text)
+        response = await self.__run_react_agent__(prompt, tools, query, "get_jobs_by_agent")
         return response
 
     async def extract_key_info_from_resume(self, resume_text: str):
-        model_with_struct = self.model.with_structured_output(ResumeDetails)
         messages = [SystemMessage(content='''You are an expert in analysing peoples' resume from text data 
                                   and generating a structured output of the analysed data'''),
                     HumanMessage(content=f'''
                                  Analyse the following text information:
-                                 {resume_text}
+                                 {fit_to_budget(resume_text)}
                                  Now, generate structured details of the resume.
                                  ''')
                     ]
-        model_response = await model_with_struct.ainvoke(messages)
+        # Concurrent extractions of the same resume share one call, see CoalescingRunnable
+        model_response = await self.resume_details_coalescer.ainvoke(messages)
         return model_response.model_dump()
     
-    async def get_similar_jobs(self, job_data):
-        query = job_data if type(job_data) == str else str(job_data)
-        tools = [run_db_query_tool]
-        prompt=PromptTemplate.from_template(
-            """
-        You are an expert at extracting key job-related information from job posting data and finding similar job postings and with the key information from the provided job data.
-        Your task is to analyse the job data given by the user and find similar job postings from a database.
-
-        You have access to the following tools:
-        {tools}
-
-        Use the following format:
-
-        Question: The Job data contains key information like job title, location, skills, company, and experience.
-        Thought: You should always think about what to do. Analyze the key details of the job. Then, decide to use the 'run_db_query_tool' to search the database and Retrieve similar Jobs.
-        Action: The action to take, should be one of [{tool_names}].
-        Action Input: You are calling an internal tool, so do NOT create any markdown literal text. The input to the action should be a Dictionary object with 'collection' and 'query' keys. The query should NOT be case sensitive.
-        
-        Observation: The result of the action from the database.
-        ... (this Thought/Action/Action Input/Observation can repeat upto 6 times if you need to refine the search)
-        Thought: I now have the final list of jobs.
-
-        Final Answer: The final answer should be the direct output from the tool and nothing extra.
-        
-        - If you do not find any relevant job return an empty list.
-
-        Begin!
-
-        Question: {input}
-        Thought:{agent_scratchpad}"""
-        )
-        response = await self.__run_react_agent__(prompt, tools, query)
-        return response
+    async def rerank_similar_jobs(self, job_data, candidates: List[Dict[str, Any]]) -> List[str]:
+        """
+        Re-ranks a list of candidate jobs by their similarity to the given job with a single LLM call.
+
+        Args:
+            job_data (dict): The job the candidates should be similar to.
+            candidates (list): Candidate job documents, each with an '_id'.
+
+        Returns:
+            list: The candidate '_id's, most similar first. Unknown ids returned by the model are dropped.
+        """
+        messages = [SystemMessage(content='''You are an expert at comparing job postings. Order the candidate
+                                  jobs from most to least similar to the given job, considering the title,
+                                  key skills, experience and location.'''),
+                    HumanMessage(content=f'''
+                                 Job: {compact_job(job_data)}
+                                 Candidates ("_id: summary"):
+                                 {compact_jobs(candidates)}
+                                 Return the "_id" of every relevant candidate in the output list, most similar first.
+                                 ''')
+                    ]
+        model_response = await self.rerank_coalescer.ainvoke(messages)
+        candidate_ids = {candidate["_id"] for candidate in candidates}
+        return [job_id for job_id in model_response.output if job_id in candidate_ids]
 
 # gemini_client = GeminiClient()
 # query = "I am looking for software engineering jobs in kolkata of java spring boot a mid senior level job"
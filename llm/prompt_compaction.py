@@ -0,0 +1,64 @@
+# prompt_compaction.py
+import math
+import re
+from typing import Any, Dict, Iterable, List
+
+# Rough number of characters per token of English text, close enough to budget prompts
+# without calling the model's tokenizer.
+CHARS_PER_TOKEN = 4
+
+# Token budget of a resume sent to the model.
+RESUME_TOKEN_BUDGET = 1500
+
+# Maximum number of key skills kept in a job summary.
+MAX_SUMMARY_SKILLS = 12
+
+# Maximum number of job ids a tool call returns to the agent.
+TOOL_RESULT_LIMIT = 30
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+
+def compact_job(job: Dict[str, Any]) -> str:
+    """
+    Summarises a job document in one line, the html description and links are left out.
+
+    e.g. "Java Developer | Acme | Pune | 4-8 Yrs | skills: java, spring boot, aws"
+    """
+    if not isinstance(job, dict):
+        return str(job)
+    skills = ", ".join((job.get("key_skills") or [])[:MAX_SUMMARY_SKILLS])
+    fields = [job.get("title"), job.get("company"), job.get("location"), job.get("experience")]
+    summary = " | ".join(str(field) for field in fields if field)
+    return f"{summary} | skills: {skills}" if skills else summary
+
+
+def compact_jobs(jobs: Iterable[Dict[str, Any]]) -> str:
+    """
+    Summarises candidate jobs one per line, prefixed with their '_id'.
+    """
+    return "\n".join(f"{job.get('_id')}: {compact_job(job)}" for job in jobs)
+
+
+def fit_to_budget(text: str, max_tokens: int = RESUME_TOKEN_BUDGET) -> str:
+    """
+    Shrinks free text (e.g. a resume) to a token budget.
+
+    Whitespace runs, empty lines and repeated lines are removed first, then the text is cut
+    at the last line that fits, the top of a resume being the most telling part.
+    """
+    lines: List[str] = []
+    seen = set()
+    for line in (text or "").splitlines():
+        line = re.sub(r"\s+", " ", line).strip()
+        if line and line.lower() not in seen:
+            seen.add(line.lower())
+            lines.append(line)
+    compacted = "\n".join(lines)
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(compacted) <= max_chars:
+        return compacted
+    cut = compacted.rfind("\n", 0, max_chars)
+    return compacted[:cut if cut > 0 else max_chars]
@@ -0,0 +1,54 @@
+# token_usage.py
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from log.logger_config import configured_logger
+from loguru import logger
+
+
+class TokenUsageRecorder(BaseCallbackHandler):
+    """
+    Counts the prompt and completion tokens of every model call, per calling method.
+
+    Pass it as a callback with the method name as the first tag:
+        await chain.ainvoke(value, config={"callbacks": [recorder], "tags": ["get_jobs_by_agent"]})
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tags: Dict[UUID, str] = {}
+        self.usage = defaultdict(lambda: {"calls": 0, "input_tokens": 0, "output_tokens": 0})
+
+    def _start(self, run_id: UUID, tags: Optional[List[str]]):
+        self._tags[run_id] = tags[0] if tags else "untagged"
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, tags: Optional[List[str]] = None, **kwargs: Any):
+        self._start(run_id, tags)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, tags: Optional[List[str]] = None, **kwargs: Any):
+        self._start(run_id, tags)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any):
+        name = self._tags.pop(run_id, "untagged")
+        input_tokens = output_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+        with self._lock:
+            entry = self.usage[name]
+            entry["calls"] += 1
+            entry["input_tokens"] += input_tokens
+            entry["output_tokens"] += output_tokens
+        logger.info(f"🔢 {name}: {input_tokens} input and {output_tokens} output tokens")
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._tags.pop(run_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {name: dict(entry) for name, entry in self.usage.items()}
@@ -1,38 +1,74 @@
 # main.py
 # This file contains the FastAPI application setup and integration points for Scrapy.
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, Request
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Query, Depends
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 import json
 import os
 import asyncio
-from typing import List, Dict, Any
-from db.db_client import DatabaseClient
-from db.jobs_schema import JobDocument
-from scrapers.naukri_scraper import main as scrap_naukri
-from llm.gemini import GeminiClient
-from utils.string_utils import get_list_from_string
+import datetime
+from typing import List, Dict, Any, Optional, Literal
+import dependencies
+from dependencies import (get_db_client, get_async_db_client, get_gemini, get_similar_jobs_index,
+                          get_similarity_table, get_query_planner, get_resume_matcher, get_search_engine,
+                          get_skill_index, get_text_extraction, llm_response_cache)
+from utils.string_utils import extract_object_ids, LLMOutputError, parse_experience_string, parse_post_age_days
 from bson import ObjectId
-from utils.string_utils import extract_text_from_pdf, extract_text_from_docx
+from utils.streaming import stream_documents
+from utils.text_extraction import ExtractionError
 from log.logger_config import configured_logger
 from loguru import logger
 
+# "lazy" (default): serve right away, connect to MongoDB and bootstrap the 'Jobs' collection in
+# the background and build everything else on first use. "eager": finish all of it, the in-process
+# indexes and the LLM client included, before serving the first request.
+STARTUP_MODE = os.getenv("STARTUP_MODE", "lazy")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # "starting", then "ready" or "failed" (no database connection)
+    app.state.startup = "starting"
+
+    async def warm_up():
+        try:
+            connected = await asyncio.to_thread(dependencies.warm_up, STARTUP_MODE == "eager")
+            app.state.startup = "ready" if connected else "failed"
+        except Exception as e:
+            app.state.startup = "failed"
+            logger.error(f"❌ Warm up failed: {e}")
+
+    warm_up_task = asyncio.create_task(warm_up())
+    if STARTUP_MODE == "eager":
+        await warm_up_task
+    yield
+    warm_up_task.cancel()
+    dependencies.close()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Job Recommendation System API",
     description="API for scraping jobs, recommending jobs, and processing resumes.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # --- Pydantic Models for API Request/Response ---
 
 class JobQueryBody(BaseModel):
-    title: str
-    company: str
-    location: str
-    experience: str
-    post_date: str
-    key_skills: List[str]
+    # Free text searched together with title, company and key_skills
+    query: Optional[str] = None
+    title: Optional[str] = None
+    company: Optional[str] = None
+    location: Optional[str] = None
+    # "3-5 Yrs" style range, or exact years in experience_years
+    experience: Optional[str] = None
+    experience_years: Optional[float] = None
+    # "1 week ago" style age, or a number of days in posted_within_days
+    post_date: Optional[str] = None
+    posted_within_days: Optional[int] = None
+    key_skills: Optional[List[str]] = None
 
 class JobPost(BaseModel):
     id: str
@@ -49,15 +85,34 @@ class RecommendationRequest(BaseModel):
 class RecommendationResponse(BaseModel):
     recommended_jobs: List[JobPost]
 
-# --- Placeholder for Database Connection (will be initialized later) ---
-# In a real application, you'd use SQLAlchemy (for PostgreSQL) or PyMongo (for MongoDB)
-# and initialize connections here or via dependency injection.
-# For now, these are just placeholders.
-db_client = DatabaseClient(db_name="JobReco")
-model_name = "gemini-1.5-flash-8b-latest"
-gemini = GeminiClient(model_name)
+# Resumes of a batch upload being matched at the same time
+RESUME_BATCH_CONCURRENCY = 8
+# Largest /jobs/search page, also the number of jobs ranked and loaded per streamed batch
+MAX_SEARCH_PAGE_SIZE = 100
 # --- API Endpoints ---
 
+@app.get("/health/live")
+async def liveness():
+    """
+    The process is up and serving, nothing else is checked.
+    """
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness():
+    """
+    Ready once MongoDB is reachable and the 'Jobs' collection was bootstrapped, 503 until then.
+    """
+    database = False
+    if app.state.startup == "ready":
+        try:
+            await asyncio.to_thread(get_db_client().client.admin.command, "ping")
+            database = True
+        except Exception as e:
+            logger.info(f"❌ Readiness check failed: {e}")
+    status = {"status": "ready" if database else app.state.startup, "database": database}
+    return JSONResponse(status, status_code=200 if database else 503)
+
 @app.get("/")
 async def read_root():
     """
@@ -66,35 +121,80 @@ async def read_root():
     return {"message": "Welcome to the Job Recommendation System API!"}
 
 @app.post("/scrape-jobs-naukri")
-async def scrape_jobs(req: Request):
+async def scrape_jobs(req: Request, db_client=Depends(get_db_client), async_db_client=Depends(get_async_db_client),
+                      similarity_table=Depends(get_similarity_table)):
     """
     Triggers the naukri scraping process using playright.
     Note: In a production environment, you might want to run this as a scheduled task
     or a separate microservice rather than directly via an API endpoint,
     especially for long-running scraping jobs.
     """
+    # Imported on first use, patchright is only needed to scrape
+    from scrapers.naukri_scraper import main as scrap_naukri
+    from db.snapshot import export_snapshot
     try:
         body = await req.json()
         search_query = body.get("search_query", "Software Engineering Jobs")
         start_page = body.get("start_page", 1)
         end_page = body.get("end_page", 5)
+        concurrency_options = {key: body[key] for key in ("page_concurrency", "detail_concurrency",
+                                                         "requests_per_second", "host_rates",
+                                                         "stop_at_known_page") if key in body}
 
-        await scrap_naukri(search_query, start_page, end_page)
-        return {"message": "Scraping initiated successfully!"}
+        ndjson_path = "data/naukri_output.ndjson" if body.get("save_ndjson", False) else None
+        stats = await scrap_naukri(search_query, start_page, end_page, db=db_client.db, ndjson_path=ndjson_path,
+                                   **concurrency_options)
+        await async_db_client.bump_collection_version("Jobs")
+        # Only the neighbourhoods of the scraped jobs are recomputed
+        stats["similarities_updated"] = await async_db_client.run(similarity_table.refresh)
+        await async_db_client.run(export_snapshot, db_client)
+        return {"message": "Scraping initiated successfully!", "stats": stats}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to initiate scraping: {str(e)}")
     
+# Pass `stream=ndjson` or `stream=json` to the job endpoints to get results streamed as they are read
+StreamFormat = Optional[Literal["ndjson", "json"]]
+
 @app.post("/user-query")
-async def user_query(request: Request):
+async def user_query(request: Request, stream: StreamFormat = None, async_db_client=Depends(get_async_db_client),
+                     query_planner=Depends(get_query_planner)):
     body = await request.json()
     logger.info(f"Received user query:", body)
+    from recommender.query_planner import RANK_PROJECTION
+    # Simple queries are compiled straight into a db filter, the agent is only used as a fallback
+    await async_db_client.run(query_planner.ensure_fresh)
+    plan = query_planner.plan(body["query"])
+    if plan.is_confident:
+        # Rank every match on its skills alone, then fetch the documents of the top ones
+        candidates = await async_db_client.run_query("Jobs", plan.filter, projection=RANK_PROJECTION)
+        top_ids = [ObjectId(job["_id"]) for job in query_planner.rank(plan, candidates)]
+        jobs_by_id = {job["_id"]: job for job in
+                      await async_db_client.run_query("Jobs", {"_id": {"$in": top_ids}})} if top_ids else {}
+        jobs_data = [jobs_by_id[str(job_id)] for job_id in top_ids if str(job_id) in jobs_by_id]
+        if len(jobs_data) > 0:
+            logger.info(f"Answered query with the fast path planner: {plan.matched}")
+            if stream:
+                return stream_documents(jobs_data, stream)
+            return {"count": len(jobs_data),
+                    "data": jobs_data}
+    gemini = await asyncio.to_thread(get_gemini)
     response = await gemini.get_jobs_by_agent(body["query"])
     output_string = ''
     if "output" in response:
         output_string = response["output"]
-    jobs_id_list = get_list_from_string(output_string)
+    try:
+        jobs_id_list = extract_object_ids(output_string)
+    except LLMOutputError as e:
+        if e.reason != "not_found":
+            logger.error(f"❌ Malformed agent output ({e.reason}): {e}")
+            raise HTTPException(status_code=502, detail={"message": "The agent returned malformed output.",
+                                                         "reason": e.reason})
+        # No list at all, e.g. "I can only help with job-related queries."
+        jobs_id_list = []
     jobs_object_id_list = list(map(lambda id: ObjectId(id), jobs_id_list))
-    jobs_data = db_client.run_query("Jobs", {"_id": {"$in": jobs_object_id_list}})
+    if stream and len(jobs_id_list) > 0:
+        return stream_documents(async_db_client.stream_query("Jobs", {"_id": {"$in": jobs_object_id_list}}), stream)
+    jobs_data = await async_db_client.run_query("Jobs", {"_id": {"$in": jobs_object_id_list}})
     response = {"count" : len(jobs_data),
                 "data": jobs_data}
     if len(jobs_id_list) == 0:
@@ -104,93 +204,280 @@ async def user_query(request: Request):
     return response
     
 
+@app.get("/cache/stats")
+async def cache_stats():
+    """
+    Returns the hit and miss counters of the LLM response cache.
+    """
+    return llm_response_cache.stats()
+
+@app.get("/llm/stats")
+async def llm_stats(gemini=Depends(get_gemini)):
+    """
+    Returns how many structured output calls were coalesced and the tokens used per method.
+    """
+    return gemini.stats()
+
+@app.get("/db/stats")
+async def db_stats():
+    """
+    Returns the MongoDB connection pool metrics of this worker: open and in use connections,
+    checkouts waiting for a free one, checkout wait times and failures.
+    """
+    from db.connection import pool_stats
+    return pool_stats()
+
+def search_filters(body: JobQueryBody) -> Dict[str, Any]:
+    """Turns a search body into JobSearchEngine.search arguments."""
+    text = " ".join(part for part in [body.query, body.title, body.company, *(body.key_skills or [])] if part)
+    experience = None
+    if body.experience_years is not None:
+        experience = (body.experience_years, body.experience_years)
+    elif body.experience:
+        parsed = parse_experience_string(body.experience)
+        if parsed["experience_min_years"] is not None:
+            experience = (parsed["experience_min_years"], parsed["experience_max_years"])
+    max_age_days = body.posted_within_days
+    if max_age_days is None and body.post_date:
+        max_age_days = parse_post_age_days(body.post_date)
+    return {"query": text, "location": body.location, "experience": experience, "max_age_days": max_age_days}
+
+async def fetch_ranked_jobs(async_db_client, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Loads the jobs of ranked search results, in their ranked order, with their 'search_score'."""
+    jobs_data = await async_db_client.run_query("Jobs", {"_id": {"$in": [ObjectId(job["_id"]) for job in results]}})
+    jobs_by_id = {job["_id"]: job for job in jobs_data}
+    return [{**jobs_by_id[job["_id"]], "search_score": job["score"]} for job in results if job["_id"] in jobs_by_id]
+
+async def stream_ranked_jobs(async_db_client, search_engine, filters: Dict[str, Any], page_size: int):
+    offset = 0
+    while True:
+        page = await async_db_client.run(search_engine.search, offset=offset, limit=page_size, **filters)
+        for job in await fetch_ranked_jobs(async_db_client, page["results"]):
+            yield job
+        offset += page_size
+        if not page["results"] or offset >= page["total"]:
+            break
+
 @app.post("/jobs/search")
-async def search_jobs(body: JobQueryBody) -> List[Any]:
+async def search_jobs(body: JobQueryBody, page_size: int = Query(20, ge=1, le=MAX_SEARCH_PAGE_SIZE), page_token: Optional[str] = None,
+                      stream: StreamFormat = None, async_db_client=Depends(get_async_db_client),
+                      search_engine=Depends(get_search_engine)):
     """
-    Searches for jobs based on a user query using the LLM/NLP module and vector similarity.
+    Searches for jobs with the in-process BM25 index, no regex scan or LLM call is made.
+    Every body field is optional: the text fields are ranked on, location, experience and
+    post date filter the jobs first. Without any text the filtered jobs come newest first.
+    With `stream` set, every matching job is streamed and the paging params are ignored.
     """ 
+    from recommender.search_engine import encode_rank_token, decode_rank_token
     logger.info(f"Searching for jobs with query: {body}")
-    query = {
-        "title": body.title,
-        "company": body.company,
-        "location": body.location,
-        "experience": body.experience,
-        "post_date": body.post_date,
-        "key_skills": body.key_skills
-    }
-    search_results: List[JobDocument] = db_client.run_query("Jobs", query)
-    return search_results
+    filters = search_filters(body)
+    if stream:
+        return stream_documents(stream_ranked_jobs(async_db_client, search_engine, filters, page_size), stream)
+    await async_db_client.run(search_engine.ensure_fresh)
+    try:
+        offset = decode_rank_token(page_token, search_engine.version) if page_token else 0
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    page = await async_db_client.run(search_engine.search, offset=offset, limit=page_size, **filters)
+    jobs_data = await fetch_ranked_jobs(async_db_client, page["results"])
+    next_offset = offset + page_size
+    return {"data": jobs_data,
+            "count": len(jobs_data),
+            "total": page["total"],
+            "next_page_token": encode_rank_token(page["version"], next_offset) if next_offset < page["total"] else None}
+
+@app.get("/jobs/by-skills")
+async def jobs_by_skills(skills: List[str] = Query(...), limit: int = 20, min_overlap: int = 1,
+                         async_db_client=Depends(get_async_db_client), skill_index=Depends(get_skill_index)):
+    """
+    Finds the jobs asking for the most of the given skills, ranked by IDF-weighted overlap.
+    Skills can be repeated (`skills=java&skills=kafka`) or comma separated (`skills=java,kafka`).
+    """
+    skills = [skill for value in skills for skill in value.split(",") if skill.strip()]
+    await async_db_client.run(skill_index.ensure_fresh)
+    ranked = skill_index.search(skills, k=limit, min_overlap=min_overlap)
+    jobs_object_id_list = [ObjectId(job["_id"]) for job in ranked]
+    jobs_data = await async_db_client.run_query("Jobs", {"_id": {"$in": jobs_object_id_list}})
+    jobs_by_id = {job["_id"]: job for job in jobs_data}
+    jobs_data = []
+    for job in ranked:
+        if job["_id"] in jobs_by_id:
+            jobs_data.append({**jobs_by_id[job["_id"]], "skill_score": job["score"],
+                              "matched_skills": job["matched_skills"]})
+    return {"data": jobs_data,
+            "count": len(jobs_data)}
+
+@app.get("/jobs/recent")
+async def recent_jobs(days: int = 7, limit: int = 20, async_db_client=Depends(get_async_db_client)):
+    """
+    Returns the jobs posted in the last `days` days, newest first, read through the posted_at index.
+    """
+    since = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=days)
+    jobs_data = await async_db_client.run_query("Jobs", {"posted_at": {"$gte": since}},
+                                                sort=[("posted_at", -1)], limit=limit)
+    return {"data": jobs_data,
+            "count": len(jobs_data)}
 
 @app.get("/jobs/recommend-similar/{job_id}")
-async def recommend_similar_jobs(job_id: str):
+async def recommend_similar_jobs(job_id: str, limit: int = 10, rerank: bool = False,
+                                 async_db_client=Depends(get_async_db_client),
+                                 similarity_table=Depends(get_similarity_table),
+                                 similar_jobs_index=Depends(get_similar_jobs_index)):
     """
     Recommends similar jobs based on a given job ID.
+    Candidates are read from the precomputed 'JobSimilarities' collection, jobs not in it yet
+    fall back to the in-process vector index. Pass `rerank=true` to have the LLM re-order
+    them with one extra call.
     """
-    job_data = db_client.run_query("Jobs", {"_id": ObjectId(job_id)})
-    if len(job_data) == 0:
-        raise HTTPException(status_code=404, detail="Job not found")
-    else:
-        job = job_data[0]
-        del job["job_description"]
-    llm_response = await gemini.get_similar_jobs(job)
-    output_string = ''
-    if "output" in llm_response:
-        output_string = llm_response["output"]
-    jobs_id_list = get_list_from_string(output_string)
+    similar = await async_db_client.run(similarity_table.lookup, job_id, limit)
+    if similar is None:
+        await async_db_client.run(similar_jobs_index.ensure_built)
+        if job_id not in similar_jobs_index:
+            raise HTTPException(status_code=404, detail="Job not found")
+        similar = similar_jobs_index.similar(job_id, limit)
+    jobs_id_list = [job["_id"] for job in similar]
     jobs_object_id_list = list(map(lambda id: ObjectId(id), jobs_id_list))
-    jobs_data = db_client.run_query("Jobs", {"_id": {"$in": jobs_object_id_list}})
+    jobs_data = await async_db_client.run_query("Jobs", {"_id": {"$in": jobs_object_id_list}})
+    jobs_by_id = {job["_id"]: job for job in jobs_data}
+
+    if rerank and jobs_data:
+        found = await async_db_client.run_query("Jobs", {"_id": ObjectId(job_id)}, projection={"job_description": 0})
+        if not found:
+            # Archived since its similar jobs were stored
+            raise HTTPException(status_code=404, detail="Job not found")
+        job = found[0]
+        candidates = [{key: value for key, value in candidate.items() if key != "job_description"}
+                      for candidate in jobs_data]
+        gemini = await asyncio.to_thread(get_gemini)
+        reranked_ids = await gemini.rerank_similar_jobs(job, candidates)
+        # Keep candidates the model left out at the end, in their vector order
+        jobs_id_list = reranked_ids + [id for id in jobs_id_list if id not in reranked_ids]
+
+    jobs_data = [jobs_by_id[id] for id in jobs_id_list if id in jobs_by_id]
     response = {"data": jobs_data,
-                    "count": len(jobs_id_list)}
+                    "count": len(jobs_data)}
     if len(jobs_data) == 0:
         response = {"data": [], 
                         "count": 0, 
                         "message" : "No similar jobs found."}
     return response
 
+async def match_resume(resume_text: str, limit: int, key_info: Optional[Dict[str, Any]] = None):
+    """
+    Matches a resume against the stored jobs.
+
+    Returns:
+        tuple: The ResumeProfile read from the resume and the matched jobs, best first, each
+        with its 'match_score' and 'matched_skills'.
+    """
+    async_db_client = await asyncio.to_thread(get_async_db_client)
+    resume_matcher = await async_db_client.run(get_resume_matcher)
+    profile = await async_db_client.run(resume_matcher.extract_profile, resume_text, key_info)
+    matches = await async_db_client.run(resume_matcher.match, profile, limit)
+    jobs_object_id_list = [ObjectId(match["_id"]) for match in matches]
+    jobs_data = await async_db_client.run_query("Jobs", {"_id": {"$in": jobs_object_id_list}})
+    jobs_by_id = {job["_id"]: job for job in jobs_data}
+    jobs_data = [{**jobs_by_id[match["_id"]], "match_score": match["score"],
+                  "matched_skills": match["matched_skills"]}
+                 for match in matches if match["_id"] in jobs_by_id]
+    return profile, jobs_data
+
 @app.post("/resume/upload")
-async def upload_resume(file: UploadFile = File(...)):
+async def upload_resume(file: UploadFile = File(...), stream: StreamFormat = None, limit: int = 30,
+                        use_llm: bool = False, text_extraction=Depends(get_text_extraction)):
     """
     Uploads a resume (PDF/DOCX) and recommends jobs based on its content.
+    Jobs are matched without the agent. Pass `use_llm=true` to also read the resume's key info
+    with one structured LLM call, merged into what is found in the text.
     """
     if file.content_type not in ["application/pdf",
                                 #  "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
                                  ]:
         raise HTTPException(status_code=400, detail="Only PDF files are allowed.")
 
-    file_location = f"/tmp/{file.filename}" # Temporary storage for the uploaded file
-    os.makedirs(os.path.dirname(file_location), exist_ok=True)
-
     try:
-        if file.content_type == "application/pdf":
-            resume_text = extract_text_from_pdf(file)
-        else:
-            resume_text = extract_text_from_docx(file)
-        # resume_key_info = await gemini.extract_key_info_from_resume(resume_text)
-        response = await gemini.analyse_resume_text_and_fetch_jobs(resume_text)
+        # Parsed on the extraction process pool, the temp file is removed afterwards
+        resume_text = await text_extraction.extract_upload(file)
         logger.info(f"Received resume: {file.filename} ({file.content_type})")
-        output_string = ''
-        if "output" in response:
-            output_string = response["output"]
-        jobs_id_list = get_list_from_string(output_string)
-        jobs_object_id_list = list(map(lambda id: ObjectId(id), jobs_id_list))
-        jobs_data = db_client.run_query("Jobs", {"_id": {"$in": jobs_object_id_list}})
+        key_info = None
+        if use_llm:
+            gemini = await asyncio.to_thread(get_gemini)
+            key_info = await gemini.extract_key_info_from_resume(resume_text)
+        profile, jobs_data = await match_resume(resume_text, limit, key_info)
+        if stream and len(jobs_data) > 0:
+            return stream_documents(jobs_data, stream)
 
         response = {"data": jobs_data,
-                    "count": len(jobs_id_list)}
+                    "count": len(jobs_data),
+                    "profile": profile.model_dump()}
         if len(jobs_data) == 0:
             response = {"data": [], 
                         "count": 0, 
+                        "profile": profile.model_dump(),
                         "message" : "No jobs found for this resume."}
         return response
+    except ExtractionError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to process resume: {str(e)}")
-    finally:
-        # Clean up the temporary file
-        if os.path.exists(file_location):
-            os.remove(file_location)
+
+@app.post("/resume/upload-batch")
+async def upload_resume_batch(files: List[UploadFile] = File(...), limit: int = 10,
+                              text_extraction=Depends(get_text_extraction)):
+    """
+    Uploads many resumes (PDF) at once and recommends jobs for each of them.
+
+    PDFs are parsed on a process pool and matched `RESUME_BATCH_CONCURRENCY` at a time. The
+    results are streamed as NDJSON, one line per resume in the order they complete.
+    """
+    # Spool the uploads to temp files before streaming, they are closed once this handler returns
+    uploads = []
+    for file in files:
+        if file.content_type != "application/pdf":
+            uploads.append((file.filename, None, "Only PDF files are allowed."))
+            continue
+        try:
+            uploads.append((file.filename, await text_extraction.spool(file), None))
+        except ExtractionError as e:
+            uploads.append((file.filename, None, str(e)))
+    semaphore = asyncio.Semaphore(RESUME_BATCH_CONCURRENCY)
+
+    async def process(filename, document, error):
+        if error:
+            return {"filename": filename, "error": error}
+        try:
+            resume_text = await text_extraction.extract(document)
+            async with semaphore:
+                profile, jobs_data = await match_resume(resume_text, limit)
+            return {"filename": filename,
+                    "data": jobs_data,
+                    "count": len(jobs_data),
+                    "profile": profile.model_dump()}
+        except Exception as e:
+            logger.error(f"❌ Failed to process resume {filename}: {e}")
+            return {"filename": filename, "error": f"Failed to process resume: {str(e)}"}
+        finally:
+            text_extraction.discard(document)
+
+    async def results():
+        tasks = [asyncio.create_task(process(*upload)) for upload in uploads]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            # The client went away, stop the resumes still waiting and remove their temp files
+            for task in tasks:
+                task.cancel()
+            for _, document, _ in uploads:
+                if document is not None:
+                    text_extraction.discard(document)
+
+    logger.info(f"Received a batch of {len(uploads)} resumes")
+    return stream_documents(results(), "ndjson")
 
 @app.post("/resume/upload-key-info")
-async def upload_resume_key_info(file: UploadFile = File(...)):
+async def upload_resume_key_info(file: UploadFile = File(...), text_extraction=Depends(get_text_extraction),
+                                 gemini=Depends(get_gemini)):
     """
     Uploads a resume (PDF/DOCX) and recommends jobs based on its content.
     """
@@ -199,23 +486,15 @@ async def upload_resume_key_info(file: UploadFile = File(...)):
                                  ]:
         raise HTTPException(status_code=400, detail="Only PDF files are allowed.")
 
-    file_location = f"/tmp/{file.filename}" # Temporary storage for the uploaded file
-    os.makedirs(os.path.dirname(file_location), exist_ok=True)
-
     try:
         logger.info(f"Received resume: {file.filename} ({file.content_type})")
-        if file.content_type == "application/pdf":
-            text = extract_text_from_pdf(file)
-        else:
-            text = extract_text_from_docx(file)
+        text = await text_extraction.extract_upload(file)
         response = await gemini.extract_key_info_from_resume(text)
         logger.info(response)
         return response
+    except ExtractionError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to process resume: {str(e)}")
-    finally:
-        # Clean up the temporary file
-        if os.path.exists(file_location):
-            os.remove(file_location)
 
 
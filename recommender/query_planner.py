@@ -0,0 +1,247 @@
+# query_planner.py
+import re
+import threading
+import time
+from typing import List, Dict, Any
+from pydantic import BaseModel
+from utils.string_utils import tokenize_text, parse_experience_string, split_locations
+from db.snapshot import load_jobs
+from log.logger_config import configured_logger
+from loguru import logger
+
+# Words that carry no search intent in queries like "find me java jobs in pune".
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "in", "at", "on", "for", "of", "with", "to", "from", "near",
+    "i", "im", "me", "my", "am", "is", "are", "be", "looking", "look", "find", "search", "show",
+    "get", "give", "want", "need", "some", "any", "all", "please", "job", "jobs", "role", "roles",
+    "position", "positions", "opening", "openings", "vacancy", "vacancies", "work", "level",
+    "based", "location", "experience", "exp", "yrs", "years", "year",
+}
+
+# Fields pulled from the database to build the vocabulary.
+VOCABULARY_PROJECTION = {"title": 1, "location": 1, "key_skills": 1, "experience": 1}
+
+# Longest phrase (in tokens) the planner tries to match against the vocabulary.
+MAX_PHRASE_TOKENS = 4
+
+# Numbers up to this value in a query are read as years of experience.
+MAX_YEARS = 40
+
+# Maximum number of jobs returned by the fast path, same as the agent prompt.
+FAST_PATH_LIMIT = 30
+
+# Fields the fast path candidates are ranked on, the full documents are only fetched for the top ones.
+RANK_PROJECTION = {"key_skills": 1}
+
+
+def _phrase(text: str) -> str:
+    return " ".join(tokenize_text(text))
+
+
+def _level_phrase(level_keyword: str) -> str:
+    # "Mid-Senior Level" -> "mid senior"
+    return " ".join(token for token in tokenize_text(level_keyword.replace("-", " ")) if token != "level")
+
+
+class QueryPlan(BaseModel):
+    query: str
+    filter: Dict[str, Any]
+    confidence: float
+    matched: Dict[str, List[str]]
+    unmatched: List[str]
+
+    @property
+    def is_confident(self) -> bool:
+        return bool(self.filter) and self.confidence >= QueryPlanner.MIN_CONFIDENCE
+
+
+class QueryPlanner:
+    """
+    A rule based parser that turns simple job search queries into a MongoDB filter.
+
+    The vocabulary (titles, locations, key skills and experience levels) is taken from the
+    'Jobs' collection itself, so queries like "java spring boot jobs in kolkata mid senior"
+    can be answered without calling the LLM agent.
+    """
+    MIN_CONFIDENCE = 0.75
+
+    def __init__(self, db_client, collection_name="Jobs", refresh_interval=5.0):
+        """
+        Args:
+            db_client (DatabaseClient): The client used to load the vocabulary.
+            collection_name (str): The collection the vocabulary is taken from.
+            refresh_interval (float): Minimum number of seconds between two data version checks.
+        """
+        self.db_client = db_client
+        self.collection_name = collection_name
+        self.refresh_interval = refresh_interval
+        self.locations: Dict[str, str] = {}
+        self.skills: Dict[str, List[str]] = {}
+        self.title_tokens = set()
+        self.levels: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+        self._built = False
+        self._version = None
+        self._version_checked_at = 0.0
+
+    def build(self, jobs: List[Dict[str, Any]] = None):
+        """
+        (Re)builds the vocabulary.
+
+        Args:
+            jobs (list, optional): Pre-fetched job documents. Loaded from the snapshot or the database when omitted.
+        """
+        version = self.db_client.get_collection_version(self.collection_name)
+        if jobs is None:
+            jobs = load_jobs(self.db_client, self.collection_name, VOCABULARY_PROJECTION)
+        locations, skills, title_tokens, levels = {}, {}, set(), {}
+        for job in jobs:
+            for location in split_locations(job.get("location")):
+                if _phrase(location):
+                    locations.setdefault(_phrase(location), location)
+            for skill in job.get("key_skills") or []:
+                if _phrase(skill):
+                    skills.setdefault(_phrase(skill), [])
+                    if skill not in skills[_phrase(skill)]:
+                        skills[_phrase(skill)].append(skill)
+            title_tokens.update(token for token in tokenize_text(job.get("title") or "") if token not in STOPWORDS)
+            experience = job.get("experience")
+            if experience:
+                for keyword in parse_experience_string(experience)["experience_level_keywords"]:
+                    levels.setdefault(_level_phrase(keyword), [])
+                    if experience not in levels[_level_phrase(keyword)]:
+                        levels[_level_phrase(keyword)].append(experience)
+
+        with self._lock:
+            self.locations, self.skills, self.title_tokens, self.levels = locations, skills, title_tokens, levels
+            self._built = True
+            self._version = version
+        logger.info(f"✅ Query planner vocabulary: {len(locations)} locations, {len(skills)} skills, "
+                    f"{len(title_tokens)} title words, {len(levels)} levels")
+
+    def ensure_built(self):
+        if not self._built:
+            self.build()
+
+    def ensure_fresh(self):
+        """
+        Builds the vocabulary on first use and rebuilds it when the data version changed.
+        The version is checked at most once every `refresh_interval` seconds.
+        """
+        if not self._built:
+            self.build()
+            return
+        now = time.monotonic()
+        if now - self._version_checked_at < self.refresh_interval:
+            return
+        self._version_checked_at = now
+        if self.db_client.get_collection_version(self.collection_name) != self._version:
+            self.build()
+
+    def plan(self, query: str) -> QueryPlan:
+        """
+        Parses a user query into a MongoDB filter.
+
+        Args:
+            query (str): The free text query of the user.
+
+        Returns:
+            QueryPlan: The compiled filter, what was matched and how confident the planner is.
+        """
+        self.ensure_built()
+        tokens = tokenize_text(query.replace("-", " "))
+        matched = {"location": [], "level": [], "years": [], "skill": [], "title": []}
+        unmatched = []
+        content_tokens = 0
+        position = 0
+        while position < len(tokens):
+            kind, size = self._longest_match(tokens, position)
+            if kind:
+                phrase = " ".join(tokens[position:position + size])
+                matched[kind].append(phrase)
+                if kind == "skill":
+                    # "java spring boot" may be one skill of some job, the jobs asking for
+                    # "java" and "spring boot" separately must match too
+                    matched[kind].extend(part for part in self._skill_parts(phrase) if part not in matched[kind])
+                content_tokens += size
+            elif tokens[position].isdigit() and int(tokens[position]) <= MAX_YEARS:
+                matched["years"].append(tokens[position])
+                content_tokens += 1
+            elif tokens[position] not in STOPWORDS:
+                unmatched.append(tokens[position])
+                content_tokens += 1
+            position += size
+
+        recognised = content_tokens - len(unmatched)
+        confidence = recognised / content_tokens if content_tokens else 0.0
+        return QueryPlan(query=query, filter=self._compile(matched), confidence=confidence,
+                         matched=matched, unmatched=unmatched)
+
+    def _longest_match(self, tokens: List[str], position: int):
+        for size in range(min(MAX_PHRASE_TOKENS, len(tokens) - position), 0, -1):
+            phrase = " ".join(tokens[position:position + size])
+            if size == 1 and phrase in STOPWORDS:
+                break
+            kind = self._match(phrase)
+            if kind:
+                return kind, size
+        return None, 1
+
+    def _skill_parts(self, phrase: str) -> List[str]:
+        """
+        Splits a skill phrase into the shorter skills it is made of, e.g. "java spring boot" into
+        "java" and "spring boot". Empty unless every token belongs to one of them.
+        """
+        tokens = phrase.split()
+        parts, position = [], 0
+        while position < len(tokens):
+            for size in range(len(tokens) - position - (position == 0), 0, -1):
+                part = " ".join(tokens[position:position + size])
+                if part in self.skills:
+                    parts.append(part)
+                    position += size
+                    break
+            else:
+                return []
+        return parts
+
+    def _match(self, phrase: str):
+        if phrase in self.locations:
+            return "location"
+        if phrase in self.levels:
+            return "level"
+        if phrase in self.skills:
+            return "skill"
+        if phrase in self.title_tokens:
+            return "title"
+        return None
+
+    def _compile(self, matched: Dict[str, List[str]]) -> Dict[str, Any]:
+        clauses = []
+        if matched["location"]:
+            clauses.append({"location_lower": {"$in": [self.locations[phrase].lower() for phrase in matched["location"]]}})
+        if matched["level"]:
+            experiences = sorted({exp for phrase in matched["level"] for exp in self.levels[phrase]})
+            clauses.append({"experience": {"$in": experiences}})
+        for years in matched["years"]:
+            clauses.append({"experience_min_years": {"$lte": int(years)},
+                            "experience_max_years": {"$gte": int(years)}})
+        for token in matched["title"]:
+            clauses.append({"title": {"$regex": rf"\b{re.escape(token)}", "$options": "i"}})
+        if matched["skill"]:
+            skill_names = sorted({name.strip().lower() for phrase in matched["skill"] for name in self.skills[phrase]})
+            title_words = "|".join(re.escape(phrase) for phrase in matched["skill"])
+            clauses.append({"$or": [{"key_skills_lower": {"$in": skill_names}},
+                                    {"title": {"$regex": title_words, "$options": "i"}}]})
+        if not clauses:
+            return {}
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+    def rank(self, plan: QueryPlan, jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Orders the jobs returned for a plan by how many of the requested skills they have.
+        """
+        wanted = set(plan.matched["skill"])
+        def overlap(job):
+            return len(wanted & {_phrase(skill) for skill in job.get("key_skills") or []})
+        return sorted(jobs, key=overlap, reverse=True)[:FAST_PATH_LIMIT]
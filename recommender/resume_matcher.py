@@ -0,0 +1,266 @@
+# resume_matcher.py
+import re
+import threading
+import time
+from typing import List, Dict, Any, Optional
+import numpy as np
+from pydantic import BaseModel
+from recommender.skill_index import canonical_skill, SKILL_ALIASES
+from recommender.query_planner import STOPWORDS, MAX_PHRASE_TOKENS, MAX_YEARS
+from utils.string_utils import tokenize_text, split_locations
+from db.snapshot import load_jobs
+from log.logger_config import configured_logger
+from loguru import logger
+
+MATCH_PROJECTION = {"title": 1, "key_skills": 1, "location": 1,
+                    "experience_min_years": 1, "experience_max_years": 1}
+
+# Share of every signal in the final score.
+MATCH_WEIGHTS = {"skill": 0.6, "experience": 0.2, "location": 0.1, "title": 0.1}
+
+# Score of a job whose experience range (or the resume's experience) is unknown.
+UNKNOWN_EXPERIENCE_SCORE = 0.5
+
+# The experience score halves for every this many years outside of a job's range.
+EXPERIENCE_HALF_LIFE = 2.0
+
+# "5+ years", "3.5 yrs", "10 years of experience"
+YEARS_PATTERN = re.compile(r"(\d{1,2}(?:\.\d+)?)\s*\+?\s*(?:years?|yrs?)\b")
+
+
+def _canonical_text(text: str) -> str:
+    # The same rewrites canonical_skill applies, so ".NET Core" in a resume meets "dotnet core"
+    text = re.sub(r"\.net\b", " dotnet", (text or "").lower())
+    return re.sub(r"\.js\b", "js", text)
+
+
+class ResumeProfile(BaseModel):
+    skills: List[str] = []
+    title_tokens: List[str] = []
+    locations: List[str] = []
+    years: Optional[float] = None
+
+
+def _csr(rows: List[List[int]]):
+    """Packs per-job column lists into (indptr, columns, row_of_every_entry) arrays."""
+    lengths = np.fromiter((len(row) for row in rows), dtype=np.int64, count=len(rows))
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+    columns = np.fromiter((column for row in rows for column in row), dtype=np.int32, count=int(indptr[-1]))
+    return indptr, columns, np.repeat(np.arange(len(rows), dtype=np.int32), lengths)
+
+
+class ResumeMatcher:
+    """
+    Matches a resume against every job of the 'Jobs' collection without calling the agent.
+
+    Skills, title words and locations are read from the resume with the vocabulary of the
+    jobs themselves, the years of experience with a regex. Jobs are then scored in one
+    vectorized pass: the IDF-weighted share of a job's key skills found in the resume,
+    how well the experience fits the job's experience_min_years/experience_max_years,
+    whether the location matches and how many title words match.
+    """
+
+    def __init__(self, db_client, collection_name="Jobs", refresh_interval=5.0):
+        """
+        Args:
+            db_client (DatabaseClient): The client used to load the jobs.
+            collection_name (str): The collection to match against.
+            refresh_interval (float): Minimum number of seconds between two data version checks.
+        """
+        self.db_client = db_client
+        self.collection_name = collection_name
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._built = False
+        self._version = None
+        self._version_checked_at = 0.0
+        self.job_ids: List[str] = []
+        self.skill_columns: Dict[str, int] = {}
+        self.title_columns: Dict[str, int] = {}
+        self.location_columns: Dict[str, int] = {}
+
+    def build(self, jobs: Optional[List[Dict[str, Any]]] = None):
+        """
+        (Re)builds the vocabulary and the job arrays.
+
+        Args:
+            jobs (list, optional): Pre-fetched job documents. Loaded from the snapshot or the database when omitted.
+        """
+        start = time.perf_counter()
+        version = self.db_client.get_collection_version(self.collection_name)
+        if jobs is None:
+            jobs = load_jobs(self.db_client, self.collection_name, MATCH_PROJECTION)
+
+        skill_columns, title_columns, location_columns = {}, {}, {}
+        skill_rows, title_rows, location_rows = [], [], []
+        min_years = np.full(len(jobs), np.nan, dtype=np.float32)
+        max_years = np.full(len(jobs), np.nan, dtype=np.float32)
+        for row, job in enumerate(jobs):
+            skills = {canonical_skill(skill) for skill in job.get("key_skills") or []} - {""}
+            skill_rows.append([skill_columns.setdefault(skill, len(skill_columns)) for skill in skills])
+            words = {token for token in tokenize_text(job.get("title") or "") if token not in STOPWORDS}
+            title_rows.append([title_columns.setdefault(word, len(title_columns)) for word in words])
+            places = {" ".join(tokenize_text(place)) for place in split_locations(job.get("location"))} - {""}
+            location_rows.append([location_columns.setdefault(place, len(location_columns)) for place in places])
+            if job.get("experience_min_years") is not None:
+                min_years[row] = job["experience_min_years"]
+                max_years[row] = job.get("experience_max_years", job["experience_min_years"])
+
+        skills = _csr(skill_rows)
+        titles = _csr(title_rows)
+        locations = _csr(location_rows)
+        # Smoothed idf of every skill, a job's skill weight is the sum over its skills
+        document_frequency = np.bincount(skills[1], minlength=len(skill_columns)).astype(np.float32)
+        skill_idf = np.log((1.0 + len(jobs)) / (1.0 + document_frequency)) + 1.0
+        job_skill_weight = np.bincount(skills[2], weights=skill_idf[skills[1]], minlength=len(jobs))
+        job_title_length = np.diff(titles[0]).astype(np.float32)
+
+        with self._lock:
+            self.job_ids = [str(job.get("_id")) for job in jobs]
+            self.skill_columns, self.title_columns, self.location_columns = skill_columns, title_columns, location_columns
+            self.skill_names = list(skill_columns)
+            self.skills, self.titles, self.locations = skills, titles, locations
+            self.skill_idf = skill_idf
+            self.job_skill_weight = job_skill_weight
+            self.job_title_length = job_title_length
+            self.min_years, self.max_years = min_years, max_years
+            self._version = version
+            self._built = True
+        logger.info(f"✅ Built resume matcher over {len(jobs)} jobs and {len(skill_columns)} skills "
+                    f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    def ensure_fresh(self):
+        """
+        Builds the matcher on first use and rebuilds it when the data version changed.
+        The version is checked at most once every `refresh_interval` seconds.
+        """
+        if not self._built:
+            self.build()
+            return
+        now = time.monotonic()
+        if now - self._version_checked_at < self.refresh_interval:
+            return
+        self._version_checked_at = now
+        if self.db_client.get_collection_version(self.collection_name) != self._version:
+            self.build()
+
+    def extract_profile(self, resume_text: str, key_info: Optional[Dict[str, Any]] = None) -> ResumeProfile:
+        """
+        Reads skills, title words, locations and years of experience from a resume.
+
+        Args:
+            resume_text (str): The text of the resume.
+            key_info (dict, optional): The output of GeminiClient.extract_key_info_from_resume,
+                merged into what is found in the text.
+
+        Returns:
+            ResumeProfile: What was recognised, only vocabulary of the jobs is kept.
+        """
+        self.ensure_fresh()
+        tokens = tokenize_text(_canonical_text(resume_text).replace("-", " "))
+        skills, title_tokens, locations = set(), set(), set()
+        position = 0
+        while position < len(tokens):
+            size = 1
+            for length in range(min(MAX_PHRASE_TOKENS, len(tokens) - position), 0, -1):
+                phrase = " ".join(tokens[position:position + length])
+                skill = SKILL_ALIASES.get(phrase, phrase)
+                # Single letters like "r" or "c" are too ambiguous in free text
+                if skill in self.skill_columns and not (length == 1 and (phrase in STOPWORDS or len(phrase) < 2)):
+                    skills.add(skill)
+                    size = length
+                    break
+                if phrase in self.location_columns:
+                    locations.add(phrase)
+                    size = length
+                    break
+            if size == 1 and tokens[position] in self.title_columns and not tokens[position].isdigit():
+                title_tokens.add(tokens[position])
+            position += size
+
+        years = [float(value) for value in YEARS_PATTERN.findall(resume_text.lower()) if float(value) <= MAX_YEARS]
+        profile = ResumeProfile(skills=sorted(skills), title_tokens=sorted(title_tokens),
+                                locations=sorted(locations), years=max(years) if years else None)
+        if key_info:
+            profile = self._merge_key_info(profile, key_info)
+        return profile
+
+    def _merge_key_info(self, profile: ResumeProfile, key_info: Dict[str, Any]) -> ResumeProfile:
+        skills = set(profile.skills)
+        skills.update(skill for skill in map(canonical_skill, key_info.get("key_skills") or [])
+                      if skill in self.skill_columns)
+        # The structured title is more telling than words found anywhere in the resume
+        title_tokens = [token for token in tokenize_text(key_info.get("job_title") or "")
+                        if token in self.title_columns] or profile.title_tokens
+        locations = set(profile.locations)
+        for place in split_locations(key_info.get("location")):
+            if " ".join(tokenize_text(place)) in self.location_columns:
+                locations.add(" ".join(tokenize_text(place)))
+        years = key_info.get("exp_years")
+        return ResumeProfile(skills=sorted(skills), title_tokens=sorted(set(title_tokens)),
+                             locations=sorted(locations), years=years if years is not None else profile.years)
+
+    def match(self, profile: ResumeProfile, k: int = 30) -> List[Dict[str, Any]]:
+        """
+        Scores every job against a resume profile in one vectorized pass.
+
+        Args:
+            profile (ResumeProfile): The output of extract_profile.
+            k (int): The number of jobs to return.
+
+        Returns:
+            list: Dicts of '_id', 'score' (0 to 1) and 'matched_skills', best first. Jobs sharing
+            no skill and no title word with the resume are left out.
+        """
+        self.ensure_fresh()
+        with self._lock:
+            job_ids, skills, titles, locations = self.job_ids, self.skills, self.titles, self.locations
+            skill_idf, job_skill_weight = self.skill_idf, self.job_skill_weight
+            job_title_length, min_years, max_years = self.job_title_length, self.min_years, self.max_years
+            skill_names, skill_columns = self.skill_names, self.skill_columns
+            title_columns, location_columns = self.title_columns, self.location_columns
+        if not job_ids or k <= 0:
+            return []
+        count = len(job_ids)
+
+        wanted = np.zeros(len(skill_columns), dtype=np.float32)
+        wanted[[skill_columns[skill] for skill in profile.skills if skill in skill_columns]] = 1.0
+        skill_hits = np.bincount(skills[2], weights=(wanted * skill_idf)[skills[1]], minlength=count)
+        skill_score = np.divide(skill_hits, job_skill_weight, out=np.zeros(count), where=job_skill_weight > 0)
+
+        wanted_words = np.zeros(len(title_columns), dtype=np.float32)
+        wanted_words[[title_columns[token] for token in profile.title_tokens if token in title_columns]] = 1.0
+        title_hits = np.bincount(titles[2], weights=wanted_words[titles[1]], minlength=count)
+        title_score = np.divide(title_hits, job_title_length, out=np.zeros(count), where=job_title_length > 0)
+
+        wanted_places = np.zeros(len(location_columns), dtype=np.float32)
+        wanted_places[[location_columns[place] for place in profile.locations if place in location_columns]] = 1.0
+        location_score = np.minimum(np.bincount(locations[2], weights=wanted_places[locations[1]], minlength=count), 1.0)
+
+        experience_score = np.full(count, UNKNOWN_EXPERIENCE_SCORE)
+        if profile.years is not None:
+            known = ~np.isnan(min_years)
+            gap = np.maximum(min_years - profile.years, 0) + np.maximum(profile.years - max_years, 0)
+            experience_score[known] = np.exp2(-gap[known] / EXPERIENCE_HALF_LIFE)
+
+        weights = dict(MATCH_WEIGHTS)
+        if not profile.locations:
+            # Do not punish every job when the resume has no location
+            weights.pop("location")
+        total = sum(weights.values())
+        score = (weights["skill"] * skill_score + weights["experience"] * experience_score
+                 + weights["title"] * title_score + weights.get("location", 0.0) * location_score) / total
+        score[(skill_hits == 0) & (title_hits == 0)] = -np.inf
+
+        k = min(k, count)
+        top = np.argpartition(-score, k - 1)[:k]
+        top = top[np.argsort(-score[top], kind="stable")]
+        results = []
+        for row in top:
+            if not np.isfinite(score[row]):
+                break
+            columns = skills[1][skills[0][row]:skills[0][row + 1]]
+            results.append({"_id": job_ids[row], "score": float(score[row]),
+                            "matched_skills": sorted(skill_names[column] for column in columns if wanted[column])})
+        return results
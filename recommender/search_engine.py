@@ -0,0 +1,263 @@
+# search_engine.py
+import base64
+import datetime
+import threading
+import time
+from collections import Counter
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+from recommender.query_planner import STOPWORDS
+from utils.string_utils import tokenize_text, split_locations
+from db.snapshot import load_jobs
+from log.logger_config import configured_logger
+from loguru import logger
+
+SEARCH_PROJECTION = {"title": 1, "company": 1, "key_skills": 1, "description_text": 1, "location": 1,
+                     "experience_min_years": 1, "experience_max_years": 1, "posted_at": 1}
+
+# Term frequency multiplier of every searched field, a title word counts three description words.
+FIELD_WEIGHTS = {"title": 3.0, "key_skills": 2.0, "company": 1.5, "description_text": 1.0}
+
+# BM25 term frequency saturation and document length normalisation.
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Share of the text score that decays with the age of a job, halving every RECENCY_HALF_LIFE_DAYS.
+# Jobs without a posted_at get the fully decayed score.
+RECENCY_WEIGHT = 0.25
+RECENCY_HALF_LIFE_DAYS = 14.0
+
+SECONDS_PER_DAY = 24 * 3600
+
+
+def search_terms(text: str) -> List[str]:
+    return [token for token in tokenize_text(text) if token not in STOPWORDS]
+
+
+def _timestamp(value: datetime.datetime) -> float:
+    # pymongo returns naive datetimes, in UTC
+    return (value if value.tzinfo else value.replace(tzinfo=datetime.timezone.utc)).timestamp()
+
+
+def _location_key(place: str) -> str:
+    return " ".join(tokenize_text(place))
+
+
+class JobSearchEngine:
+    """
+    An in-process BM25 full-text index over the 'Jobs' collection.
+
+    Title, company, key skills and the clean description text are searched as one document,
+    every field's term frequencies scaled by FIELD_WEIGHTS. Postings are packed per term in
+    two flat arrays (job rows and weighted term frequencies), so scoring a query is a few
+    array slices and one bincount. Location, experience years and post time are kept in
+    arrays too and filter the jobs before they are ranked, newer jobs rank a little higher.
+    """
+
+    def __init__(self, db_client, collection_name="Jobs", refresh_interval=5.0):
+        """
+        Args:
+            db_client (DatabaseClient): The client used to load the jobs.
+            collection_name (str): The collection to index.
+            refresh_interval (float): Minimum number of seconds between two data version checks.
+        """
+        self.db_client = db_client
+        self.collection_name = collection_name
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._built = False
+        self._version = None
+        self._version_checked_at = 0.0
+        self.job_ids: List[str] = []
+        self.terms: Dict[str, int] = {}
+        self.location_columns: Dict[str, int] = {}
+
+    @property
+    def version(self):
+        return self._version
+
+    def build(self, jobs: Optional[List[Dict[str, Any]]] = None):
+        """
+        (Re)builds the postings and the filter arrays.
+
+        Args:
+            jobs (list, optional): Pre-fetched job documents. Loaded from the snapshot or the database when omitted.
+        """
+        start = time.perf_counter()
+        version = self.db_client.get_collection_version(self.collection_name)
+        if jobs is None:
+            jobs = load_jobs(self.db_client, self.collection_name, SEARCH_PROJECTION)
+
+        terms: Dict[str, int] = {}
+        location_columns: Dict[str, int] = {}
+        term_ids, rows, frequencies = [], [], []
+        location_rows = []
+        lengths = np.zeros(len(jobs), dtype=np.float32)
+        min_years = np.full(len(jobs), np.nan, dtype=np.float32)
+        max_years = np.full(len(jobs), np.nan, dtype=np.float32)
+        posted_at = np.full(len(jobs), np.nan, dtype=np.float64)
+        for row, job in enumerate(jobs):
+            counts = Counter()
+            for field, weight in FIELD_WEIGHTS.items():
+                value = job.get(field)
+                text = " ".join(value) if isinstance(value, list) else value
+                for term in search_terms(text or ""):
+                    counts[term] += weight
+            for term, frequency in counts.items():
+                term_ids.append(terms.setdefault(term, len(terms)))
+                rows.append(row)
+                frequencies.append(frequency)
+            lengths[row] = sum(counts.values())
+            places = {_location_key(place) for place in split_locations(job.get("location"))} - {""}
+            location_rows.append([location_columns.setdefault(place, len(location_columns)) for place in places])
+            if job.get("experience_min_years") is not None:
+                min_years[row] = job["experience_min_years"]
+                max_years[row] = job.get("experience_max_years", job["experience_min_years"])
+            if job.get("posted_at") is not None:
+                posted_at[row] = _timestamp(job["posted_at"])
+
+        # Postings sorted by term, term t owns posting_rows[term_indptr[t]:term_indptr[t + 1]]
+        term_ids = np.array(term_ids, dtype=np.int32)
+        order = np.argsort(term_ids, kind="stable")
+        posting_rows = np.array(rows, dtype=np.int32)[order]
+        posting_frequencies = np.array(frequencies, dtype=np.float32)[order]
+        term_indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(terms)), out=term_indptr[1:])
+        document_frequency = np.diff(term_indptr).astype(np.float32)
+        idf = np.log(1.0 + (len(jobs) - document_frequency + 0.5) / (document_frequency + 0.5))
+        average_length = float(lengths.mean()) if len(jobs) else 0.0
+        # Per job part of the BM25 denominator, computed once
+        length_norm = BM25_K1 * (1.0 - BM25_B + BM25_B * lengths / (average_length or 1.0))
+
+        location_lengths = np.fromiter((len(places) for places in location_rows), dtype=np.int64,
+                                       count=len(location_rows))
+        location_job_rows = np.repeat(np.arange(len(jobs), dtype=np.int32), location_lengths)
+        location_values = np.fromiter((column for places in location_rows for column in places), dtype=np.int32,
+                                      count=int(location_lengths.sum()))
+
+        with self._lock:
+            self.job_ids = [str(job.get("_id")) for job in jobs]
+            self.terms = terms
+            self.term_indptr, self.posting_rows, self.posting_frequencies = term_indptr, posting_rows, posting_frequencies
+            self.idf, self.length_norm = idf, length_norm
+            self.location_columns = location_columns
+            self.location_job_rows, self.location_values = location_job_rows, location_values
+            self.min_years, self.max_years, self.posted_at = min_years, max_years, posted_at
+            self._version = version
+            self._built = True
+        logger.info(f"✅ Built search index over {len(jobs)} jobs, {len(terms)} terms and {len(posting_rows)} "
+                    f"postings in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    def ensure_fresh(self):
+        """
+        Builds the index on first use and rebuilds it when the data version changed.
+        The version is checked at most once every `refresh_interval` seconds.
+        """
+        if not self._built:
+            self.build()
+            return
+        now = time.monotonic()
+        if now - self._version_checked_at < self.refresh_interval:
+            return
+        self._version_checked_at = now
+        if self.db_client.get_collection_version(self.collection_name) != self._version:
+            self.build()
+
+    def _filter(self, count: int, location: Optional[str], experience: Optional[Tuple[float, float]],
+                max_age_days: Optional[int], age_days: np.ndarray) -> np.ndarray:
+        mask = np.ones(count, dtype=bool)
+        if location:
+            wanted = {_location_key(place) for place in split_locations(location)} - {""}
+            # "pune" also matches stored places like "pune maharashtra"
+            columns = [column for place, column in self.location_columns.items()
+                       if any(place == key or place.startswith(key + " ") for key in wanted)]
+            located = np.zeros(count, dtype=bool)
+            located[self.location_job_rows[np.isin(self.location_values, columns)]] = True
+            mask &= located
+        if experience is not None:
+            low, high = experience
+            # Jobs whose experience range overlaps the wanted one, unknown ranges are left out
+            mask &= (self.min_years <= high) & (self.max_years >= low)
+        if max_age_days is not None:
+            mask &= age_days <= max_age_days
+        return mask
+
+    def search(self, query: str = "", location: Optional[str] = None,
+               experience: Optional[Tuple[float, float]] = None, max_age_days: Optional[int] = None,
+               offset: int = 0, limit: int = 20) -> Dict[str, Any]:
+        """
+        Ranks the jobs matching the filters by the BM25 score of the query.
+
+        Args:
+            query (str): Free text, without it the filtered jobs are returned newest first.
+            location (str, optional): Places like "Pune" or "Pune, Mumbai", a job must be in one of them.
+            experience (tuple, optional): (min, max) years, a job's experience range must overlap it.
+            max_age_days (int, optional): Keep jobs posted at most this many days ago.
+            offset (int): The number of ranked jobs to skip.
+            limit (int): The number of jobs to return.
+
+        Returns:
+            dict: The total number of matching jobs under 'total', a page of dicts of '_id' and
+            'score' under 'results', best first, and the data version they were ranked on under 'version'.
+        """
+        self.ensure_fresh()
+        with self._lock:
+            job_ids, terms = self.job_ids, self.terms
+            term_indptr, posting_rows, posting_frequencies = self.term_indptr, self.posting_rows, self.posting_frequencies
+            idf, length_norm = self.idf, self.length_norm
+            age_days = (time.time() - self.posted_at) / SECONDS_PER_DAY
+            mask = self._filter(len(job_ids), location, experience, max_age_days, age_days)
+            version = self._version
+        count = len(job_ids)
+        if not count or limit <= 0:
+            return {"total": 0, "results": [], "version": version}
+
+        query_terms = {terms[term] for term in search_terms(query) if term in terms}
+        if search_terms(query):
+            score = np.zeros(count, dtype=np.float32)
+            for term in query_terms:
+                begin, end = term_indptr[term], term_indptr[term + 1]
+                rows, frequency = posting_rows[begin:end], posting_frequencies[begin:end]
+                score += np.bincount(rows, weights=idf[term] * frequency * (BM25_K1 + 1.0)
+                                     / (frequency + length_norm[rows]), minlength=count).astype(np.float32)
+            mask &= score > 0
+            recency = np.exp2(-np.maximum(np.nan_to_num(age_days, nan=np.inf), 0) / RECENCY_HALF_LIFE_DAYS)
+            score *= ((1.0 - RECENCY_WEIGHT) + RECENCY_WEIGHT * recency).astype(np.float32)
+        else:
+            # No text to rank on, newest first and unknown ages last
+            score = -np.nan_to_num(age_days, nan=np.inf)
+
+        candidates = np.flatnonzero(mask)
+        total = len(candidates)
+        end = min(offset + limit, total)
+        if offset >= end:
+            return {"total": total, "results": [], "version": version}
+        candidate_scores = score[candidates]
+        # Everything scoring at least the end-th best, ties included, so every page sees the same order
+        threshold = -np.partition(-candidate_scores, end - 1)[end - 1]
+        top = np.flatnonzero(candidate_scores >= threshold)
+        top = top[np.lexsort((candidates[top], -candidate_scores[top]))][offset:end]
+        return {"total": total, "version": version,
+                "results": [{"_id": job_ids[candidates[i]], "score": float(score[candidates[i]]) if query_terms else 0.0}
+                            for i in top]}
+
+
+def encode_rank_token(version, offset: int) -> str:
+    return base64.urlsafe_b64encode(f"{version}:{offset}".encode("utf-8")).decode("ascii")
+
+
+def decode_rank_token(page_token: str, version) -> int:
+    """
+    Turns a ranked page token back into its offset.
+
+    Raises:
+        ValueError: If the token is not valid, or the jobs were re-scraped since it was issued.
+    """
+    try:
+        token_version, offset = base64.urlsafe_b64decode(page_token.encode("ascii")).decode("utf-8").rsplit(":", 1)
+        offset = int(offset)
+    except (ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid page token: {page_token}") from e
+    if token_version != str(version) or offset < 0:
+        raise ValueError("The jobs changed since this page token was issued, start the search again")
+    return offset
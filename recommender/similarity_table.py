@@ -0,0 +1,191 @@
+# similarity_table.py
+import datetime
+import time
+from typing import Any, Dict, List, Optional
+import numpy as np
+from bson import ObjectId
+from pymongo import ReplaceOne
+from recommender.vector_index import JobVectorIndex
+from log.logger_config import configured_logger
+from loguru import logger
+
+SIMILARITIES_COLLECTION = "JobSimilarities"
+
+# Meta document holding the watermark of the last refresh, next to the collection versions.
+META_COLLECTION = "Meta"
+
+# Rows of the similarity matrix computed at once, bounds memory to BLOCK_SIZE x jobs floats.
+BLOCK_SIZE = 1024
+
+# Jobs upserted this long before the last refresh started are checked again, so an upsert
+# racing with a refresh is never missed.
+WATERMARK_OVERLAP = datetime.timedelta(minutes=5)
+
+
+class SimilarityTable:
+    """
+    The top-N similar jobs of every job, precomputed into the 'JobSimilarities' collection.
+
+    Scores are the cosine similarity of the JobVectorIndex vectors, which combine key skill
+    overlap, title words and the experience range. After a seed or a scrape only the
+    neighbourhoods of changed jobs are recomputed: the changed jobs themselves, and the jobs
+    they now beat the weakest stored neighbour of, or were a neighbour of. Refreshes keep the
+    idf weights of the last full rebuild, so scores between unchanged jobs do not drift.
+    """
+
+    def __init__(self, db_client, vector_index: JobVectorIndex = None, collection_name="Jobs", neighbours=20):
+        """
+        Args:
+            db_client (DatabaseClient): The client used to load jobs and store the table.
+            vector_index (JobVectorIndex, optional): The vectors the scores are computed from.
+            collection_name (str): The collection of the jobs.
+            neighbours (int): The number of similar jobs stored per job.
+        """
+        self.db_client = db_client
+        self.vector_index = vector_index or JobVectorIndex(db_client, collection_name)
+        self.collection_name = collection_name
+        self.neighbours = neighbours
+
+    @property
+    def collection(self):
+        return self.db_client.db[SIMILARITIES_COLLECTION]
+
+    def _top_neighbours(self, matrix: np.ndarray, rows: np.ndarray):
+        """Yields (row, [(column, score), ...]) for the given rows, best first."""
+        k = min(self.neighbours, len(matrix) - 1)
+        for start in range(0, len(rows), BLOCK_SIZE):
+            block_rows = rows[start:start + BLOCK_SIZE]
+            scores = matrix[block_rows] @ matrix.T
+            scores[np.arange(len(block_rows)), block_rows] = -np.inf
+            if k <= 0:
+                for row in block_rows:
+                    yield int(row), []
+                continue
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+            for i, row in enumerate(block_rows):
+                yield int(row), [(int(column), float(score))
+                                 for column, score in zip(top[i], top_scores[i]) if score > 0]
+
+    def _write(self, job_ids: List[str], rows: np.ndarray, now) -> int:
+        operations = []
+        written = 0
+        for row, neighbours in self._top_neighbours(self.vector_index.matrix, rows):
+            operations.append(ReplaceOne({"_id": job_ids[row]}, {
+                "neighbours": [{"_id": job_ids[column], "score": score} for column, score in neighbours],
+                # A job only enters this list by scoring above its weakest entry
+                "min_score": neighbours[-1][1] if len(neighbours) == self.neighbours else 0.0,
+                "updated_at": now}, upsert=True))
+            if len(operations) >= 500:
+                written += len(operations)
+                self.collection.bulk_write(operations, ordered=False)
+                operations = []
+        if operations:
+            written += len(operations)
+            self.collection.bulk_write(operations, ordered=False)
+        return written
+
+    def _save_watermark(self, started_at, save_idf=False):
+        last_object_id = max((ObjectId(job_id) for job_id in self.vector_index.job_ids if ObjectId.is_valid(job_id)),
+                             default=None)
+        watermark = {"refreshed_at": started_at, "last_object_id": last_object_id}
+        if save_idf:
+            watermark["idf"] = self.vector_index.idf.tolist()
+        self.db_client.db[META_COLLECTION].update_one({"_id": SIMILARITIES_COLLECTION}, {"$set": watermark},
+                                                      upsert=True)
+
+    def rebuild(self) -> int:
+        """
+        Recomputes the similar jobs of every job.
+
+        Returns:
+            int: The number of jobs written.
+        """
+        if self.db_client.db is None:
+            logger.info("❌ Cannot compute job similarities, no database connection.")
+            return 0
+        start = time.perf_counter()
+        started_at = datetime.datetime.now(datetime.timezone.utc)
+        self.vector_index.build()
+        job_ids = self.vector_index.job_ids
+        written = self._write(job_ids, np.arange(len(job_ids)), started_at)
+        self.collection.delete_many({"_id": {"$nin": job_ids}})
+        self._save_watermark(started_at, save_idf=True)
+        logger.info(f"✅ Computed similar jobs of {written} jobs in {(time.perf_counter() - start):.1f} s")
+        return written
+
+    def refresh(self) -> int:
+        """
+        Recomputes the neighbourhoods of the jobs upserted or removed since the last refresh.
+        Falls back to a full rebuild when the table was never built.
+
+        Returns:
+            int: The number of jobs whose similar jobs were rewritten.
+        """
+        if self.db_client.db is None:
+            logger.info("❌ Cannot compute job similarities, no database connection.")
+            return 0
+        watermark = self.db_client.db[META_COLLECTION].find_one({"_id": SIMILARITIES_COLLECTION})
+        if not watermark or len(watermark.get("idf") or []) != self.vector_index.dimensions:
+            return self.rebuild()
+        start = time.perf_counter()
+        started_at = datetime.datetime.now(datetime.timezone.utc)
+
+        changed_filter = [{"updated_at": {"$gte": watermark["refreshed_at"] - WATERMARK_OVERLAP}}]
+        if watermark.get("last_object_id") is not None:
+            changed_filter.append({"_id": {"$gt": watermark["last_object_id"]}})
+        changed = set(self.db_client.run_query(self.collection_name, {"$or": changed_filter}, ids_only=True))
+        # The bucket weights of the last rebuild keep the scores between unchanged jobs as they were
+        self.vector_index.build(idf=np.array(watermark["idf"], dtype=np.float32))
+        job_ids, id_to_row = self.vector_index.job_ids, self.vector_index.id_to_row
+        matrix = self.vector_index.matrix
+
+        stored = {document["_id"]: document for document in
+                  self.collection.find({}, {"neighbours._id": 1, "min_score": 1})}
+        removed = set(stored) - set(id_to_row)
+        # Jobs without a stored list yet are computed as if they changed
+        changed |= {job_id for job_id in id_to_row if job_id not in stored}
+        changed = {job_id for job_id in changed if job_id in id_to_row}
+        if not changed and not removed:
+            self._save_watermark(started_at)
+            return 0
+
+        affected = set(changed)
+        gone = changed | removed
+        for job_id, document in stored.items():
+            if job_id in id_to_row and any(neighbour["_id"] in gone for neighbour in document.get("neighbours", [])):
+                affected.add(job_id)
+        if changed:
+            # A changed job enters every list whose weakest entry it now beats
+            thresholds = np.array([stored.get(job_id, {}).get("min_score", 0.0) for job_id in job_ids],
+                                  dtype=np.float32)
+            changed_rows = np.array(sorted(id_to_row[job_id] for job_id in changed))
+            for begin in range(0, len(changed_rows), BLOCK_SIZE):
+                block = changed_rows[begin:begin + BLOCK_SIZE]
+                scores = matrix @ matrix[block].T
+                scores[block, np.arange(len(block))] = -np.inf
+                beaten = np.flatnonzero((scores > thresholds[:, None]).any(axis=1) & (scores.max(axis=1) > 0))
+                affected.update(job_ids[row] for row in beaten)
+
+        written = self._write(job_ids, np.array(sorted(id_to_row[job_id] for job_id in affected)), started_at)
+        if removed:
+            self.collection.delete_many({"_id": {"$in": list(removed)}})
+        self._save_watermark(started_at)
+        logger.info(f"✅ Refreshed similar jobs of {written} jobs ({len(changed)} changed, {len(removed)} removed) "
+                    f"in {(time.perf_counter() - start):.1f} s")
+        return written
+
+    def lookup(self, job_id: str, k: int = 10) -> Optional[List[Dict[str, Any]]]:
+        """
+        Returns the stored similar jobs of a job, best first.
+
+        Returns:
+            list: Up to k dicts of '_id' and 'score', or None when the job has no stored entry.
+        """
+        if self.db_client.db is None:
+            return None
+        document = self.collection.find_one({"_id": job_id}, {"neighbours": {"$slice": max(k, 0)}})
+        return None if document is None else document.get("neighbours", [])
@@ -0,0 +1,297 @@
+# skill_index.py
+import heapq
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set
+from bson import ObjectId
+from db.indexes import literal_from_regex
+from db.snapshot import load_jobs
+from log.logger_config import configured_logger
+from loguru import logger
+
+SKILL_PROJECTION = {"key_skills": 1, "updated_at": 1}
+
+# Different spellings of the same skill, after lowercasing and the ".net"/".js" rewrites below.
+SKILL_ALIASES = {
+    "dot net": "dotnet", "dotnet framework": "dotnet",
+    "dot net core": "dotnet core", "dotnetcore": "dotnet core",
+    "nodejs": "nodejs", "node js": "nodejs", "node": "nodejs",
+    "reactjs": "react", "react js": "react",
+    "angularjs": "angular", "angular js": "angular",
+    "vuejs": "vue", "vue js": "vue",
+    "js": "javascript", "ts": "typescript",
+    "golang": "go",
+    "k8s": "kubernetes",
+    "postgres": "postgresql", "postgre sql": "postgresql",
+    "mongo": "mongodb", "mongo db": "mongodb",
+    "ms sql": "sql server", "mssql": "sql server", "ms sql server": "sql server",
+    "springboot": "spring boot",
+    "micro services": "microservices", "microservice": "microservices",
+    "restful": "rest api", "rest apis": "rest api", "restful api": "rest api", "restful apis": "rest api",
+    "amazon web services": "aws",
+    "google cloud": "gcp", "google cloud platform": "gcp",
+    "microsoft azure": "azure",
+    "ml": "machine learning", "c sharp": "c#", "cpp": "c++",
+}
+
+
+def canonical_skill(skill: str) -> str:
+    """
+    Normalises a skill so that different spellings share one posting list,
+    e.g. "PYTHON" -> "python", ".Net Core" -> "dotnet core", "React.js" -> "react".
+
+    Args:
+        skill (str): A skill as written in a job or a query.
+
+    Returns:
+        str: The canonical skill, empty if nothing is left.
+    """
+    skill = (skill or "").lower()
+    skill = re.sub(r"\.net\b", " dotnet", skill)
+    skill = re.sub(r"\.js\b", "js", skill)
+    skill = re.sub(r"[\s/_\-]+", " ", skill)
+    skill = re.sub(r"^[^a-z0-9#+]+|[^a-z0-9#+]+$", "", skill).strip()
+    skill = re.sub(r"\s+", " ", skill)
+    return SKILL_ALIASES.get(skill, skill)
+
+
+def canonical_skills(skills: Iterable[str]) -> FrozenSet[str]:
+    return frozenset(skill for skill in map(canonical_skill, skills or []) if skill)
+
+
+def skills_from_query(query) -> List[str]:
+    """
+    Collects the skills a MongoDB filter matches 'key_skills' on, e.g. from
+    {"key_skills": {"$in": ["Java", "AWS"]}} or {"key_skills": {"$regex": "python", "$options": "i"}}.
+    """
+    skills = []
+
+    def visit(node):
+        if isinstance(node, list):
+            for item in node:
+                visit(item)
+            return
+        if not isinstance(node, dict):
+            return
+        for field, condition in node.items():
+            if field in ("key_skills", "key_skills_lower"):
+                if isinstance(condition, str):
+                    skills.append(condition)
+                elif isinstance(condition, dict):
+                    for operator in ("$in", "$all"):
+                        skills.extend(value for value in condition.get(operator) or [] if isinstance(value, str))
+                    if isinstance(condition.get("$regex"), str):
+                        literal = literal_from_regex(condition["$regex"])
+                        if literal:
+                            skills.append(literal.text)
+                    if isinstance(condition.get("$elemMatch"), dict):
+                        visit({field: condition["$elemMatch"]})
+            elif field.startswith("$"):
+                visit(condition)
+
+    visit(query)
+    return skills
+
+
+class SkillIndex:
+    """
+    An in-memory inverted index from canonical skill to the ids of the jobs asking for it.
+
+    Jobs are ranked by the IDF-weighted share of the query skills they match, so a rare
+    skill like "kafka" counts for more than a common one like "java". After the first build
+    the index follows the collection incrementally: when the data version changes, only the
+    jobs upserted since the last refresh are re-read.
+    """
+
+    def __init__(self, db_client, collection_name="Jobs", refresh_interval=5.0):
+        """
+        Args:
+            db_client (DatabaseClient): The client used to load the jobs.
+            collection_name (str): The collection to index.
+            refresh_interval (float): Minimum number of seconds between two data version checks.
+        """
+        self.db_client = db_client
+        self.collection_name = collection_name
+        self.refresh_interval = refresh_interval
+        self.postings: Dict[str, Set[str]] = defaultdict(set)
+        self.job_skills: Dict[str, FrozenSet[str]] = {}
+        self._lock = threading.RLock()
+        self._built = False
+        self._version = None
+        self._version_checked_at = 0.0
+        # Watermarks of the last load, see refresh()
+        self._last_updated_at = None
+        self._last_object_id = None
+
+    def __len__(self):
+        return len(self.job_skills)
+
+    def _track_watermarks(self, job):
+        updated_at = job.get("updated_at")
+        if updated_at is not None and (self._last_updated_at is None or updated_at > self._last_updated_at):
+            self._last_updated_at = updated_at
+        if ObjectId.is_valid(str(job.get("_id"))):
+            object_id = ObjectId(str(job["_id"]))
+            if self._last_object_id is None or object_id > self._last_object_id:
+                self._last_object_id = object_id
+
+    def _load(self, query):
+        return self.db_client.run_query(self.collection_name, query, projection=SKILL_PROJECTION)
+
+    def build(self, jobs: Optional[List[Dict[str, Any]]] = None):
+        """
+        (Re)builds the whole index.
+
+        Args:
+            jobs (list, optional): Pre-fetched job documents. Loaded from the snapshot or the database when omitted.
+        """
+        start = time.perf_counter()
+        self._version = self.db_client.get_collection_version(self.collection_name)
+        if jobs is None:
+            jobs = load_jobs(self.db_client, self.collection_name, SKILL_PROJECTION)
+        with self._lock:
+            self.postings = defaultdict(set)
+            self.job_skills = {}
+            self._last_updated_at = None
+            self._last_object_id = None
+            self.update(jobs)
+            self._built = True
+        logger.info(f"✅ Built skill index of {len(self.job_skills)} jobs and {len(self.postings)} skills "
+                    f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    def update(self, jobs: Iterable[Dict[str, Any]]) -> int:
+        """
+        Adds or replaces the postings of the given jobs.
+
+        Args:
+            jobs (iterable): Job documents with their '_id' and 'key_skills'.
+
+        Returns:
+            int: The number of jobs indexed.
+        """
+        count = 0
+        with self._lock:
+            for job in jobs:
+                job_id = str(job["_id"])
+                skills = canonical_skills(job.get("key_skills"))
+                for skill in self.job_skills.get(job_id, ()):
+                    if skill not in skills:
+                        self._discard(skill, job_id)
+                for skill in skills:
+                    self.postings[skill].add(job_id)
+                self.job_skills[job_id] = skills
+                self._track_watermarks(job)
+                count += 1
+        return count
+
+    def remove(self, job_ids: Iterable[str]):
+        with self._lock:
+            for job_id in job_ids:
+                for skill in self.job_skills.pop(str(job_id), ()):
+                    self._discard(skill, str(job_id))
+
+    def _discard(self, skill, job_id):
+        posting = self.postings.get(skill)
+        if posting is not None:
+            posting.discard(job_id)
+            if not posting:
+                del self.postings[skill]
+
+    def refresh(self) -> int:
+        """
+        Re-reads the jobs upserted or inserted since the last load.
+
+        Upserts set 'updated_at', plain inserts get a newer ObjectId. Jobs no longer in the
+        collection, e.g. archived ones, are dropped by comparing the ids of the index with the
+        ids still stored, so a removal hidden by as many inserts is not missed.
+
+        Returns:
+            int: The number of jobs re-indexed or removed.
+        """
+        if not self._built:
+            self.build()
+            return len(self.job_skills)
+        self._version = self.db_client.get_collection_version(self.collection_name)
+        changed = []
+        if self._last_updated_at is not None:
+            changed.append({"updated_at": {"$gte": self._last_updated_at}})
+        if self._last_object_id is not None:
+            changed.append({"_id": {"$gt": self._last_object_id}})
+        count = self.update(self._load({"$or": changed} if changed else {}))
+        # Archived or deleted jobs leave no watermark behind, only the ids still stored tell them apart
+        if self.db_client.db is not None:
+            stored = set(self.db_client.run_query(self.collection_name, ids_only=True))
+            with self._lock:
+                removed = [job_id for job_id in self.job_skills if job_id not in stored]
+            self.remove(removed)
+            count += len(removed)
+        if count:
+            logger.info(f"✅ Refreshed {count} jobs in the skill index")
+        return count
+
+    def ensure_fresh(self):
+        """
+        Builds the index on first use, then refreshes it when the data version changed.
+        The version is checked at most once every `refresh_interval` seconds.
+        """
+        if not self._built:
+            self.build()
+            return
+        now = time.monotonic()
+        if now - self._version_checked_at < self.refresh_interval:
+            return
+        self._version_checked_at = now
+        if self.db_client.get_collection_version(self.collection_name) != self._version:
+            self.refresh()
+
+    def idf(self, skill: str) -> float:
+        return math.log(1.0 + len(self.job_skills) / (1.0 + len(self.postings.get(skill, ()))))
+
+    def search(self, skills: Iterable[str], k: int = 20, min_overlap: int = 1) -> List[Dict[str, Any]]:
+        """
+        Finds the jobs matching the most (IDF-weighted) of the given skills.
+
+        Args:
+            skills (iterable): The skills to look for, in any spelling.
+            k (int): The number of jobs to return.
+            min_overlap (int): The minimum number of skills a job has to match.
+
+        Returns:
+            list: Dicts of '_id', 'score' (the matched share of the query weight, 0 to 1) and
+            'matched_skills', best first.
+        """
+        query_skills = canonical_skills(skills)
+        if not query_skills or k <= 0:
+            return []
+        with self._lock:
+            weights = {skill: self.idf(skill) for skill in query_skills}
+            total = sum(weights.values()) or 1.0
+            scores: Dict[str, float] = defaultdict(float)
+            matched: Dict[str, List[str]] = defaultdict(list)
+            for skill in query_skills:
+                for job_id in self.postings.get(skill, ()):
+                    scores[job_id] += weights[skill]
+                    matched[job_id].append(skill)
+        candidates = (job_id for job_id in scores if len(matched[job_id]) >= min_overlap)
+        top = heapq.nlargest(k, candidates, key=lambda job_id: (scores[job_id], job_id))
+        return [{"_id": job_id, "score": scores[job_id] / total, "matched_skills": sorted(matched[job_id])}
+                for job_id in top]
+
+    def rank(self, job_ids: List[str], skills: Iterable[str]) -> List[str]:
+        """
+        Orders the given job ids by their weighted overlap with the skills, keeping the
+        original order between jobs with the same score.
+        """
+        query_skills = canonical_skills(skills)
+        if not query_skills:
+            return list(job_ids)
+        with self._lock:
+            weights = {skill: self.idf(skill) for skill in query_skills}
+
+            def score(job_id):
+                return sum(weights[skill] for skill in self.job_skills.get(str(job_id), ()) & query_skills)
+
+            return sorted(job_ids, key=score, reverse=True)
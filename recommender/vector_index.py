@@ -0,0 +1,158 @@
+# vector_index.py
+import threading
+import time
+import zlib
+from typing import List, Dict, Any, Optional
+import numpy as np
+from utils.string_utils import tokenize_text, split_locations
+from db.snapshot import load_jobs
+from log.logger_config import configured_logger
+from loguru import logger
+
+# Fields pulled from the database to build the vectors, the html description is never needed here.
+VECTOR_PROJECTION = {"title": 1, "key_skills": 1, "location": 1,
+                     "experience_min_years": 1, "experience_max_years": 1}
+
+# Relative weight of every feature family in the final vector.
+FEATURE_WEIGHTS = {"title": 1.0, "skill": 1.5, "location": 0.5, "exp": 0.75}
+
+# Experience ranges like "5+ Yrs" are stored with max 999, cap them so the buckets stay small.
+MAX_EXPERIENCE_BUCKET = 20
+
+
+def _feature_hash(feature: str, dimensions: int) -> int:
+    # crc32 is stable across processes, unlike the builtin hash()
+    return zlib.crc32(feature.encode("utf-8")) % dimensions
+
+
+def job_features(job: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Turns a job document into a bag of weighted, namespaced features.
+
+    Args:
+        job (dict): A job document with title, key_skills, location and experience bounds.
+
+    Returns:
+        dict: A mapping of feature name to raw weight.
+    """
+    features: Dict[str, float] = {}
+
+    def add(name, weight):
+        features[name] = features.get(name, 0.0) + weight
+
+    for token in tokenize_text(job.get("title") or ""):
+        add(f"title:{token}", FEATURE_WEIGHTS["title"])
+    for skill in job.get("key_skills") or []:
+        skill = " ".join(tokenize_text(skill))
+        if skill:
+            add(f"skill:{skill}", FEATURE_WEIGHTS["skill"])
+    for location in split_locations(job.get("location")):
+        add(f"location:{location.lower()}", FEATURE_WEIGHTS["location"])
+
+    min_years = job.get("experience_min_years")
+    max_years = job.get("experience_max_years")
+    if min_years is not None:
+        max_years = min_years if max_years is None else max_years
+        upper = min(max_years, MAX_EXPERIENCE_BUCKET)
+        for year in range(min(min_years, MAX_EXPERIENCE_BUCKET), upper + 1):
+            add(f"exp:{year}", FEATURE_WEIGHTS["exp"])
+    return features
+
+
+class JobVectorIndex:
+    """
+    An in-process vector index over the 'Jobs' collection.
+
+    Every job is turned into a hashed TF-IDF vector built from its title, key skills,
+    location and experience range. The vectors live in one contiguous float32 matrix,
+    so a top-k cosine query is a single matrix-vector product.
+    """
+
+    def __init__(self, db_client, collection_name="Jobs", dimensions=4096):
+        """
+        Args:
+            db_client (DatabaseClient): The client used to load the jobs.
+            collection_name (str): The collection to index.
+            dimensions (int): The size of the hashed feature space.
+        """
+        self.db_client = db_client
+        self.collection_name = collection_name
+        self.dimensions = dimensions
+        self.matrix = np.zeros((0, dimensions), dtype=np.float32)
+        self.idf = np.ones(dimensions, dtype=np.float32)
+        self.job_ids: List[str] = []
+        self.id_to_row: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._built = False
+
+    def build(self, jobs: Optional[List[Dict[str, Any]]] = None, idf: Optional[np.ndarray] = None):
+        """
+        (Re)builds the whole index.
+
+        Args:
+            jobs (list, optional): Pre-fetched job documents. Loaded from the snapshot or the database when omitted.
+            idf (np.ndarray, optional): Bucket weights of an earlier build, so the vectors of unchanged
+                jobs stay the same. Computed from the jobs when omitted.
+        """
+        start = time.perf_counter()
+        if jobs is None:
+            jobs = load_jobs(self.db_client, self.collection_name, VECTOR_PROJECTION)
+
+        matrix = np.zeros((len(jobs), self.dimensions), dtype=np.float32)
+        for row, job in enumerate(jobs):
+            for feature, weight in job_features(job).items():
+                matrix[row, _feature_hash(feature, self.dimensions)] += weight
+
+        # Smoothed idf over the hashed buckets, then l2-normalise every row.
+        if idf is None:
+            document_frequency = np.count_nonzero(matrix, axis=0).astype(np.float32)
+            idf = np.log((1.0 + len(jobs)) / (1.0 + document_frequency)) + 1.0
+        idf = np.asarray(idf, dtype=np.float32)
+        matrix *= idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
+
+        job_ids = [str(job.get("_id")) for job in jobs]
+        with self._lock:
+            self.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+            self.idf = idf
+            self.job_ids = job_ids
+            self.id_to_row = {job_id: row for row, job_id in enumerate(job_ids)}
+            self._built = True
+        logger.info(f"✅ Built vector index of {len(job_ids)} jobs in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    def ensure_built(self):
+        if not self._built:
+            self.build()
+
+    def __contains__(self, job_id):
+        self.ensure_built()
+        return job_id in self.id_to_row
+
+    def similar(self, job_id: str, k: int = 10) -> List[Dict[str, Any]]:
+        """
+        Finds the k most similar jobs to the given job.
+
+        Args:
+            job_id (str): The '_id' of the job, as a string.
+            k (int): The number of similar jobs to return.
+
+        Returns:
+            list: Dicts of '_id' and cosine 'score', best first. Empty if the job is not indexed.
+        """
+        self.ensure_built()
+        with self._lock:
+            matrix, job_ids, row = self.matrix, self.job_ids, self.id_to_row.get(job_id)
+        if row is None or k <= 0:
+            return []
+
+        scores = matrix @ matrix[row]
+        scores[row] = -np.inf
+        k = min(k, len(job_ids) - 1)
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [{"_id": job_ids[i], "score": float(scores[i])} for i in top if scores[i] > 0]
+
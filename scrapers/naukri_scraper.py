@@ -1,4 +1,6 @@
 import asyncio
+import contextlib
+import datetime
 from bs4 import BeautifulSoup
 from patchright.async_api import async_playwright
 import sys
@@ -7,31 +9,55 @@ import os
 import csv
 from pathlib import Path
 from nanoid import generate
-from utils.string_utils import parse_experience_string
+from utils.string_utils import parse_experience_string, extract_naukri_job_id
+from scrapers.rate_limiter import HostRateLimiter
+from db.job_store import listing_hash, load_known_jobs, get_last_scrape_run, record_scrape_run, archive_expired_jobs
+from db.ingest import JobIngestPipeline
+from db.indexes import bootstrap_jobs_collection
 curr_dir = Path(__file__).resolve().parent.parent / "user_data"
 
 sys.path.append("../")
 from log.logger_config import configured_logger
 from loguru import logger
 
-async def __get_job_description__(browser, job_data, index):
-    page = await browser.new_page()
+# Result pages scraped at the same time by main()
+DEFAULT_PAGE_CONCURRENCY = 3
+# Detail tabs open at the same time
+DEFAULT_DETAIL_CONCURRENCY = 8
+# Page loads per second per host
+DEFAULT_REQUESTS_PER_SECOND = 2.0
+# Consecutive result pages holding only known jobs after which main() stops paging. Results come
+# in naukri's relevance order, not newest first, so one such page does not mean the rest are known.
+KNOWN_PAGES_TO_STOP = 2
+
+async def __get_job_description__(browser, job_data, index, detail_semaphore=None, rate_limiter=None):
     link = job_data[index]["link"]
-    await page.goto(link, timeout=60000)
-    await page.wait_for_selector("section[class^=styles_job-desc-container]")
-    job_description_element = page.locator('section[class^=styles_job-desc-container]').first
-    key_skills_elements = await job_description_element.locator('div[class^="styles_key-skill"] > div > a > span').all()
-    key_skills = []
-    for key_skill_element in key_skills_elements:
-        key_skill = await key_skill_element.text_content()
-        key_skills.append(key_skill.strip())
-    job_data[index]["key_skills"] = key_skills
-    jd_inner_html = await job_description_element.locator("div[class^='styles_JDC__dang-inner-html']").first.inner_html()
-    job_data[index]["job_description"] = jd_inner_html.strip()
-    await page.close()
+    # Bound the number of open detail tabs, an unbounded burst of tabs crashes chrome
+    async with detail_semaphore or contextlib.nullcontext():
+        if rate_limiter:
+            await rate_limiter.wait(link)
+        page = await browser.new_page()
+        try:
+            await page.goto(link, timeout=60000)
+            await page.wait_for_selector("section[class^=styles_job-desc-container]")
+            job_description_element = page.locator('section[class^=styles_job-desc-container]').first
+            key_skills_elements = await job_description_element.locator('div[class^="styles_key-skill"] > div > a > span').all()
+            key_skills = []
+            for key_skill_element in key_skills_elements:
+                key_skill = await key_skill_element.text_content()
+                key_skills.append(key_skill.strip())
+            job_data[index]["key_skills"] = key_skills
+            jd_inner_html = await job_description_element.locator("div[class^='styles_JDC__dang-inner-html']").first.inner_html()
+            job_data[index]["job_description"] = jd_inner_html.strip()
+        finally:
+            await page.close()
     return (job_data[index], index)
 
-async def scrape_naukri(url, page_number=1):
+@contextlib.asynccontextmanager
+async def naukri_browser():
+    """
+    Launches the persistent chrome context used for scraping, meant to be shared by every page of a run.
+    """
     async with async_playwright() as p:
         # Launch a browser (e.g., Chromium, Firefox, or WebKit)
         browser = await p.chromium.launch_persistent_context(
@@ -39,85 +65,161 @@ async def scrape_naukri(url, page_number=1):
             headless=False, 
             channel="chrome", 
             no_viewport=True)
-        page = await browser.new_page()
-
         try:
-            if (page_number != 1):
-                url = f"{url}-{page_number}"
-            
-            await page.goto(url, timeout=60000) # Increased timeout
-
-            await page.wait_for_selector('div.srp-jobtuple-wrapper') # Example selector, needs 
-            job_listings = await page.locator('div.srp-jobtuple-wrapper').all() # Example selector
-            job_data = []
+            yield browser
+        finally:
+            await browser.close()
 
-            # Get details from the listings
-            for index, job in enumerate(job_listings):
+async def scrape_naukri(url, page_number=1, browser=None, detail_semaphore=None, rate_limiter=None,
+                        known_jobs=None, stats=None, sink=None):
+    """
+    Scrapes one result page and the detail page of every job on it.
+
+    Args:
+        url (str): The search result url.
+        page_number (int): The result page to scrape.
+        browser (optional): A browser context to reuse. A new one is launched when omitted.
+        detail_semaphore (asyncio.Semaphore, optional): Bounds the number of open detail tabs.
+        rate_limiter (HostRateLimiter, optional): Spaces out page loads per host.
+        known_jobs (dict, optional): naukri_id -> hashes of the jobs already stored (see load_known_jobs).
+            Detail pages of known jobs are not fetched again, and unchanged known jobs are dropped.
+        stats (dict, optional): Counters updated with the number of listings, detail fetches and skipped jobs.
+        sink (JobIngestPipeline, optional): Receives every job as soon as it is scraped. When given,
+            no per-page JSON file is written and nothing is returned.
+
+    Returns:
+        list: The new or changed jobs of the page.
+    """
+    if browser is None:
+        async with naukri_browser() as browser:
+            return await scrape_naukri(url, page_number, browser, detail_semaphore, rate_limiter,
+                                       known_jobs, stats, sink)
+    known_jobs = known_jobs or {}
+    stats = stats if stats is not None else {}
+    job_data = []
+
+    if detail_semaphore is None:
+        detail_semaphore = asyncio.Semaphore(DEFAULT_DETAIL_CONCURRENCY)
+    page = await browser.new_page()
+    try:
+        if (page_number != 1):
+            url = f"{url}-{page_number}"
+        
+        if rate_limiter:
+            await rate_limiter.wait(url)
+        await page.goto(url, timeout=60000) # Increased timeout
+
+        await page.wait_for_selector('div.srp-jobtuple-wrapper') # Example selector, needs 
+        job_listings = await page.locator('div.srp-jobtuple-wrapper').all() # Example selector
+        job_data = []
+        changed_listings = []
+        # post_date is relative ("2 days ago"), posted_at is counted back from this time
+        scraped_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+        # Get details from the listings
+        for index, job in enumerate(job_listings):
+            try:
+                title_element = job.locator('h2 a.title').first
+                title = await title_element.text_content() if title_element else "N/A"
+                
+                link = await title_element.get_attribute("href") if title_element else "N/A"
+
+                company_element = job.locator('a.comp-name').first
+                company = await company_element.text_content() if company_element else "N/A"
+
+                location_element = job.locator('span.locWdth').first
+                location = await location_element.text_content() if location_element else "N/A"
+
+                experience_element = job.locator('span.expwdth').first
+                experience = await experience_element.text_content() if experience_element else "N/A"
+                parsed_experence = parse_experience_string(experience)
+                exp_str = parsed_experence["experience_raw"]
+                exp_min_yrs = parsed_experence["experience_min_years"]
+                exp_max_yrs = parsed_experence["experience_max_years"]
+                experience_level_keywords = parsed_experence["experience_level_keywords"]
+                level_keywords = experience_level_keywords
+                job_post_date = await job.locator('span.job-post-day').inner_text() if job.locator('span.job-post-day') else "N/A"
+
+                
+                naukri_id = extract_naukri_job_id(link)
+                job_details = {
+                    "id": naukri_id or generate(size=15),
+                    "naukri_id": naukri_id,
+                    "title": title.strip(),
+                    "company": company.strip(),
+                    "location": location.strip(),
+                    "experience": exp_str,
+                    "experience_min_years": exp_min_yrs,
+                    "experience_max_years": exp_max_yrs,
+                    "post_date": job_post_date.strip(),
+                    "scraped_at": scraped_at,
+                    "link": link,
+                }
+
+                stats["listings"] = stats.get("listings", 0) + 1
+                known = known_jobs.get(naukri_id)
+                if known is not None:
+                    if known.get("listing_hash") == listing_hash(job_details):
+                        stats["unchanged"] = stats.get("unchanged", 0) + 1
+                        continue
+                    # Seen before but the listing changed, update it without refetching the details
+                    changed_listings.append(job_details)
+                    continue
+                job_data.append(job_details)
+
+            except Exception as e:
+                logger.info(f"Error scraping job: {e}")
+                # You might want to log the HTML of the failed job for debugging
+                # logger.info(await job.inner_html())
+
+        # Open each link and get job description inner html
+        get_job_des_coroutines = [__get_job_description__(browser, job_data, index, detail_semaphore, rate_limiter)
+                                  for index, job in enumerate(job_data)]
+        stats["details_fetched"] = stats.get("details_fetched", 0) + len(get_job_des_coroutines)
+        
+        if sink is not None:
+            # Hand every job over as soon as its detail page is done
+            for job in changed_listings:
+                await sink.put(job)
+            for next_result in asyncio.as_completed(get_job_des_coroutines):
                 try:
-                    title_element = job.locator('h2 a.title').first
-                    title = await title_element.text_content() if title_element else "N/A"
-                    
-                    link = await title_element.get_attribute("href") if title_element else "N/A"
-
-                    company_element = job.locator('a.comp-name').first
-                    company = await company_element.text_content() if company_element else "N/A"
-
-                    location_element = job.locator('span.locWdth').first
-                    location = await location_element.text_content() if location_element else "N/A"
-
-                    experience_element = job.locator('span.expwdth').first
-                    experience = await experience_element.text_content() if experience_element else "N/A"
-                    parsed_experence = parse_experience_string(experience)
-                    exp_str = parsed_experence["experience_raw"]
-                    exp_min_yrs = parsed_experence["experience_min_years"]
-                    exp_max_yrs = parsed_experence["experience_max_years"]
-                    experience_level_keywords = parsed_experence["experience_level_keywords"]
-                    level_keywords = experience_level_keywords
-                    job_post_date = await job.locator('span.job-post-day').inner_text() if job.locator('span.job-post-day') else "N/A"
-
-                    
-                    job_details = {
-                        "id": generate(size=15),
-                        "title": title.strip(),
-                        "company": company.strip(),
-                        "location": location.strip(),
-                        "experience": exp_str,
-                        "experience_min_years": exp_min_yrs,
-                        "experience_max_years": exp_max_yrs,
-                        "post_date": job_post_date.strip(),
-                        "link": link,
-                    }
-
-                    job_data.append(job_details)
-
+                    job, _ = await next_result
                 except Exception as e:
-                    logger.info(f"Error scraping job: {e}")
-                    # You might want to log the HTML of the failed job for debugging
-                    # logger.info(await job.inner_html())
-
-            # Open each link and get job description inner html
-            get_job_des_coroutines = [__get_job_description__(browser, job_data, index) for index, job in enumerate(job_data)]
-            
-            new_job_data = await asyncio.gather(*get_job_des_coroutines)
-            job_data = [job for job, _ in new_job_data]
-
-            # Save to JSON
-            file_path = "data/naukri_output.json"
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            file_path = f"data/naukri_output_{page_number}.json"
-            with open(file_path, "w", encoding="utf-8") as json_file:
-                json.dump(job_data, json_file, indent=4)
-
-
-        except Exception as e:
-            logger.info(f"An error occurred: {e}")
-        finally:
-            await browser.close()
+                    logger.info(f"Error scraping job description: {e}")
+                    continue
+                await sink.put(job)
+            return []
+
+        new_job_data = await asyncio.gather(*get_job_des_coroutines, return_exceptions=True)
+        job_data = changed_listings
+        for result in new_job_data:
+            if isinstance(result, Exception):
+                # One broken detail page should not throw away the whole result page
+                logger.info(f"Error scraping job description: {result}")
+                continue
+            job_data.append(result[0])
+
+        # Save to JSON
+        file_path = "data/naukri_output.json"
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        file_path = f"data/naukri_output_{page_number}.json"
+        with open(file_path, "w", encoding="utf-8") as json_file:
+            json.dump(job_data, json_file, indent=4)
+
+
+    except Exception as e:
+        logger.info(f"An error occurred: {e}")
+    finally:
+        await page.close()
+    return job_data
 
 def merge_jsons_into_one(directory, file_prefix, range_start, range_end):
     merged_data = []
     for i in range(range_start, range_end + 1):
         file_path = f"{directory}/{file_prefix}_{i}.json"
+        if not os.path.exists(file_path):
+            logger.info(f"Skipping missing page file {file_path}")
+            continue
         with open(file_path, "r", encoding="utf-8") as json_file:
             data = json.load(json_file)
             merged_data.extend(data)
@@ -136,7 +238,7 @@ def merge_jsons_into_one(directory, file_prefix, range_start, range_end):
 
 
 def clean_and_format_job_description(html_content):
-    soup = BeautifulSoup(html_content, 'html.parser')
+    soup = BeautifulSoup(html_content, 'lxml')
     markdown_output = []
 
     # 1. Main Job Description
@@ -209,14 +311,106 @@ def clean_and_format_job_description(html_content):
 
     return "".join(markdown_output).strip()
 
-async def main(search_query="Software Engineering Jobs", start_page=1, end_page=5):
+async def main(search_query="Software Engineering Jobs", start_page=1, end_page=5,
+               page_concurrency=DEFAULT_PAGE_CONCURRENCY, detail_concurrency=DEFAULT_DETAIL_CONCURRENCY,
+               requests_per_second=DEFAULT_REQUESTS_PER_SECOND, host_rates=None, db=None, ndjson_path=None,
+               stop_at_known_page=True):
+    """
+    Scrapes a range of result pages concurrently with one shared browser context.
+
+    When a database is given the scrape is incremental: detail pages of jobs already stored
+    are not fetched again, only new or changed jobs are upserted, and the run is recorded
+    as a watermark in the 'ScrapeRuns' collection. When the last run of the query covered
+    them, paging stops after KNOWN_PAGES_TO_STOP consecutive pages holding only known, unchanged
+    jobs: results are ordered by relevance, so a single such page says little about the pages
+    after it, a run of them says the last run already ingested that part of the results. Jobs then stream through a JobIngestPipeline
+    into batched upserts as they are scraped, instead of going through per-page JSON files.
+    Without a database the pages are saved to JSON files and merged, as before.
+
+    Args:
+        search_query (str): The naukri search query.
+        start_page (int): The first result page.
+        end_page (int): The last result page (inclusive).
+        page_concurrency (int): The number of result pages scraped at the same time.
+        detail_concurrency (int): The maximum number of detail tabs open at the same time, across all pages.
+        requests_per_second (float): The default page loads per second allowed per host.
+        host_rates (dict, optional): Requests per second overrides per host.
+        db (optional): The pymongo database to upsert the jobs into.
+        ndjson_path (str, optional): With a database, also append every scraped job to this NDJSON file.
+        stop_at_known_page (bool): Skip the pages the last run covered after consecutive pages without anything new.
+
+    Returns:
+        dict: The counters of the run (listings seen, detail pages fetched, unchanged, inserted, updated,
+        pages skipped thanks to the watermark).
+    """
     query_string = search_query.replace(" ", "-").lower().strip()
     url = f"https://www.naukri.com/{query_string}"
-    
-    for i in range(start_page, end_page + 1):
-        await scrape_naukri(url, i)
-        logger.info(f"Scraped page {i}")
-    merge_jsons_into_one("data", "naukri_output", start_page, end_page)
+    page_semaphore = asyncio.Semaphore(page_concurrency)
+    detail_semaphore = asyncio.Semaphore(detail_concurrency)
+    rate_limiter = HostRateLimiter(requests_per_second, host_rates)
+    started_at = datetime.datetime.now(datetime.timezone.utc)
+    stats = {}
+    known_jobs = {}
+    last_run = None
+    if db is not None:
+        known_jobs = await asyncio.to_thread(load_known_jobs, db)
+        last_run = await asyncio.to_thread(get_last_scrape_run, db, search_query)
+        logger.info(f"{len(known_jobs)} jobs already stored, last run of '{search_query}': "
+                    f"{last_run['finished_at'] if last_run else 'never'}")
+
+    sink = None
+    if db is not None:
+        sink = await JobIngestPipeline(db, known_jobs=known_jobs, ndjson_path=ndjson_path).start()
+
+    # Pages the last run of this query ingested, the pages found without anything new,
+    # and the page ending the first run of KNOWN_PAGES_TO_STOP of them
+    covered_pages = range(last_run["start_page"], last_run["end_page"] + 1) \
+        if last_run and stop_at_known_page else range(0)
+    known_pages = set()
+    stop_page = None
+
+    try:
+        async with naukri_browser() as browser:
+            async def scrape_page(page_number):
+                nonlocal stop_page
+                async with page_semaphore:
+                    if stop_page is not None and stop_page < page_number and page_number in covered_pages:
+                        stats["pages_skipped"] = stats.get("pages_skipped", 0) + 1
+                        return
+                    page_stats = {}
+                    await scrape_naukri(url, page_number, browser, detail_semaphore, rate_limiter,
+                                        known_jobs, page_stats, sink)
+                    for key, value in page_stats.items():
+                        stats[key] = stats.get(key, 0) + value
+                    logger.info(f"Scraped page {page_number}")
+                    if page_number in covered_pages and page_stats.get("listings") \
+                            and page_stats.get("unchanged", 0) == page_stats["listings"]:
+                        known_pages.add(page_number)
+                        # Pages finish out of order, look for a run on either side of this one
+                        for first in range(page_number - KNOWN_PAGES_TO_STOP + 1, page_number + 1):
+                            if all(first + offset in known_pages for offset in range(KNOWN_PAGES_TO_STOP)):
+                                last = first + KNOWN_PAGES_TO_STOP - 1
+                                if stop_page is None or last < stop_page:
+                                    logger.info(f"Pages {first} to {last} hold only known jobs, "
+                                                f"stopping at the last run's watermark")
+                                    stop_page = last
+                                break
+
+            await asyncio.gather(*[scrape_page(i) for i in range(start_page, end_page + 1)])
+    finally:
+        if sink is not None:
+            # The scraper counts the listings skipped before their detail page, the sink the jobs it did not write
+            for key, value in (await sink.close()).items():
+                stats[key] = stats.get(key, 0) + value
+
+    if db is None:
+        merge_jsons_into_one("data", "naukri_output", start_page, end_page)
+    else:
+        await asyncio.to_thread(bootstrap_jobs_collection, db)
+        stats["archived"] = await asyncio.to_thread(archive_expired_jobs, db)
+        await asyncio.to_thread(record_scrape_run, db, search_query, started_at, start_page, end_page, stats)
+    logger.info(f"Scrape of '{search_query}' finished: {stats}")
+    return stats
 
 if __name__ == '__main__':
     merge_jsons_into_one("data", "naukri_output", 1, 20)
\ No newline at end of file
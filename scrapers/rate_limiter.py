@@ -0,0 +1,38 @@
+# rate_limiter.py
+import asyncio
+from collections import defaultdict
+from urllib.parse import urlparse
+
+
+class HostRateLimiter:
+    """
+    Spaces out requests so that no host gets more than its allowed requests per second.
+    """
+
+    def __init__(self, default_rate: float = 2.0, host_rates: dict = None):
+        """
+        Args:
+            default_rate (float): Requests per second allowed for hosts not listed in `host_rates`.
+                0 or less disables the limit.
+            host_rates (dict, optional): Requests per second per host, e.g. {"www.naukri.com": 1.5}.
+        """
+        self.default_rate = default_rate
+        self.host_rates = host_rates or {}
+        self._locks = defaultdict(asyncio.Lock)
+        self._next_slot = defaultdict(float)
+
+    async def wait(self, url: str):
+        """
+        Waits until a request to the host of `url` is allowed.
+        """
+        host = urlparse(url).netloc
+        rate = self.host_rates.get(host, self.default_rate)
+        if not rate or rate <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        async with self._locks[host]:
+            now = loop.time()
+            delay = self._next_slot[host] - now
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_slot[host] = max(now, self._next_slot[host]) + 1.0 / rate
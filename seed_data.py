@@ -1,24 +1,47 @@
+import datetime
 import pymongo
 import sys
 from pathlib import Path
 from db.db_client import DatabaseClient
-import json
+from db.indexes import bootstrap_jobs_collection
+from db.snapshot import export_snapshot
+from db.job_store import upsert_jobs, backfill_description_fields, backfill_posted_at, archive_expired_jobs
+from recommender.similarity_table import SimilarityTable
+from utils.json_stream import iter_json_documents
+from log.logger_config import configured_logger
+from loguru import logger
 
-db_client = DatabaseClient(db_name="JobReco")
-mongo_client = db_client.client
-database = mongo_client["JobReco"]
-database.drop_collection("Jobs")
+# Jobs are upserted on their naukri id, so re-running the seed only touches new or changed jobs.
+# Pass --reset to drop the collection and load it from scratch.
+db_client = DatabaseClient()
+database = db_client.db
+if "--reset" in sys.argv:
+    database.drop_collection("Jobs")
 collection = database["Jobs"]
+bootstrap_jobs_collection(database)
 
-json_path = Path(__file__).parent.joinpath("data/naukri_output_merged.json")
-with open(json_path, "r") as file:
-    data = json.load(file)
+# Pass another file (a JSON array or an .ndjson file) as the first argument to seed from it
+arguments = [argument for argument in sys.argv[1:] if not argument.startswith("--")]
+json_path = Path(arguments[0]) if arguments else Path(__file__).parent.joinpath("data/naukri_output_merged.json")
+# Jobs without their own 'scraped_at' count their post_date back from when the file was written
+scraped_at = datetime.datetime.fromtimestamp(json_path.stat().st_mtime, datetime.timezone.utc)
+# The file is streamed, only one upsert batch is held in memory at a time
+stats = upsert_jobs(database, iter_json_documents(json_path), scraped_at=scraped_at)
+# Unchanged jobs are skipped by the upsert, give the ones stored before the text fields existed theirs
+stats["updated"] += backfill_description_fields(database)
+stats["updated"] += backfill_posted_at(database)
+# Pass --archive to move jobs posted more than JOB_RETENTION_DAYS ago out of 'Jobs', scrapes always do.
+# It is opt-in here so seeding an old sample file does not archive all of it.
+stats["archived"] = archive_expired_jobs(database) if "--archive" in sys.argv else 0
 
-if isinstance(data, list):
-    collection.insert_many(data)
-            # If the json file contains a single document
-else:
-    collection.insert_one(data)
+bootstrap_jobs_collection(database)
 
-count = len(collection.find({}).to_list())
-logger.info(f"{count} no. of data entered.")
\ No newline at end of file
+if stats["inserted"] or stats["updated"] or stats["archived"]:
+    db_client.bump_collection_version("Jobs")
+# Recompute the similar jobs of the new and changed jobs, and of the jobs they are now similar to
+SimilarityTable(db_client).refresh()
+# Workers load their indexes from the snapshot instead of the database while it is current
+export_snapshot(db_client)
+
+count = collection.count_documents({})
+logger.info(f"{count} no. of data entered.")
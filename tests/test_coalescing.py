@@ -0,0 +1,67 @@
+# test_coalescing.py
+import asyncio
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from llm.coalescing import CoalescingRunnable
+
+
+class SlowChatModel(FakeListChatModel):
+    """Answers after a short pause, counting the calls running at the same time."""
+    delay: float = 0.05
+    running: int = 0
+    peak_running: int = 0
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.running += 1
+        self.peak_running = max(self.peak_running, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+            return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        finally:
+            self.running -= 1
+
+
+class FailingChatModel(SlowChatModel):
+    def _call(self, messages, stop=None, run_manager=None, **kwargs):
+        raise RuntimeError("model down")
+
+
+def test_identical_inputs_share_one_call():
+    model = SlowChatModel(responses=["first", "second"])
+    coalescer = CoalescingRunnable(model)
+
+    async def run():
+        return await asyncio.gather(*(coalescer.ainvoke("same resume") for _ in range(3)))
+
+    results = asyncio.run(run())
+    assert [result.content for result in results] == ["first"] * 3
+    assert coalescer.stats() == {"name": "llm", "requests": 3, "coalesced": 2, "calls": 1}
+
+
+def test_distinct_inputs_are_capped_by_max_concurrency():
+    model = SlowChatModel(responses=["answer"])
+    coalescer = CoalescingRunnable(model, max_concurrency=2)
+
+    async def run():
+        return await asyncio.gather(*(coalescer.ainvoke(f"resume {number}") for number in range(6)))
+
+    assert len(asyncio.run(run())) == 6
+    assert coalescer.calls == 6
+    assert model.peak_running == 2
+
+
+def test_errors_reach_every_waiting_caller():
+    coalescer = CoalescingRunnable(FailingChatModel(responses=["unused"]))
+
+    async def run():
+        return await asyncio.gather(*(coalescer.ainvoke("same resume") for _ in range(2)),
+                                    return_exceptions=True)
+
+    errors = asyncio.run(run())
+    assert all(isinstance(error, RuntimeError) for error in errors)
+    assert coalescer.calls == 1
+
+    # A failed call is not kept, the next request tries again
+    with pytest.raises(RuntimeError):
+        asyncio.run(coalescer.ainvoke("same resume"))
+    assert coalescer.calls == 2
@@ -0,0 +1,164 @@
+# cache.py
+import asyncio
+import functools
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+from log.logger_config import configured_logger
+from loguru import logger
+
+_MISSING = object()
+
+
+class ResponseCache:
+    """
+    A thread safe in-memory cache with a time to live, LRU eviction and a size limit.
+
+    An optional `version_getter` returns the current version of the data the cached
+    responses were computed from (e.g. the version of the 'Jobs' collection). Whenever it
+    changes, the whole cache is dropped. The version is checked at most once every
+    `version_check_interval` seconds so lookups stay cheap.
+    """
+
+    def __init__(self, name: str, maxsize: int = 512, ttl: float = 3600,
+                 version_getter: Optional[Callable[[], Any]] = None, version_check_interval: float = 5.0):
+        """
+        Args:
+            name (str): The name of the cache, used in logs and stats.
+            maxsize (int): The maximum number of entries kept.
+            ttl (float): The number of seconds an entry stays valid.
+            version_getter (callable, optional): Returns the current version of the underlying data.
+            version_check_interval (float): Minimum number of seconds between two version checks.
+        """
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version_getter = version_getter
+        self.version_check_interval = version_check_interval
+        self._entries: "OrderedDict[Any, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = _MISSING
+        self._version_checked_at = 0.0
+        self._in_flight = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _version_check_due(self) -> bool:
+        return self.version_getter is not None \
+            and time.monotonic() - self._version_checked_at >= self.version_check_interval
+
+    def _check_version(self):
+        if not self._version_check_due():
+            return
+        self._version_checked_at = time.monotonic()
+        try:
+            version = self.version_getter()
+        except Exception as e:
+            logger.info(f"❌ Could not read data version for cache '{self.name}': {e}")
+            return
+        if self._version is not _MISSING and version != self._version:
+            logger.info(f"🧹 Data changed, invalidating cache '{self.name}'")
+            self.clear()
+        self._version = version
+
+    def get(self, key, default=None):
+        self._check_version()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    async def aget(self, key, default=None):
+        """
+        Like get, for coroutines: the data version (a database read) is checked on a worker
+        thread instead of the event loop.
+        """
+        if self._version_check_due():
+            await asyncio.to_thread(self._check_version)
+        return self.get(key, default)
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"name": self.name,
+                    "size": len(self._entries),
+                    "maxsize": self.maxsize,
+                    "ttl": self.ttl,
+                    "hits": self.hits,
+                    "misses": self.misses,
+                    "hit_rate": self.hits / lookups if lookups else 0.0,
+                    "evictions": self.evictions,
+                    "invalidations": self.invalidations}
+
+
+def async_cached(cache: ResponseCache, key_func: Callable[..., Any]):
+    """
+    Caches the result of an async function in the given ResponseCache.
+
+    Concurrent calls with the same key share one in-flight computation, so a burst of
+    identical requests only runs the wrapped function once.
+
+    Args:
+        cache (ResponseCache): Where results are stored.
+        key_func (callable): Builds the cache key from the arguments of the wrapped function.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = (func.__name__, key_func(*args, **kwargs))
+            while True:
+                cached = await cache.aget(key, _MISSING)
+                if cached is not _MISSING:
+                    return cached
+                in_flight = cache._in_flight.get(key)
+                if in_flight is None:
+                    break
+                try:
+                    return await asyncio.shield(in_flight)
+                except asyncio.CancelledError:
+                    if not in_flight.cancelled():
+                        raise
+                    # The call computing it was cancelled, not this one: compute it again
+
+            future = asyncio.get_running_loop().create_future()
+            cache._in_flight[key] = future
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                future.set_exception(e)
+                # Mark the exception as retrieved when nobody else was waiting on it
+                future.exception()
+                raise
+            else:
+                cache.set(key, result)
+                future.set_result(result)
+                return result
+            finally:
+                cache._in_flight.pop(key, None)
+                if not future.done():
+                    # Cancelled (e.g. the client went away): release the waiters, they retry
+                    future.cancel()
+        return wrapper
+    return decorator
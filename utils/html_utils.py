@@ -0,0 +1,112 @@
+# html_utils.py
+import re
+from typing import Dict
+import lxml.html
+from lxml import etree
+
+# Tags that start a new line in the text output.
+BLOCK_TAGS = {"p", "div", "section", "article", "ul", "ol", "li", "table", "tr", "h1", "h2", "h3", "h4", "h5",
+              "h6", "header", "footer", "blockquote", "pre", "dl", "dt", "dd"}
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6", "b", "strong"}
+
+# Lines wrapped in these markers come from a heading or bold element.
+_HEADING_START = "\x02"
+_HEADING_END = "\x03"
+
+# A heading line is short, e.g. "Roles and Responsibilities:" or "Education & Experience:"
+MAX_HEADING_WORDS = 8
+
+
+def _walk(root):
+    parts = []
+    for event, element in etree.iterwalk(root, events=("start", "end")):
+        if not isinstance(element.tag, str):
+            # Comments and processing instructions only contribute their tail
+            if event == "end" and element.tail:
+                parts.append(element.tail)
+            continue
+        tag = element.tag.lower()
+        if event == "start":
+            if tag == "br" or tag in BLOCK_TAGS:
+                parts.append("\n")
+            if tag == "li":
+                parts.append("- ")
+            if tag in HEADING_TAGS:
+                parts.append(_HEADING_START)
+            if element.text:
+                parts.append(element.text)
+        else:
+            if tag in HEADING_TAGS:
+                parts.append(_HEADING_END)
+            if tag in BLOCK_TAGS:
+                parts.append("\n")
+            if element.tail and element is not root:
+                parts.append(element.tail)
+    return "".join(parts)
+
+
+def _heading_text(line):
+    """
+    Returns the heading text of a line, or None if the line is not a heading.
+    """
+    stripped = line.replace(_HEADING_START, "").replace(_HEADING_END, "").strip()
+    is_bold = line.startswith(_HEADING_START) and line.endswith(_HEADING_END)
+    if not stripped or len(stripped.split()) > MAX_HEADING_WORDS:
+        return None
+    if is_bold or (stripped.endswith(":") and not stripped.startswith("- ")):
+        return stripped.rstrip(":").strip() or None
+    return None
+
+
+def _section_key(heading):
+    return re.sub(r"[^a-z0-9]+", "_", heading.lower()).strip("_")[:60] or "section"
+
+
+def html_to_markdown(html: str) -> Dict[str, object]:
+    """
+    Converts a job description html fragment into compact markdown text and its sections.
+
+    Runs once per job at ingest time with lxml, so nothing on a request path ever needs to
+    parse the html again.
+
+    Args:
+        html (str): The raw job description html.
+
+    Returns:
+        dict: 'description_text' with the markdown text, and 'description_sections' mapping
+        a normalised heading (e.g. 'roles_and_responsibilities') to the text under it.
+        Text before the first heading is stored under 'summary'.
+    """
+    if not html or not html.strip():
+        return {"description_text": "", "description_sections": {}}
+    try:
+        root = lxml.html.fragment_fromstring(html, create_parent="div")
+    except (etree.ParserError, ValueError):
+        return {"description_text": html.strip(), "description_sections": {}}
+
+    lines = []
+    sections: Dict[str, list] = {}
+    current = "summary"
+    for raw_line in _walk(root).split("\n"):
+        raw_line = re.sub(r"[ \t\r\f\v\xa0]+", " ", raw_line).strip()
+        # Drop markers of empty bold elements
+        raw_line = raw_line.replace(_HEADING_START + _HEADING_END, "").strip()
+        if not raw_line.replace(_HEADING_START, "").replace(_HEADING_END, "").strip():
+            continue
+        heading = _heading_text(raw_line)
+        if heading:
+            lines.append(f"## {heading}")
+            current = _section_key(heading)
+            sections.setdefault(current, [])
+            continue
+        line = raw_line.replace(_HEADING_START, "").replace(_HEADING_END, "")
+        line = re.sub(r" +", " ", line).strip()
+        if lines and lines[-1] == line:
+            continue
+        lines.append(line)
+        sections.setdefault(current, []).append(line)
+
+    return {
+        "description_text": "\n".join(lines),
+        "description_sections": {key: "\n".join(value) for key, value in sections.items() if value},
+    }
@@ -0,0 +1,67 @@
+# json_stream.py
+import json
+from typing import Any, Iterator
+
+_WHITESPACE = " \t\r\n"
+
+
+def iter_json_array(file_path: str, chunk_size: int = 1 << 16) -> Iterator[Any]:
+    """
+    Yields the elements of a JSON array file one at a time, without loading the whole file.
+
+    A file holding a single JSON object yields that object.
+
+    Args:
+        file_path (str): The path of the JSON file.
+        chunk_size (int): The number of characters read at a time.
+    """
+    decoder = json.JSONDecoder()
+    with open(file_path, "r", encoding="utf-8") as file:
+        buffer = file.read(chunk_size).lstrip(_WHITESPACE)
+        if not buffer:
+            return
+        if not buffer.startswith("["):
+            # A single document, small enough to be read at once
+            yield json.loads(buffer + file.read())
+            return
+        buffer = buffer[1:]
+        eof = False
+        while True:
+            buffer = buffer.lstrip(_WHITESPACE + ",")
+            if buffer.startswith("]"):
+                return
+            try:
+                document, end = decoder.raw_decode(buffer)
+                # A number cut at the end of the buffer still decodes, make sure it is complete
+                complete = end < len(buffer) or eof
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                complete = False
+            if not complete:
+                chunk = file.read(chunk_size)
+                eof = not chunk
+                buffer += chunk
+                continue
+            yield document
+            buffer = buffer[end:]
+
+
+def iter_ndjson(file_path: str) -> Iterator[Any]:
+    """
+    Yields the documents of a newline delimited JSON file one line at a time.
+    """
+    with open(file_path, "r", encoding="utf-8") as file:
+        for line in file:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def iter_json_documents(file_path: str) -> Iterator[Any]:
+    """
+    Streams the documents of a .ndjson/.jsonl file or of a JSON array file.
+    """
+    if str(file_path).endswith((".ndjson", ".jsonl")):
+        return iter_ndjson(file_path)
+    return iter_json_array(file_path)
@@ -0,0 +1,45 @@
+# streaming.py
+import json
+from typing import AsyncIterable, Iterable, Union
+from fastapi.responses import StreamingResponse
+
+# Formats accepted by the `stream` query parameter of the job endpoints.
+NDJSON = "ndjson"
+JSON_ARRAY = "json"
+
+
+async def _as_async_iterable(documents):
+    for document in documents:
+        yield document
+
+
+async def _ndjson_chunks(documents):
+    async for document in documents:
+        yield json.dumps(document, default=str) + "\n"
+
+
+async def _json_array_chunks(documents):
+    yield "["
+    first = True
+    async for document in documents:
+        yield ("" if first else ",") + json.dumps(document, default=str)
+        first = False
+    yield "]"
+
+
+def stream_documents(documents: Union[AsyncIterable[dict], Iterable[dict]], stream_format: str = NDJSON) -> StreamingResponse:
+    """
+    Streams documents to the client as they are produced.
+
+    Args:
+        documents: An (async) iterable of JSON serializable documents, e.g. AsyncDatabaseClient.stream_query.
+        stream_format (str): "ndjson" for one document per line or "json" for a chunked JSON array.
+
+    Returns:
+        StreamingResponse: The response to return from the endpoint.
+    """
+    if not hasattr(documents, "__aiter__"):
+        documents = _as_async_iterable(documents)
+    if stream_format == JSON_ARRAY:
+        return StreamingResponse(_json_array_chunks(documents), media_type="application/json")
+    return StreamingResponse(_ndjson_chunks(documents), media_type="application/x-ndjson")
@@ -1,37 +1,187 @@
 import re
 import ast
-from typing import List, Any
-from pypdf import PdfReader
-from docx import Document
+import json
+import datetime
+from typing import List, Any, Dict, Optional
+from bson import ObjectId
 from log.logger_config import configured_logger
 from loguru import logger
-import io
 from fastapi import UploadFile
 
+# Agent outputs longer than this are rejected before they are scanned.
+MAX_LLM_OUTPUT_CHARS = 100_000
+
+# Deepest bracket nesting accepted in an agent output.
+MAX_LLM_OUTPUT_NESTING = 32
+
+_CLOSING_BRACKETS = {"[": "]", "{": "}"}
+
+
+class LLMOutputError(ValueError):
+    """
+    Raised when a list or an object can not be read from an LLM output.
+
+    Attributes:
+        reason (str): One of 'too_large', 'not_found', 'too_deep', 'invalid_literal',
+            'wrong_type' or 'invalid_object_id'.
+    """
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+def find_bracketed(text: str, open_bracket: str = "[") -> str:
+    """
+    Returns the first balanced "[...]" or "{...}" span of a text, in a single linear pass.
+
+    Brackets inside quoted strings are ignored. A span that closes with the wrong bracket is
+    dropped and the scan goes on after it, so a stray bracket in prose does not hide the
+    literal that follows.
+
+    Args:
+        text (str): The LLM output.
+        open_bracket (str): "[" for a list, "{" for an object.
+
+    Raises:
+        LLMOutputError: The text is too large, too deeply nested or has no such span.
+    """
+    if text is None:
+        text = ""
+    if len(text) > MAX_LLM_OUTPUT_CHARS:
+        raise LLMOutputError("too_large", f"LLM output of {len(text)} characters exceeds {MAX_LLM_OUTPUT_CHARS}")
+    # (position, closing bracket) of every bracket still open
+    stack: List[tuple] = []
+    # An inner span that closed while an outer bracket never did, e.g. "[a) ['x']"
+    inner_span = None
+    quote = None
+    escaped = False
+    for position, char in enumerate(text):
+        if not stack:
+            if char == open_bracket:
+                stack.append((position, _CLOSING_BRACKETS[char]))
+            continue
+        if quote:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == quote:
+                quote = None
+        elif char in "\"'":
+            quote = char
+        elif char in _CLOSING_BRACKETS:
+            stack.append((position, _CLOSING_BRACKETS[char]))
+            if len(stack) > MAX_LLM_OUTPUT_NESTING:
+                raise LLMOutputError("too_deep", f"LLM output is nested deeper than {MAX_LLM_OUTPUT_NESTING} levels")
+        elif char in "]}":
+            opened_at, closing = stack.pop()
+            if char != closing:
+                stack = []
+            elif not stack:
+                return text[opened_at:position + 1]
+            elif text[opened_at] == open_bracket and (inner_span is None or opened_at < inner_span[0]):
+                inner_span = (opened_at, position + 1)
+    if inner_span is not None:
+        return text[inner_span[0]:inner_span[1]]
+    raise LLMOutputError("not_found", f"No {open_bracket}...{_CLOSING_BRACKETS[open_bracket]} found in the LLM output")
+
+
+def _parse_literal(span: str, expected_type: type):
+    try:
+        value = json.loads(span)
+    except ValueError:
+        try:
+            value = ast.literal_eval(span)
+        except (ValueError, SyntaxError, RecursionError, MemoryError) as e:
+            raise LLMOutputError("invalid_literal", f"Could not parse the LLM output: {e}") from e
+    if not isinstance(value, expected_type):
+        raise LLMOutputError("wrong_type", f"Expected a {expected_type.__name__}, got a {type(value).__name__}")
+    return value
+
+
+def extract_list(text: str) -> List[Any]:
+    """
+    Reads the first list literal (JSON or Python syntax) of an LLM output.
+
+    Raises:
+        LLMOutputError: No valid list could be read.
+    """
+    return _parse_literal(find_bracketed(text, "["), list)
+
+
+def extract_object(text: str) -> Dict[str, Any]:
+    """
+    Reads the first object literal (JSON or Python syntax) of an LLM output.
+
+    Raises:
+        LLMOutputError: No valid object could be read.
+    """
+    return _parse_literal(find_bracketed(text, "{"), dict)
+
+
+def extract_object_ids(text: str) -> List[str]:
+    """
+    Reads a list of document ids from an LLM output, e.g. "Final Answer: ['686a...', ...]".
+
+    Returns:
+        list: The ids, every one a valid ObjectId string.
+
+    Raises:
+        LLMOutputError: No list was found, or it holds something else than ObjectId strings.
+    """
+    ids = extract_list(text)
+    for value in ids:
+        if not isinstance(value, str) or not ObjectId.is_valid(value):
+            raise LLMOutputError("invalid_object_id", f"Not a document id: {str(value)[:64]!r}")
+    return ids
+
+
 def get_list_from_string(string_literal: str) -> List[Any]:
-    match = re.search(r'\[(\s|.)*\]', string_literal)
-
-    if match:
-        # 2. Extract the matched string (which is the list as a string)
-        list_string = match.group(0)
-
-        # 3. Use ast.literal_eval to safely convert the string list to a Python list
-        #    ast.literal_eval() is safe because it only evaluates literals
-        #    (strings, numbers, tuples, lists, dicts, booleans, None)
-        #    and not arbitrary code.
-        extracted_array : List = ast.literal_eval(list_string)
-        return extracted_array
-    else:
+    """
+    Returns the first list of an LLM output, or an empty list when there is none.
+    """
+    try:
+        return extract_list(string_literal)
+    except LLMOutputError as e:
+        if e.reason == "not_found":
+            return []
+        raise
+
+def tokenize_text(text: str) -> List[str]:
+    """Splits free text into lowercase word tokens, keeping tech symbols like c++, c# and .net."""
+    if not text:
         return []
+    tokens = re.findall(r"[a-z0-9][a-z0-9+#.]*", text.lower().replace("/", " "))
+    return [token.rstrip(".") for token in tokens]
+
+def split_locations(location: str) -> List[str]:
+    """Splits a location string like "Hybrid - Bengaluru, Pune/Mumbai" into its places."""
+    if not location:
+        return []
+    places = re.split(r"[,/]|\s-\s", location)
+    return [place.strip() for place in places if place.strip()]
+
+def extract_naukri_job_id(link: str):
+    """
+    Returns the stable naukri job id embedded in a job link, or None.
+    e.g. https://www.naukri.com/job-listings-...-12-to-17-years-050725501494?src=... -> "050725501494"
+    """
+    if not link:
+        return None
+    match = re.search(r"-(\d{6,})(?:[/?#]|$)", link)
+    return match.group(1) if match else None
 
 def get_json_from_string(string_literal: str) -> str:
-    match = re.search(r"\{(\s|.)*\}", string_literal)
-    if match:
-        content_json = match.group(0)
-    else:
-        return "{{}}"
-    logger.info("converted json",content_json)
-    return content_json
+    """
+    Returns the first "{...}" span of an LLM output, "{}" when there is none. Prefer extract_object.
+    """
+    try:
+        return find_bracketed(string_literal, "{")
+    except LLMOutputError as e:
+        if e.reason == "not_found":
+            return "{}"
+        raise
 
 
 def parse_experience_string(exp_str):
@@ -96,27 +246,49 @@ def parse_experience_string(exp_str):
         "experience_level_keywords": sorted(list(set(level_keywords))) # Use set for uniqueness, sorted for consistency
     }
 
+# Days in every unit of a relative post date like "3+ weeks ago".
+POST_AGE_UNITS = {"hour": 0, "day": 1, "week": 7, "month": 30, "year": 365}
+
+def parse_post_age_days(post_date: str) -> Optional[int]:
+    """
+    Reads the age in days of a relative naukri post date, at the time it was scraped.
+    e.g. "Few hours ago" -> 0, "1 day ago" -> 1, "3+ weeks ago" -> 21. None if it can't be read.
+    """
+    text = (post_date or "").lower().strip()
+    if text in ("just now", "today") or "hour" in text or "minute" in text:
+        return 0
+    match = re.search(r"(\d+)\s*\+?\s*(hour|day|week|month|year)s?\b", text)
+    if not match:
+        return None
+    return int(match.group(1)) * POST_AGE_UNITS[match.group(2)]
+
+def post_date_to_datetime(post_date: str, scraped_at: datetime.datetime) -> Optional[datetime.datetime]:
+    """
+    Turns a relative post date into the time the job was posted, counted back from when it was scraped.
+    "3+ weeks ago" scraped on July 31st -> July 10th. None if the post date can't be read.
+    """
+    age = parse_post_age_days(post_date)
+    if age is None:
+        return None
+    return scraped_at - datetime.timedelta(days=age)
+
 def extract_text_from_pdf(file: UploadFile) -> str:
-    """Extracts text from a PDF file."""
+    """Extracts text from a PDF file. Blocking, the API uses utils.text_extraction instead."""
+    from pypdf import PdfReader
     try:
-        reader = PdfReader(io.BytesIO(file.file.read()))
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text() or ""
-        return text
+        reader = PdfReader(file.file)
+        return "".join(page.extract_text() or "" for page in reader.pages)
     except Exception as e:
         logger.error(f"Error extracting text from PDF: {e}")
         raise Exception(status_code=500, detail="Could not process PDF file.")
 
 def extract_text_from_docx(file) -> str:
-    """Extracts text from a DOCX file."""
+    """Extracts text from a DOCX file. Blocking, the API uses utils.text_extraction instead."""
+    from docx import Document
     try:
-        document = Document(io.BytesIO(file.file.read()))
-        text = ""
+        document = Document(file.file)
         logger.info("Extracting text from DOCX...", document)
-        for paragraph in document.paragraphs:
-            text += paragraph.text + "\n"
-        return text
+        return "".join(paragraph.text + "\n" for paragraph in document.paragraphs)
     except Exception as e:
         logger.error(f"Error extracting text from DOCX: {e}")
         raise Exception(status_code=500, detail="Could not process DOCX file.")
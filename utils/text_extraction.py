@@ -0,0 +1,183 @@
+# text_extraction.py
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import signal
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+from pydantic import BaseModel
+from utils.cache import ResponseCache, async_cached
+from log.logger_config import configured_logger
+from loguru import logger
+
+PDF = "pdf"
+DOCX = "docx"
+CONTENT_TYPES = {
+    "application/pdf": PDF,
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document": DOCX,
+}
+
+# Uploads are copied to disk this many bytes at a time.
+SPOOL_CHUNK_SIZE = 1 << 20
+
+# Worker processes start from a clean interpreter instead of a fork of the API process, which
+# holds MongoClients, the event loop and the threads of the db pool, none of them fork-safe.
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# The same resume uploaded again is served from here, keyed on the hash of its content.
+extracted_text_cache = ResponseCache("extracted_text", maxsize=256, ttl=24 * 60 * 60)
+
+
+class ExtractionError(Exception):
+    """Raised when the text of a document can not be extracted."""
+
+
+class SpooledDocument(BaseModel):
+    path: str
+    kind: str
+    digest: str
+    size: int
+
+
+def _raise_timeout(signum, frame):
+    raise TimeoutError("Text extraction timed out")
+
+
+def _extract_text(path: str, kind: str, max_pages: int, timeout: float) -> str:
+    # Runs in a worker process, must stay a picklable module level function.
+    # Tasks run on the main thread of the worker, so a timer signal can interrupt a stuck parse.
+    use_timer = bool(timeout) and hasattr(signal, "setitimer")
+    if use_timer:
+        signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        # Imported here, only the worker processes pay for loading the parsers
+        if kind == PDF:
+            from pypdf import PdfReader
+            reader = PdfReader(path)
+            pages = reader.pages[:max_pages] if max_pages else reader.pages
+            return "".join(page.extract_text() or "" for page in pages)
+        from docx import Document
+        document = Document(path)
+        return "\n".join(paragraph.text for paragraph in document.paragraphs)
+    finally:
+        if use_timer:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+class TextExtractionService:
+    """
+    Extracts the text of uploaded documents on a process pool.
+
+    Parsing a PDF with pypdf is CPU bound, on the event loop (or on a thread, because of the
+    GIL) it stalls every other request. Worker processes let it use every core. Uploads are
+    copied to a temp file in chunks and only its path is sent to the worker, every parse is
+    bounded by a timeout and a page limit, and results are cached on the content hash.
+    """
+
+    def __init__(self, max_workers: int = None, timeout: float = 20.0, max_pages: int = 20,
+                 max_bytes: int = 10 * 1024 * 1024):
+        """
+        Args:
+            max_workers (int, optional): The number of worker processes, the number of cores by default.
+            timeout (float): Seconds a single document may take to parse.
+            max_pages (int): The number of PDF pages read, 0 reads every page.
+            max_bytes (int): The largest upload accepted.
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.max_pages = max_pages
+        self.max_bytes = max_bytes
+        self._executor = None
+
+    @property
+    def executor(self):
+        # Started on first use, so importing the app does not start worker processes
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context(START_METHOD))
+            logger.info(f"✅ Text extraction pool ready with {self.max_workers} processes")
+        return self._executor
+
+    async def spool(self, upload, content_type: Optional[str] = None) -> SpooledDocument:
+        """
+        Copies an upload to a temp file in chunks, hashing it on the way.
+
+        Args:
+            upload (UploadFile): The uploaded file.
+            content_type (str, optional): Overrides the content type of the upload.
+
+        Returns:
+            SpooledDocument: The temp file, to be removed with `discard` once extracted.
+        """
+        kind = CONTENT_TYPES.get(content_type or upload.content_type)
+        if kind is None:
+            raise ExtractionError(f"Unsupported file type: {content_type or upload.content_type}")
+        digest = hashlib.sha256()
+        size = 0
+        with tempfile.NamedTemporaryFile(prefix="resume-", suffix=f".{kind}", delete=False) as spooled:
+            try:
+                while chunk := await upload.read(SPOOL_CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise ExtractionError(f"File is larger than {self.max_bytes} bytes")
+                    digest.update(chunk)
+                    spooled.write(chunk)
+            except BaseException:
+                spooled.close()
+                os.remove(spooled.name)
+                raise
+        return SpooledDocument(path=spooled.name, kind=kind, digest=digest.hexdigest(), size=size)
+
+    @staticmethod
+    def discard(document: SpooledDocument):
+        if os.path.exists(document.path):
+            os.remove(document.path)
+
+    async def extract(self, document: SpooledDocument) -> str:
+        """
+        Extracts the text of a spooled document, a document with the same content is only parsed once.
+
+        Raises:
+            ExtractionError: The document could not be parsed in time or is not a valid document.
+        """
+        return await self._extract(document, self.max_pages)
+
+    @async_cached(extracted_text_cache, lambda self, document, max_pages: (document.digest, document.kind, max_pages))
+    async def _extract(self, document: SpooledDocument, max_pages: int) -> str:
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.executor, _extract_text, document.path, document.kind,
+                                      max_pages, self.timeout)
+        try:
+            # The worker stops itself on timeout, this only guards against a hung worker
+            return await asyncio.wait_for(future, timeout=self.timeout + 5)
+        except (TimeoutError, asyncio.TimeoutError):
+            logger.error(f"❌ Extracting the text of a {document.size} bytes {document.kind} timed out")
+            raise ExtractionError(f"Extracting the text took longer than {self.timeout} seconds")
+        except ExtractionError:
+            raise
+        except Exception as e:
+            raise ExtractionError(f"Could not read the {document.kind.upper()} file: {e}")
+
+    async def extract_upload(self, upload) -> str:
+        """
+        Spools an upload, extracts its text and removes the temp file.
+
+        Args:
+            upload (UploadFile): The uploaded PDF or DOCX file.
+
+        Returns:
+            str: The text of the document.
+        """
+        document = await self.spool(upload)
+        try:
+            return await self.extract(document)
+        finally:
+            self.discard(document)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None